@@ -1,607 +1,33 @@
 import streamlit as st
-import sqlite3
-import hashlib
-from datetime import date
+import io
+import tempfile
+from datetime import date, datetime
 import pandas as pd
 
-DB_PATH = "avaliacao360.db"
-
-# ---------- BASE DE DADOS ----------
-
-def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def setup_db():
-    conn = get_conn()
-    cur = conn.cursor()
-
-    # Tabelas base
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS teams (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL
-        );
-    """)
-
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            role TEXT NOT NULL,
-            is_active INTEGER NOT NULL DEFAULT 1
-        );
-    """)
-
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_teams (
-            user_id INTEGER NOT NULL,
-            team_id INTEGER NOT NULL,
-            is_primary INTEGER NOT NULL DEFAULT 0,
-            PRIMARY KEY (user_id, team_id),
-            FOREIGN KEY(user_id) REFERENCES users(id),
-            FOREIGN KEY(team_id) REFERENCES teams(id)
-        );
-    """)
-
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS evaluation_periods (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            start_date TEXT NOT NULL,
-            end_date TEXT NOT NULL,
-            is_active INTEGER NOT NULL DEFAULT 1
-        );
-    """)
-
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS competencies (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            category TEXT NOT NULL,
-            team_id INTEGER,
-            leadership_only INTEGER NOT NULL DEFAULT 0,
-            weight REAL NOT NULL DEFAULT 1.0,
-            active INTEGER NOT NULL DEFAULT 1,
-            FOREIGN KEY(team_id) REFERENCES teams(id)
-        );
-    """)
-
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS evaluation_assignments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            period_id INTEGER NOT NULL,
-            evaluator_id INTEGER NOT NULL,
-            evaluatee_id INTEGER NOT NULL,
-            include_behavioral INTEGER NOT NULL DEFAULT 0,
-            include_technical INTEGER NOT NULL DEFAULT 0,
-            include_objectives INTEGER NOT NULL DEFAULT 0,
-            UNIQUE(period_id, evaluator_id, evaluatee_id),
-            FOREIGN KEY(period_id) REFERENCES evaluation_periods(id),
-            FOREIGN KEY(evaluator_id) REFERENCES users(id),
-            FOREIGN KEY(evaluatee_id) REFERENCES users(id)
-        );
-    """)
-
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS evaluation_answers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            assignment_id INTEGER NOT NULL,
-            competency_id INTEGER NOT NULL,
-            score INTEGER NOT NULL,
-            comment TEXT,
-            UNIQUE(assignment_id, competency_id),
-            FOREIGN KEY(assignment_id) REFERENCES evaluation_assignments(id),
-            FOREIGN KEY(competency_id) REFERENCES competencies(id)
-        );
-    """)
-
-    conn.commit()
-
-    # Equipas
-    teams = [
-        ("Marketing",),
-        ("Administrativo",),
-        ("Projetos",),
-        ("Consultoria & Ecossistema",),
-    ]
-    cur.executemany("INSERT OR IGNORE INTO teams(name) VALUES (?)", teams)
-
-    # Utilizadores
-    cur.execute("SELECT COUNT(*) AS c FROM users")
-    if cur.fetchone()["c"] == 0:
-        def h(p: str) -> str:
-            return hashlib.sha256(p.encode("utf-8")).hexdigest()
-
-        base_users = [
-            ("Vítor", "vitor@empresa.local", "1234", "CEO"),
-            ("Francisco", "francisco@empresa.local", "1234", "RESPONSAVEL"),
-            ("Natacha", "natacha@empresa.local", "1234", "MEMBRO"),
-            ("Mariana", "mariana@empresa.local", "1234", "MEMBRO"),
-            ("Nicole", "nicole@empresa.local", "1234", "ESTAGIARIO"),
-            ("Ana", "ana@empresa.local", "1234", "RESPONSAVEL"),
-            ("Paula", "paula@empresa.local", "1234", "MEMBRO"),
-            ("Bruno", "bruno@empresa.local", "1234", "RESPONSAVEL"),
-            ("Rita", "rita@empresa.local", "1234", "MEMBRO"),
-            ("Bernardo", "bernardo@empresa.local", "1234", "ESTAGIARIO"),
-            ("Luís Fonseca", "luis@empresa.local", "1234", "MEMBRO"),
-            ("Margarida", "margarida@empresa.local", "1234", "MEMBRO"),
-            ("Pacheco", "pacheco@empresa.local", "1234", "ESTAGIARIO"),
-            ("João", "joao@empresa.local", "1234", "RESPONSAVEL"),
-            ("Colaço", "colaco@empresa.local", "1234", "MEMBRO"),
-            ("Sandra", "sandra@empresa.local", "1234", "ESTAGIARIO"),
-            ("Cláudia", "claudia@empresa.local", "1234", "ESTAGIARIO"),
-        ]
-        cur.executemany(
-            "INSERT INTO users(name,email,password_hash,role) VALUES (?,?,?,?)",
-            [(n, e, h(p), r) for (n, e, p, r) in base_users],
-        )
-
-    # Ligações utilizador–equipa
-    cur.execute("SELECT COUNT(*) AS c FROM user_teams")
-    if cur.fetchone()["c"] == 0:
-        def user_id(email: str):
-            cur.execute("SELECT id FROM users WHERE email=?", (email,))
-            row = cur.fetchone()
-            return row["id"] if row else None
-
-        def team_id(name: str):
-            cur.execute("SELECT id FROM teams WHERE name=?", (name,))
-            row = cur.fetchone()
-            return row["id"] if row else None
-
-        links = []
-
-        # Marketing
-        for email in ["francisco@empresa.local", "natacha@empresa.local", "mariana@empresa.local", "nicole@empresa.local"]:
-            links.append((user_id(email), team_id("Marketing"), 1 if email == "francisco@empresa.local" else 0))
-
-        # Administrativo
-        for email in ["ana@empresa.local", "paula@empresa.local", "bruno@empresa.local", "rita@empresa.local", "bernardo@empresa.local"]:
-            links.append((user_id(email), team_id("Administrativo"), 1 if email == "ana@empresa.local" else 0))
-
-        # Projetos
-        for email in ["luis@empresa.local", "bruno@empresa.local", "margarida@empresa.local", "pacheco@empresa.local"]:
-            links.append((user_id(email), team_id("Projetos"), 1 if email == "bruno@empresa.local" else 0))
-
-        # Consultoria & Ecossistema
-        for email in [
-            "joao@empresa.local",
-            "colaco@empresa.local",
-            "francisco@empresa.local",
-            "vitor@empresa.local",
-            "bruno@empresa.local",
-            "margarida@empresa.local",
-            "luis@empresa.local",
-            "sandra@empresa.local",
-            "claudia@empresa.local",
-        ]:
-            links.append((user_id(email), team_id("Consultoria & Ecossistema"), 1 if email == "joao@empresa.local" else 0))
-
-        links = [l for l in links if l[0] is not None and l[1] is not None]
-        cur.executemany(
-            "INSERT OR IGNORE INTO user_teams(user_id,team_id,is_primary) VALUES (?,?,?)",
-            links,
-        )
-
-    # Competências
-    cur.execute("SELECT COUNT(*) AS c FROM competencies")
-    if cur.fetchone()["c"] == 0:
-        behavioral = [
-            ("Colaboração & Trabalho em Equipa",
-             "Contribui de forma construtiva para o trabalho em equipa e apoia colegas quando necessário.",
-             "BEHAVIORAL", None, 0, 1.0),
-            ("Comunicação",
-             "Comunica de forma clara, ajustando a mensagem ao interlocutor e ouvindo ativamente.",
-             "BEHAVIORAL", None, 0, 1.0),
-            ("Responsabilidade & Fiabilidade",
-             "Cumpre prazos, assume responsabilidade pelos erros e é alguém em quem se pode confiar.",
-             "BEHAVIORAL", None, 0, 1.0),
-            ("Orientação para Resultados",
-             "Mantém foco nos objetivos, prioriza bem e entrega trabalho com qualidade.",
-             "BEHAVIORAL", None, 0, 1.0),
-            ("Proatividade & Inovação",
-             "Antecipar problemas, propõe melhorias e está disponível para experimentar novas abordagens.",
-             "BEHAVIORAL", None, 0, 1.0),
-            ("Desenvolvimento & Aprendizagem Contínua",
-             "Procura feedback, atualiza conhecimentos e aprende com os erros.",
-             "BEHAVIORAL", None, 0, 1.0),
-            ("Liderança",
-             "Dá orientação clara, apoia a equipa e reconhece o contributo dos outros.",
-             "BEHAVIORAL", None, 1, 1.2),
-        ]
-        cur.executemany(
-            "INSERT INTO competencies(name,description,category,team_id,leadership_only,weight) VALUES (?,?,?,?,?,?)",
-            behavioral,
-        )
-
-        def t(name: str):
-            cur.execute("SELECT id FROM teams WHERE name=?", (name,))
-            r = cur.fetchone()
-            return r["id"] if r else None
-
-        marketing_comps = [
-            ("Planeamento & Execução de Campanhas",
-             "Planeia e executa campanhas alinhadas com os objetivos e prazos.",
-             "TECHNICAL", t("Marketing")),
-            ("Conteúdos & Copywriting",
-             "Produz conteúdos claros, relevantes e ajustados ao público-alvo.",
-             "TECHNICAL", t("Marketing")),
-            ("Gestão de Redes Sociais & Comunidade",
-             "Garante presença consistente e interação adequada com a comunidade.",
-             "TECHNICAL", t("Marketing")),
-            ("Análise de Métricas de Marketing",
-             "Usa dados e métricas para melhorar campanhas e decisões.",
-             "TECHNICAL", t("Marketing")),
-            ("Branding & Posicionamento",
-             "Respeita e reforça a identidade e posicionamento da marca.",
-             "TECHNICAL", t("Marketing")),
-        ]
-        cur.executemany(
-            "INSERT INTO competencies(name,description,category,team_id) VALUES (?,?,?,?)",
-            marketing_comps,
-        )
-
-        admin_comps = [
-            ("Organização & Gestão de Tarefas",
-             "Mantém processos e documentação bem organizados.",
-             "TECHNICAL", t("Administrativo")),
-            ("Rigor & Atenção ao Detalhe",
-             "Minimiza erros em registos, documentos e processos.",
-             "TECHNICAL", t("Administrativo")),
-            ("Cumprimento de Procedimentos",
-             "Segue procedimentos definidos e garante conformidade.",
-             "TECHNICAL", t("Administrativo")),
-            ("Apoio à Equipa & Atendimento",
-             "Responde de forma profissional a pedidos internos e externos.",
-             "TECHNICAL", t("Administrativo")),
-            ("Eficiência Operacional",
-             "Procura simplificar processos e usar bem as ferramentas digitais.",
-             "TECHNICAL", t("Administrativo")),
-        ]
-        cur.executemany(
-            "INSERT INTO competencies(name,description,category,team_id) VALUES (?,?,?,?)",
-            admin_comps,
-        )
-
-        proj_comps = [
-            ("Planeamento de Projetos",
-             "Define objetivos, fases, prazos e recursos de forma clara.",
-             "TECHNICAL", t("Projetos")),
-            ("Gestão de Stakeholders",
-             "Comunica e alinha expectativas com clientes, parceiros e equipa.",
-             "TECHNICAL", t("Projetos")),
-            ("Execução & Qualidade das Entregas",
-             "Entrega outputs com qualidade e de acordo com os standards acordados.",
-             "TECHNICAL", t("Projetos")),
-            ("Controlo de Prazos & Orçamento",
-             "Monitoriza prazos e custos, reagindo a desvios.",
-             "TECHNICAL", t("Projetos")),
-            ("Resolução de Problemas",
-             "Identifica riscos e propõe alternativas realistas.",
-             "TECHNICAL", t("Projetos")),
-        ]
-        cur.executemany(
-            "INSERT INTO competencies(name,description,category,team_id) VALUES (?,?,?,?)",
-            proj_comps,
-        )
-
-        cons_comps = [
-            ("Diagnóstico & Pensamento Crítico",
-             "Analisa a situação de clientes e parceiros com base em dados.",
-             "TECHNICAL", t("Consultoria & Ecossistema")),
-            ("Desenho de Soluções & Propostas de Valor",
-             "Cria propostas claras, realistas e alinhadas com a estratégia do cliente.",
-             "TECHNICAL", t("Consultoria & Ecossistema")),
-            ("Facilitação & Formação",
-             "Conduz reuniões, workshops e sessões de forma estruturada.",
-             "TECHNICAL", t("Consultoria & Ecossistema")),
-            ("Relação com Clientes & Parceiros",
-             "Constrói confiança e mantém follow-up adequado.",
-             "TECHNICAL", t("Consultoria & Ecossistema")),
-            ("Networking & Desenvolvimento de Ecossistema",
-             "Identifica e ativa oportunidades no ecossistema.",
-             "TECHNICAL", t("Consultoria & Ecossistema")),
-        ]
-        cur.executemany(
-            "INSERT INTO competencies(name,description,category,team_id) VALUES (?,?,?,?)",
-            cons_comps,
-        )
-
-        objective_comps = [
-            ("Cumprimento de Objetivos",
-             "Grau de cumprimento dos objetivos acordados para o período.",
-             "OBJECTIVES", None),
-            ("Alinhamento com Prioridades",
-             "Foco nas prioridades estratégicas da organização.",
-             "OBJECTIVES", None),
-            ("Qualidade dos Resultados",
-             "Impacto e qualidade dos resultados alcançados.",
-             "OBJECTIVES", None),
-        ]
-        cur.executemany(
-            "INSERT INTO competencies(name,description,category,team_id) VALUES (?,?,?,?)",
-            objective_comps,
-        )
-
-    # Período ativo inicial
-    cur.execute("SELECT id FROM evaluation_periods WHERE is_active=1 LIMIT 1")
-    row = cur.fetchone()
-    if not row:
-        today = date.today()
-        name = f"Avaliação {today.year}"
-        cur.execute(
-            "INSERT INTO evaluation_periods(name,start_date,end_date,is_active) VALUES (?,?,?,1)",
-            (name, str(today), str(today)),
-        )
-
-    conn.commit()
-    conn.close()
-
-def list_periods():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT ep.*,
-               (SELECT COUNT(*) FROM evaluation_assignments ea WHERE ea.period_id = ep.id) AS n_assignments
-        FROM evaluation_periods ep
-        ORDER BY start_date DESC, id DESC
-        """
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def create_period(name: str, start_date_str: str, end_date_str: str, make_active: bool = True):
-    conn = get_conn()
-    cur = conn.cursor()
-    if make_active:
-        cur.execute("UPDATE evaluation_periods SET is_active=0")
-    cur.execute(
-        "INSERT INTO evaluation_periods(name,start_date,end_date,is_active) VALUES (?,?,?,?)",
-        (name, start_date_str, end_date_str, 1 if make_active else 0),
-    )
-    period_id = cur.lastrowid
-    conn.commit()
-    conn.close()
-    return period_id
-
-def set_active_period(period_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE evaluation_periods SET is_active=0")
-    cur.execute("UPDATE evaluation_periods SET is_active=1 WHERE id=?", (period_id,))
-    conn.commit()
-    conn.close()
-
-def get_current_period_id():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM evaluation_periods WHERE is_active=1 ORDER BY start_date DESC, id DESC LIMIT 1")
-    row = cur.fetchone()
-    conn.close()
-    return row["id"] if row else None
-
-def get_user_by_email(email: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM users WHERE email=? AND is_active=1", (email,))
-    row = cur.fetchone()
-    conn.close()
-    return row
-
-def verify_password(password: str, password_hash: str) -> bool:
-    return hashlib.sha256(password.encode("utf-8")).hexdigest() == password_hash
-
-def shared_teams(user_a_id: int, user_b_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT t.id
-        FROM teams t
-        JOIN user_teams ua ON ua.team_id=t.id
-        JOIN user_teams ub ON ub.team_id=t.id
-        WHERE ua.user_id=? AND ub.user_id=?
-        """,
-        (user_a_id, user_b_id),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return [r["id"] for r in rows]
-
-def generate_assignments_for_period(period_id: int):
-    """Todos avaliam todos: CEO incluído como avaliador e como avaliado."""
-    conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute("SELECT id FROM users WHERE is_active=1")
-    users = [r["id"] for r in cur.fetchall()]
-
-    for evaluator in users:
-        for evaluatee in users:
-            include_behavioral = 1  # todos avaliam todos
-            shared = shared_teams(evaluator, evaluatee)
-            include_technical = 1 if shared else 0
-            include_objectives = 1 if shared else 0
-
-            if not (include_behavioral or include_technical or include_objectives):
-                continue
-
-            cur.execute(
-                """
-                INSERT OR IGNORE INTO evaluation_assignments
-                (period_id, evaluator_id, evaluatee_id, include_behavioral, include_technical, include_objectives)
-                VALUES (?,?,?,?,?,?)
-                """,
-                (period_id, evaluator, evaluatee, include_behavioral, include_technical, include_objectives),
-            )
-
-    conn.commit()
-    conn.close()
-
-def get_assignments_for_evaluator(user_id: int, period_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT ea.*, u.name AS evaluatee_name
-        FROM evaluation_assignments ea
-        JOIN users u ON u.id = ea.evaluatee_id
-        WHERE ea.evaluator_id=? AND ea.period_id=?
-        ORDER BY u.name
-        """,
-        (user_id, period_id),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def get_competencies_for_assignment(assignment):
-    conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute("SELECT role FROM users WHERE id=?", (assignment["evaluatee_id"],))
-    eve_role = cur.fetchone()["role"]
-
-    cur.execute("SELECT team_id FROM user_teams WHERE user_id=?", (assignment["evaluator_id"],))
-    eval_teams = [r["team_id"] for r in cur.fetchall()]
-    cur.execute("SELECT team_id FROM user_teams WHERE user_id=?", (assignment["evaluatee_id"],))
-    eve_teams = [r["team_id"] for r in cur.fetchall()]
-    shared = [t for t in eval_teams if t in eve_teams]
-
-    cur.execute("SELECT * FROM competencies WHERE active=1")
-    all_comps = cur.fetchall()
-    conn.close()
-
-    comps = []
-    for c in all_comps:
-        cat = c["category"]
-        if cat == "BEHAVIORAL":
-            if assignment["include_behavioral"] != 1:
-                continue
-            if c["leadership_only"] == 1 and eve_role not in ("CEO", "RESPONSAVEL"):
-                continue
-            comps.append(c)
-        elif cat == "OBJECTIVES":
-            if assignment["include_objectives"] != 1:
-                continue
-            comps.append(c)
-        elif cat == "TECHNICAL":
-            if assignment["include_technical"] != 1:
-                continue
-            if c["team_id"] is None:
-                continue
-            if c["team_id"] not in shared:
-                continue
-            comps.append(c)
-
-    return comps
-
-def get_existing_answers(assignment_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM evaluation_answers WHERE assignment_id=?", (assignment_id,))
-    rows = cur.fetchall()
-    conn.close()
-    return {r["competency_id"]: r for r in rows}
-
-def save_answers(assignment_id: int, answers):
-    conn = get_conn()
-    cur = conn.cursor()
-    for comp_id, (score, comment) in answers.items():
-        cur.execute(
-            """
-            INSERT INTO evaluation_answers(assignment_id, competency_id, score, comment)
-            VALUES (?,?,?,?)
-            ON CONFLICT(assignment_id, competency_id)
-            DO UPDATE SET score=excluded.score, comment=excluded.comment
-            """,
-            (assignment_id, comp_id, score, comment),
-        )
-    conn.commit()
-    conn.close()
-
-def get_my_scores(user_id: int, period_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT c.category, AVG(ea.score) AS avg_score
-        FROM evaluation_answers ea
-        JOIN evaluation_assignments a ON a.id = ea.assignment_id
-        JOIN competencies c ON c.id = ea.competency_id
-        WHERE a.evaluatee_id=? AND a.period_id=?
-        GROUP BY c.category
-        """,
-        (user_id, period_id),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def get_my_scores_over_time(user_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT ep.name AS period_name,
-               ep.start_date,
-               c.category,
-               AVG(ea.score) AS avg_score
-        FROM evaluation_answers ea
-        JOIN evaluation_assignments a ON a.id = ea.assignment_id
-        JOIN competencies c ON c.id = ea.competency_id
-        JOIN evaluation_periods ep ON ep.id = a.period_id
-        WHERE a.evaluatee_id=?
-        GROUP BY ep.id, ep.name, ep.start_date, c.category
-        ORDER BY ep.start_date, ep.id, c.category
-        """,
-        (user_id,),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def get_global_scores(period_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT u.name AS evaluatee_name,
-               c.category,
-               AVG(ea.score) AS avg_score
-        FROM evaluation_answers ea
-        JOIN evaluation_assignments a ON a.id = ea.assignment_id
-        JOIN competencies c ON c.id = ea.competency_id
-        JOIN users u ON u.id = a.evaluatee_id
-        WHERE a.period_id=?
-        GROUP BY u.name, c.category
-        ORDER BY u.name, c.category
-        """,
-        (period_id,),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def count_completed_assignments(assignments):
-    done = 0
-    total = len(assignments)
-    for a in assignments:
-        comps = get_competencies_for_assignment(a)
-        existing = get_existing_answers(a["id"])
-        if comps and len(existing) == len(comps):
-            done += 1
-    return done, total
+from av360 import archive, autosave, db, export, policies, profiling, roster, scoring, sessions
+from av360.answers import get_existing_answers, save_answers
+from av360.assignments import (
+    PAGE_SIZE,
+    get_assignment_progress,
+    get_assignments_page,
+    is_assignment_complete,
+    set_period_policy,
+    sync_assignments,
+)
+from av360.competencies import get_competencies_for_assignment
+from av360.periods import create_period, get_current_period_id, list_periods, set_active_period
+from av360.schema import ensure_db
+from av360.scoring import get_my_scores_over_time
+from av360.users import authenticate, list_teams
 
 # ---------- UI ----------
 
+EVALUATOR_TYPE_LABELS = {
+    "SELF": "Autoavaliação",
+    "SAME_TEAM": "Mesma equipa",
+    "CROSS_TEAM": "Outras equipas",
+}
+
 def inject_css():
     st.markdown(
         """
@@ -642,6 +68,21 @@ def inject_css():
         unsafe_allow_html=True,
     )
 
+def session_user(user):
+    return {
+        "id": user["id"],
+        "name": user["name"],
+        "email": user["email"],
+        "role": user["role"],
+    }
+
+def check_session():
+    """Mantém o utilizador só enquanto a sessão do servidor for válida (logout, desativação)."""
+    user = st.session_state.get("user")
+    if user is not None and sessions.verify(st.session_state.get("session_token")) != user["id"]:
+        st.session_state.user = None
+        st.session_state.session_token = None
+
 def login_screen():
     st.title("📊 Avaliação 360 da Equipa")
     st.markdown("Uma ferramenta simples para feedback honesto e alinhamento de expectativas.")
@@ -654,15 +95,11 @@ def login_screen():
         password = st.text_input("Password", type="password")
 
         if st.button("Entrar", type="primary", use_container_width=True):
-            user = get_user_by_email(email)
-            if user and verify_password(password, user["password_hash"]):
-                st.session_state.user = {
-                    "id": user["id"],
-                    "name": user["name"],
-                    "email": user["email"],
-                    "role": user["role"],
-                }
-                st.experimental_rerun()
+            user = authenticate(email, password)
+            if user:
+                st.session_state.session_token = sessions.issue(user["id"])
+                st.session_state.user = session_user(user)
+                st.rerun()
             else:
                 st.error("Credenciais inválidas.")
 
@@ -672,30 +109,69 @@ def login_screen():
         st.code("Email: vitor@empresa.local\nPassword: 1234")
         st.caption("O CEO também é avaliado – aparece nos resultados como qualquer outra pessoa.")
 
+CATEGORY_LABELS = {
+    "BEHAVIORAL": "Competências comportamentais",
+    "TECHNICAL": "Competências técnicas",
+    "OBJECTIVES": "Objetivos",
+}
+
+def _go_to_page(page: int):
+    st.session_state.eval_page = page
+
+def pick_assignment(user, period_id: int):
+    """Seletor paginado de quem avaliar: pesquisa, equipa e só pendentes.
+
+    Só a página atual é lida e desenhada, pelo que o custo de cada rerun
+    depende do tamanho da página e não do número de colegas.
+    """
+    col1, col2, col3 = st.columns([3, 2, 1])
+    search = col1.text_input("Pesquisar por nome", key="eval_search").strip()
+    teams = {"Todas as equipas": None, **{t["name"]: t["id"] for t in list_teams()}}
+    team_id = teams[col2.selectbox("Equipa", list(teams), key="eval_team")]
+    pending_only = col3.checkbox("Só pendentes", key="eval_pending")
+
+    # Mudar os filtros volta à primeira página
+    filters = (search, team_id, pending_only)
+    if st.session_state.get("eval_filters") != filters:
+        st.session_state.eval_filters = filters
+        st.session_state.eval_page = 0
+    page = st.session_state.get("eval_page", 0)
+
+    rows, total = get_assignments_page(user["id"], period_id, search, team_id, pending_only, page)
+    if not rows and page > 0:
+        page = st.session_state.eval_page = 0
+        rows, total = get_assignments_page(user["id"], period_id, search, team_id, pending_only, page)
+    if not rows:
+        st.info("Ninguém corresponde aos filtros.")
+        return None
+
+    n_pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+    if n_pages > 1:
+        prev_col, info_col, next_col = st.columns([1, 3, 1])
+        prev_col.button("◀", disabled=page == 0, on_click=_go_to_page, args=(page - 1,))
+        info_col.caption(f"Página {page + 1} de {n_pages} · {total} pessoas")
+        next_col.button("▶", disabled=page >= n_pages - 1, on_click=_go_to_page, args=(page + 1,))
+
+    options = {f"{a['evaluatee_name']} {'✅' if is_assignment_complete(a) else '•'}": a for a in rows}
+    label = st.selectbox("Escolha quem quer avaliar", list(options.keys()))
+    return options[label]
+
 def page_my_evaluations(user, period_id: int):
     st.title("📝 Minhas avaliações")
 
-    assignments = get_assignments_for_evaluator(user["id"], period_id)
-    if not assignments:
+    done, total = get_assignment_progress(user["id"], period_id)
+    if not total:
         st.info("Não tem avaliações atribuídas neste período.")
         return
 
-    done, total = count_completed_assignments(assignments)
     progress = done / total if total else 0
 
     st.markdown("#### Progresso geral")
     st.progress(progress, text=f"{done} de {total} avaliações concluídas")
 
-    options = {}
-    for a in assignments:
-        comps = get_competencies_for_assignment(a)
-        existing = get_existing_answers(a["id"])
-        is_done = comps and len(existing) == len(comps)
-        label = f"{a['evaluatee_name']} {'✅' if is_done else '•'}"
-        options[label] = a
-
-    label = st.selectbox("Escolha quem quer avaliar", list(options.keys()))
-    assignment = options[label]
+    assignment = pick_assignment(user, period_id)
+    if assignment is None:
+        return
 
     st.markdown(
         f"""
@@ -714,50 +190,105 @@ def page_my_evaluations(user, period_id: int):
     comps = get_competencies_for_assignment(assignment)
     existing = get_existing_answers(assignment["id"])
 
+    # Uma categoria de cada vez: só os widgets dessa secção são desenhados
+    by_category = {}
+    for c in comps:
+        by_category.setdefault(c["category"], []).append(c)
+    sections = [cat for cat in CATEGORY_LABELS if cat in by_category]
+    if not sections:
+        st.info("Não há competências a avaliar para esta pessoa.")
+        return
+
+    def section_label(cat):
+        answered = sum(c["id"] in existing for c in by_category[cat])
+        return f"{CATEGORY_LABELS[cat]} ({answered}/{len(by_category[cat])})"
+
+    cat = st.radio("Secção", sections, format_func=section_label, horizontal=True,
+                   key=f"section_{assignment['id']}")
+    cat_comps = by_category[cat]
+
+    if st.checkbox("Gravação automática", value=True, key="autosave",
+                   help="Cada alteração é gravada em segundo plano, sem recarregar a página."):
+        autosave_section(assignment["id"], cat, cat_comps)
+        return
+
     answers = {}
-    with st.form("form_avaliacao"):
-        categories_labels = {
-            "BEHAVIORAL": "Competências comportamentais",
-            "TECHNICAL": "Competências técnicas",
-            "OBJECTIVES": "Objetivos",
-        }
+    with st.form(f"form_avaliacao_{assignment['id']}_{cat}"):
+        st.markdown(f"### {CATEGORY_LABELS[cat]}")
+        for c in cat_comps:
+            answers[c["id"]] = competency_inputs(assignment["id"], c, existing)
 
-        for cat in ["BEHAVIORAL", "TECHNICAL", "OBJECTIVES"]:
-            cat_comps = [c for c in comps if c["category"] == cat]
-            if not cat_comps:
-                continue
-
-            st.markdown(f"### {categories_labels[cat]}")
-            for c in cat_comps:
-                comp_id = c["id"]
-                st.markdown(f"**{c['name']}**")
-                if c["description"]:
-                    st.caption(c["description"])
-
-                cols = st.columns([1, 3])
-                with cols[0]:
-                    default_score = existing.get(comp_id, {}).get("score", 3)
-                    score = st.slider("Pontuação", 1, 5, int(default_score), key=f"score_{comp_id}")
-                with cols[1]:
-                    comment_default = existing.get(comp_id, {}).get("comment", "") if existing.get(comp_id) else ""
-                    comment = st.text_area(
-                        "Comentário (opcional)",
-                        value=comment_default,
-                        key=f"comment_{comp_id}",
-                    )
-                st.markdown("---")
-                answers[comp_id] = (score, comment)
-
-        submitted = st.form_submit_button("💾 Guardar avaliação")
+        submitted = st.form_submit_button("💾 Guardar esta secção")
         if submitted:
             save_answers(assignment["id"], answers)
             st.success("Avaliação guardada com sucesso.")
-            st.experimental_rerun()
+            st.rerun()
+
+def competency_inputs(assignment_id: int, c, existing, on_change=None):
+    """Slider e comentário de uma competência; devolve (pontuação, comentário)."""
+    comp_id = c["id"]
+    key = f"{assignment_id}_{comp_id}"
+    args = (assignment_id, comp_id) if on_change else None
+    st.markdown(f"**{c['name']}**")
+    if c["description"]:
+        st.caption(c["description"])
+
+    cols = st.columns([1, 3])
+    with cols[0]:
+        default_score = existing.get(comp_id, {}).get("score", 3)
+        score = st.slider("Pontuação", 1, 5, int(default_score), key=f"score_{key}",
+                          on_change=on_change, args=args)
+    with cols[1]:
+        comment_default = existing.get(comp_id, {}).get("comment", "") if existing.get(comp_id) else ""
+        comment = st.text_area(
+            "Comentário (opcional)",
+            value=comment_default,
+            key=f"comment_{key}",
+            on_change=on_change,
+            args=args,
+        )
+    st.markdown("---")
+    return score, comment
+
+def _queue_draft(assignment_id: int, comp_id: int):
+    key = f"{assignment_id}_{comp_id}"
+    autosave.get_writer().queue(
+        assignment_id, comp_id, st.session_state[f"score_{key}"], st.session_state.get(f"comment_{key}") or "",
+    )
+
+# Só o fragmento volta a correr quando um dos seus widgets muda (não a página toda)
+@st.fragment
+def autosave_section(assignment_id: int, cat: str, cat_comps):
+    """Secção do formulário com gravação automática e progresso local."""
+    writer = autosave.get_writer()
+    existing = get_existing_answers(assignment_id)
+    st.markdown(f"### {CATEGORY_LABELS[cat]}")
+    for c in cat_comps:
+        competency_inputs(assignment_id, c, existing, on_change=_queue_draft)
+
+    pending = writer.pending(assignment_id)
+    answered = sum(c["id"] in existing or (assignment_id, c["id"]) in pending for c in cat_comps)
+    st.progress(answered / len(cat_comps), text=f"{answered} de {len(cat_comps)} respondidas nesta secção")
+    last_flush, last_error = writer.status(assignment_id)
+    if last_error is not None:
+        st.warning(f"Não foi possível gravar o rascunho ({last_error}); nova tentativa em breve.")
+    elif pending:
+        st.caption(f"⏳ {len(pending)} alterações por gravar…")
+    elif last_flush is not None:
+        st.caption(f"✔ Gravado às {datetime.fromtimestamp(last_flush):%H:%M:%S}")
+
+    if st.button("💾 Guardar esta secção", key=f"save_{assignment_id}_{cat}",
+                 help="Grava também as pontuações que ficaram no valor por omissão."):
+        for c in cat_comps:
+            _queue_draft(assignment_id, c["id"])
+        writer.flush()
+        st.success("Avaliação guardada com sucesso.")
+        st.rerun()
 
 def page_my_results(user, period_id: int):
     st.title("📈 Os meus resultados (período atual)")
 
-    scores = get_my_scores(user["id"], period_id)
+    scores = scoring.get_category_scores(period_id, user["id"])
     if not scores:
         st.info("Ainda não existem resultados registados para si neste período.")
     else:
@@ -780,11 +311,21 @@ def page_my_results(user, period_id: int):
             unsafe_allow_html=True,
         )
 
-        cols = st.columns(len(scores))
-        for col, r in zip(cols, scores):
+        overall = scoring.get_overall_scores(period_id, user["id"])[0]
+        cols = st.columns(len(scores) + 1)
+        cols[0].metric("Global", f"{overall['score']:.2f} / 5")
+        for col, r in zip(cols[1:], scores):
             with col:
                 label = cat_labels.get(r["category"], r["category"])
-                col.metric(label, f"{r['avg_score']:.2f} / 5")
+                col.metric(label, f"{r['score']:.2f} / 5")
+
+        st.markdown("#### Por tipo de avaliador")
+        by_type = scoring.load_period_scores(period_id, user["id"]).evaluator_type_scores()
+        by_type["Categoria"] = by_type["category"].map(cat_labels).fillna(by_type["category"])
+        st.dataframe(
+            by_type.rename(columns=EVALUATOR_TYPE_LABELS)[["Categoria", *EVALUATOR_TYPE_LABELS.values()]],
+            use_container_width=True,
+        )
 
     st.markdown("---")
     st.subheader("📊 Evolução ao longo dos períodos")
@@ -795,7 +336,7 @@ def page_my_results(user, period_id: int):
         st.info("Ainda não há histórico suficiente (é necessário ter mais do que um período com avaliações).")
         return
 
-    df = pd.DataFrame(history)
+    df = pd.DataFrame([dict(h) for h in history])
     cat_labels = {
         "BEHAVIORAL": "Comportamentais",
         "TECHNICAL": "Técnicas",
@@ -816,19 +357,21 @@ def page_ceo_dashboard(period_id: int):
     st.title("📊 Painel do CEO")
     st.caption("Visão global das avaliações – incluindo o próprio CEO como avaliado.")
 
-    scores = get_global_scores(period_id)
-    if not scores:
+    render_export_section(period_id)
+
+    category_scores = scoring.get_category_scores(period_id)
+    if not category_scores:
         st.info("Ainda não existem resultados suficientes.")
         return
 
-    df = pd.DataFrame(scores)
     cat_labels = {
         "BEHAVIORAL": "Comportamentais",
         "TECHNICAL": "Técnicas",
         "OBJECTIVES": "Objetivos",
     }
+    df = pd.DataFrame([dict(r) for r in category_scores])
     df["Categoria"] = df["category"].map(cat_labels).fillna(df["category"])
-    df.rename(columns={"evaluatee_name": "Pessoa", "avg_score": "Média"}, inplace=True)
+    df.rename(columns={"evaluatee_name": "Pessoa", "score": "Média"}, inplace=True)
     df = df[["Pessoa", "Categoria", "Média"]]
 
     st.markdown(
@@ -848,9 +391,115 @@ def page_ceo_dashboard(period_id: int):
     st.dataframe(df, use_container_width=True)
 
     st.subheader("Comparação visual (período atual)")
-    pivot = df.pivot(index="Pessoa", columns="Categoria", values="Média")
+    pivot = df.pivot_table(index="Pessoa", columns="Categoria", values="Média")
     st.bar_chart(pivot)
 
+    st.subheader("Média global por pessoa")
+    overall = pd.DataFrame([dict(r) for r in scoring.get_overall_scores(period_id)]).rename(
+        columns={"evaluatee_name": "Pessoa", "score": "Média", "n_answers": "Nº respostas"}
+    )
+    st.dataframe(overall[["Pessoa", "Média", "Nº respostas"]], use_container_width=True)
+
+    # Estas vistas precisam das respostas do período inteiro: só a pedido
+    if not st.checkbox("Mostrar médias por tipo de avaliador e distribuição das pontuações"):
+        return
+    scores = scoring.load_period_scores(period_id)
+    st.subheader("Médias por tipo de avaliador")
+    by_type = scores.evaluator_type_scores()
+    by_type["Categoria"] = by_type["category"].map(cat_labels).fillna(by_type["category"])
+    by_type = by_type.rename(columns={"evaluatee_name": "Pessoa", **EVALUATOR_TYPE_LABELS})
+    st.dataframe(by_type[["Pessoa", "Categoria", *EVALUATOR_TYPE_LABELS.values()]], use_container_width=True)
+
+    st.subheader("Distribuição das pontuações")
+    dist = scores.distribution()
+    dist["category"] = dist["category"].map(cat_labels).fillna(dist["category"])
+    st.dataframe(dist.rename(columns={"category": "Categoria"}), use_container_width=True)
+
+def render_export_section(period_id: int):
+    with st.expander("⬇️ Exportar dados"):
+        kind_labels = {"answers": "Respostas individuais", "aggregates": "Médias agregadas"}
+        team_options = {"Todas as equipas": None, **{t["name"]: t["id"] for t in list_teams()}}
+        c1, c2, c3, c4 = st.columns(4)
+        kind = c1.selectbox("Dados", list(kind_labels), format_func=kind_labels.get)
+        fmt = c2.selectbox("Formato", export.FORMATS)
+        scope = c3.selectbox("Períodos", ["Período atual", "Todos"])
+        team = c4.selectbox("Equipa (avaliado)", list(team_options))
+        if st.button("Preparar exportação"):
+            out = tempfile.TemporaryFile()
+            filters = {
+                "period_id": period_id if scope == "Período atual" else None,
+                "team_id": team_options[team],
+            }
+            try:
+                if fmt == "parquet":
+                    n = export.write_parquet(out, kind, **filters)
+                else:
+                    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+                    n = export.write_csv(text, kind, **filters)
+                    text.flush()
+                    text.detach()
+            except ValueError as e:
+                st.error(str(e))
+                return
+            out.seek(0)
+            st.download_button(
+                f"Descarregar {n} linhas",
+                data=out.read(),
+                file_name=f"avaliacao360_{kind}.{fmt}",
+                mime="text/csv" if fmt == "csv" else "application/octet-stream",
+            )
+
+POLICY_HELP = (
+    "full: todos avaliam todos · team: quem partilha equipa · manager: responsáveis e as suas equipas. "
+    "Parâmetros opcionais: k (número esperado, não máximo, de colegas de outras equipas sorteados "
+    "por avaliador), "
+    "cap (máximo de avaliadores por pessoa), seed. Ex.: team:k=3,cap=12"
+)
+
+def render_archived_period(period):
+    summary = archive.get_summary(period["id"])
+    st.info(
+        f"Período arquivado em {period['archived_at']}: {summary['n_assignments']} assignments, "
+        f"{summary['n_answers']} respostas. As médias continuam disponíveis no histórico."
+    )
+    if st.button("Repor este período"):
+        restored = db.submit_write(archive.restore_period, period["id"]).result()
+        st.success(f"Período reposto ({restored['evaluation_answers']} respostas).")
+        st.rerun()
+
+def render_period_controls(period):
+    target_id = period["id"]
+    if st.button("Tornar este período o ativo"):
+        set_active_period(target_id)
+        st.success("Período ativo atualizado.")
+        st.rerun()
+    if not period["is_active"] and st.button(
+        "Arquivar este período",
+        help="Move os assignments e respostas para tabelas de arquivo; ficam as contagens e as médias.",
+    ):
+        summary = db.submit_write(archive.archive_period, target_id).result()
+        st.success(f"Período arquivado ({summary['n_assignments']} assignments, {summary['n_answers']} respostas).")
+        st.rerun()
+    current_policy = period["assignment_policy"]
+    new_policy = st.text_input("Política de atribuição deste período", value=current_policy,
+                               help=POLICY_HELP, key=f"policy_{target_id}")
+    if new_policy != current_policy and st.button("Aplicar política"):
+        try:
+            report = db.submit_write(set_period_policy, target_id, new_policy).result()
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.success(
+                f"Política aplicada ({report.inserted} novos, {report.updated} atualizados, "
+                f"{report.removed} removidos)."
+            )
+    if st.button("Ressincronizar assignments deste período"):
+        report = db.submit_write(sync_assignments, target_id, force=True).result()
+        st.success(
+            f"Assignments sincronizados ({report.inserted} novos, {report.updated} atualizados, "
+            f"{report.removed} removidos)."
+        )
+
 def page_period_management():
     st.title("🗓 Gestão de períodos de avaliação")
 
@@ -865,7 +514,9 @@ def page_period_management():
                 "Início": p["start_date"],
                 "Fim": p["end_date"],
                 "Ativo": "Sim" if p["is_active"] == 1 else "Não",
+                "Política": p["assignment_policy"],
                 "Nº assignments": p["n_assignments"],
+                "Arquivado": p["archived_at"] or "",
             })
         st.dataframe(pd.DataFrame(data), use_container_width=True)
     else:
@@ -881,15 +532,20 @@ def page_period_management():
     with col2:
         end = st.date_input("Data de fim", value=date.today())
         make_active = st.checkbox("Definir como período ativo", value=True)
+    policy = st.text_input("Política de atribuição", value=policies.DEFAULT_POLICY, help=POLICY_HELP)
 
     if st.button("Criar novo período", type="primary"):
         if end < start:
             st.error("A data de fim não pode ser anterior à data de início.")
         else:
-            pid = create_period(name, str(start), str(end), make_active=make_active)
-            generate_assignments_for_period(pid)
-            st.success(f"Período '{name}' criado com sucesso e assignments gerados.")
-            st.experimental_rerun()
+            try:
+                pid = create_period(name, str(start), str(end), make_active=make_active, policy=policy)
+            except ValueError as e:
+                st.error(str(e))
+                return
+            report = db.submit_write(sync_assignments, pid, force=True).result()
+            st.success(f"Período '{name}' criado com sucesso e {report.inserted} assignments gerados.")
+            st.rerun()
 
     st.markdown("---")
     st.subheader("Mudar período ativo")
@@ -899,15 +555,62 @@ def page_period_management():
         options = {f"{p['name']} ({p['start_date']} a {p['end_date']})": p["id"] for p in periods}
         label = st.selectbox("Escolha o período a ativar", list(options.keys()))
         target_id = options[label]
-        if st.button("Tornar este período o ativo"):
-            set_active_period(target_id)
-            st.success("Período ativo atualizado.")
-            st.experimental_rerun()
+        target = next(p for p in periods if p["id"] == target_id)
+        if target["archived_at"]:
+            render_archived_period(target)
+        else:
+            render_period_controls(target)
     else:
         st.info("Sem períodos disponíveis para seleção.")
 
+    st.markdown("---")
+    st.subheader("Importar colaboradores")
+    st.caption(
+        "CSV ou Excel com uma linha por pessoa e equipa: email, name, team e, opcionalmente, "
+        "role, password, is_primary, is_active. As equipas de quem está no ficheiro passam a ser as indicadas."
+    )
+    uploaded = st.file_uploader("Ficheiro de colaboradores", type=["csv", "xlsx"])
+    dry_run = st.checkbox("Apenas simular (não gravar)", value=True)
+    if uploaded is not None and st.button("Importar"):
+        try:
+            report = db.submit_write(
+                roster.import_roster, uploaded, filename=uploaded.name, dry_run=dry_run
+            ).result()
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Novos utilizadores", len(report.users_created))
+            c2.metric("Atualizados", len(report.users_updated))
+            c3.metric("Equipas novas", len(report.teams_created))
+            c4.metric("Ligações +/−", f"+{report.memberships_added} / −{report.memberships_removed}")
+            if report.errors:
+                st.warning(f"{len(report.errors)} linhas com erros (ignoradas).")
+                st.dataframe(pd.DataFrame(report.errors, columns=["Linha", "Erro"]), use_container_width=True)
+            if dry_run:
+                st.info("Simulação: nada foi gravado.")
+            else:
+                st.success(f"Importação concluída ({report.rows} linhas).")
+
 # ---------- MAIN ----------
 
+def render_profile_panel(profile):
+    summary = profile.summary()
+    with st.sidebar.expander("⏱ Perfil desta execução", expanded=True):
+        c1, c2 = st.columns(2)
+        c1.metric("Statements", summary["statements"])
+        c2.metric("SQL (ms)", f"{summary['sql_ms']:.1f}")
+        c1.metric("Checkouts", summary["checkouts"])
+        c2.metric("Ligações novas", summary["connections"])
+        st.caption(f"Tempo total do rerun: {summary['wall_ms']:.1f} ms")
+        slowest = profile.slowest(10)
+        if slowest:
+            st.markdown("**Statements mais lentos**")
+            st.dataframe(
+                pd.DataFrame(slowest)[["ms", "rows", "call_site", "sql"]],
+                use_container_width=True,
+            )
+
 def main():
     st.set_page_config(
         page_title="Avaliação 360",
@@ -915,16 +618,29 @@ def main():
         layout="wide",
     )
 
+    profile = None
+    if profiling.ENABLED or st.session_state.get("profile_queries"):
+        profile = profiling.start("rerun")
+    try:
+        run_app()
+    finally:
+        if profile is not None:
+            profiling.stop()
+            profiling.export(profile)
+
+    user = st.session_state.get("user")
+    if profile is not None and user and user["role"] == "CEO":
+        render_profile_panel(profile)
+
+def run_app():
     inject_css()
-    setup_db()
+    ensure_db()
     period_id = get_current_period_id()
     if period_id is not None:
-        generate_assignments_for_period(period_id)
-
-    if "user" not in st.session_state:
-        st.session_state.user = None
+        sync_assignments(period_id)
 
-    if st.session_state.user is None:
+    check_session()
+    if st.session_state.get("user") is None:
         login_screen()
         return
 
@@ -934,8 +650,11 @@ def main():
         st.markdown(f"👤 **{user['name']}**")
         st.markdown(f"`{user['role']}`")
         if st.button("Terminar sessão", use_container_width=True):
+            if st.session_state.get("session_token"):
+                sessions.revoke(st.session_state.session_token)
             st.session_state.user = None
-            st.experimental_rerun()
+            st.session_state.session_token = None
+            st.rerun()
 
         menu = ["Minhas avaliações", "Os meus resultados"]
         if user["role"] == "CEO":
@@ -944,7 +663,8 @@ def main():
 
         choice = st.radio("Navegação", menu)
 
-    period_id = get_current_period_id()
+        if user["role"] == "CEO":
+            st.checkbox("Perfil de queries", key="profile_queries")
 
     if period_id is None:
         st.error("Não foi possível determinar o período ativo.")
@@ -0,0 +1 @@
+"""Avaliação 360: camada de dados partilhada pela app Streamlit e por scripts."""
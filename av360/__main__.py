@@ -0,0 +1,5 @@
+import sys
+
+from av360.cli import main
+
+sys.exit(main())
@@ -0,0 +1,67 @@
+"""Leitura e gravação das respostas aos formulários de avaliação."""
+from av360 import db, scoring
+
+
+def get_existing_answers(assignment_id: int):
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM evaluation_answers WHERE assignment_id=?", (assignment_id,))
+        rows = cur.fetchall()
+    return {r["competency_id"]: dict(r) for r in rows}
+
+
+# Limite prudente de parâmetros por statement (SQLITE_MAX_VARIABLE_NUMBER antigo)
+SQL_PARAMS_CHUNK = 900
+
+
+def save_answers_bulk(rows):
+    """Grava muitas respostas de uma vez, possivelmente de vários assignments.
+
+    ``rows`` são tuplos (assignment_id, competency_id, score, comment). Tudo é
+    escrito com um único executemany dentro de uma transação. Devolve
+    (inseridas, atualizadas).
+    """
+    rows = list(rows)
+    if not rows:
+        return 0, 0
+    keys = {(r[0], r[1]) for r in rows}
+    assignment_ids = sorted({k[0] for k in keys})
+
+    with db.transaction() as conn:
+        cur = conn.cursor()
+        existing, period_ids = set(), set()
+        for i in range(0, len(assignment_ids), SQL_PARAMS_CHUNK):
+            chunk = assignment_ids[i:i + SQL_PARAMS_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            cur.execute(
+                f"SELECT assignment_id, competency_id FROM evaluation_answers "
+                f"WHERE assignment_id IN ({placeholders})",
+                chunk,
+            )
+            existing.update((r["assignment_id"], r["competency_id"]) for r in cur.fetchall())
+            # Só as leituras em cache destes períodos ficam desatualizadas
+            cur.execute(
+                f"SELECT DISTINCT period_id FROM evaluation_assignments WHERE id IN ({placeholders})",
+                chunk,
+            )
+            period_ids.update(r["period_id"] for r in cur.fetchall())
+        cur.executemany(
+            """
+            INSERT INTO evaluation_answers(assignment_id, competency_id, score, comment)
+            VALUES (?,?,?,?)
+            ON CONFLICT(assignment_id, competency_id)
+            DO UPDATE SET score=excluded.score, comment=excluded.comment
+            """,
+            rows,
+        )
+    scoring.invalidate_periods(period_ids)
+
+    updated = len(keys & existing)
+    return len(keys) - updated, updated
+
+
+def save_answers(assignment_id: int, answers):
+    """Grava o formulário de um assignment ({competency_id: (score, comment)})."""
+    return save_answers_bulk(
+        (assignment_id, comp_id, score, comment) for comp_id, (score, comment) in answers.items()
+    )
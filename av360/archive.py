@@ -0,0 +1,130 @@
+"""Arquivo de períodos fechados.
+
+Todos os períodos partilham ``evaluation_assignments`` e ``evaluation_answers``,
+pelo que o histórico pesa nas leituras do período ativo. Arquivar um período
+fechado move as suas linhas para tabelas próprias (``archive_p<id>_assignments``
+e ``archive_p<id>_answers``) e deixa um resumo: as contagens em
+``period_summaries`` e as médias em ``score_aggregates``, que é o que a listagem
+de períodos e a evolução ao longo dos períodos já leem. :func:`restore_period`
+devolve as linhas às tabelas vivas.
+
+As tabelas de arquivo ficam na mesma base de dados (e não em ficheiros SQLite
+anexados com ``ATTACH``) para funcionar da mesma forma no PostgreSQL.
+
+    python -m av360 archive-period 3
+"""
+from datetime import datetime
+
+from av360 import cache, db, scoring
+
+# tabela viva -> sufixo da tabela de arquivo; as respostas apontam para os assignments
+LIVE_TABLES = {
+    "evaluation_assignments": "assignments",
+    "evaluation_answers": "answers",
+}
+
+PERIOD_ROWS = {
+    "evaluation_assignments": "period_id = ?",
+    "evaluation_answers": "assignment_id IN (SELECT id FROM evaluation_assignments WHERE period_id = ?)",
+}
+
+
+def archive_table(period_id: int, table: str) -> str:
+    return f"archive_p{int(period_id)}_{LIVE_TABLES[table]}"
+
+
+def _period(cur, period_id: int):
+    row = cur.execute(
+        "SELECT name, is_active, archived_at FROM evaluation_periods WHERE id=?", (period_id,)
+    ).fetchone()
+    if row is None:
+        raise ValueError(f"Período desconhecido: {period_id}")
+    return row
+
+
+def archive_period(period_id: int) -> dict:
+    """Arquiva um período fechado; devolve o resumo que fica (contagens)."""
+    with db.transaction() as conn:
+        cur = conn.cursor()
+        period = _period(cur, period_id)
+        if period["archived_at"]:
+            raise ValueError(f"O período '{period['name']}' já está arquivado.")
+        if period["is_active"]:
+            raise ValueError("Não é possível arquivar o período ativo.")
+
+        for table in LIVE_TABLES:
+            archive = archive_table(period_id, table)
+            cur.execute(f"CREATE TABLE {archive} AS SELECT * FROM {table} WHERE 1=0")
+            cur.execute(f"INSERT INTO {archive} SELECT * FROM {table} WHERE {PERIOD_ROWS[table]}", (period_id,))
+
+        assignments_table = archive_table(period_id, "evaluation_assignments")
+        answers_table = archive_table(period_id, "evaluation_answers")
+        # As respostas de assignments removidos ficam no arquivo mas não contam
+        kept = f"(SELECT id FROM {assignments_table} WHERE removed_at IS NULL)"
+        summary = dict(cur.execute(
+            f"""
+            SELECT (SELECT COUNT(*) FROM {assignments_table} WHERE removed_at IS NULL) AS n_assignments,
+                   (SELECT COUNT(DISTINCT assignment_id) FROM {answers_table}
+                    WHERE assignment_id IN {kept}) AS n_answered,
+                   (SELECT COUNT(*) FROM {answers_table} WHERE assignment_id IN {kept}) AS n_answers,
+                   (SELECT COUNT(DISTINCT evaluatee_id) FROM {assignments_table}
+                    WHERE removed_at IS NULL) AS n_evaluatees
+            """
+        ).fetchone())
+        cur.execute(
+            "INSERT INTO period_summaries(period_id, n_assignments, n_answered, n_answers, n_evaluatees) "
+            "VALUES (?,?,?,?,?)",
+            (period_id, summary["n_assignments"], summary["n_answered"], summary["n_answers"],
+             summary["n_evaluatees"]),
+        )
+
+        # As médias do período ficam como estão: guardam-se antes de apagar as
+        # respostas (os triggers descontá-las-iam) e repõem-se no fim.
+        aggregates = cur.execute("SELECT * FROM score_aggregates WHERE period_id=?", (period_id,)).fetchall()
+        cur.execute("DELETE FROM score_aggregates WHERE period_id=?", (period_id,))
+        for table in reversed(list(LIVE_TABLES)):
+            cur.execute(f"DELETE FROM {table} WHERE {PERIOD_ROWS[table]}", (period_id,))
+        if aggregates:
+            columns = list(aggregates[0].keys())
+            cur.executemany(
+                f"INSERT INTO score_aggregates({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [tuple(r) for r in aggregates],
+            )
+        cur.execute(
+            "UPDATE evaluation_periods SET archived_at=? WHERE id=?",
+            (datetime.now().isoformat(timespec="seconds"), period_id),
+        )
+    cache.invalidate("periods")
+    scoring.invalidate_periods([period_id])
+    return summary
+
+
+def restore_period(period_id: int) -> dict:
+    """Devolve às tabelas vivas as linhas de um período arquivado; devolve {tabela: linhas}."""
+    restored = {}
+    with db.transaction() as conn:
+        cur = conn.cursor()
+        period = _period(cur, period_id)
+        if not period["archived_at"]:
+            raise ValueError(f"O período '{period['name']}' não está arquivado.")
+
+        # As médias refazem-se pelos triggers à medida que as respostas voltam
+        cur.execute("DELETE FROM score_aggregates WHERE period_id=?", (period_id,))
+        for table in LIVE_TABLES:
+            archive = archive_table(period_id, table)
+            columns = ", ".join(d[0] for d in cur.execute(f"SELECT * FROM {archive} WHERE 1=0").description)
+            cur.execute(f"INSERT INTO {table}({columns}) SELECT {columns} FROM {archive}")
+            restored[table] = cur.rowcount
+        for table in reversed(list(LIVE_TABLES)):
+            cur.execute(f"DROP TABLE {archive_table(period_id, table)}")
+        cur.execute("DELETE FROM period_summaries WHERE period_id=?", (period_id,))
+        cur.execute("UPDATE evaluation_periods SET archived_at=NULL WHERE id=?", (period_id,))
+    cache.invalidate("periods")
+    scoring.invalidate_periods([period_id])
+    return restored
+
+
+def get_summary(period_id: int):
+    """Contagens de um período arquivado (None se não estiver arquivado)."""
+    with db.connection() as conn:
+        return conn.execute("SELECT * FROM period_summaries WHERE period_id=?", (period_id,)).fetchone()
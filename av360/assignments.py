@@ -0,0 +1,287 @@
+"""Assignments (quem avalia quem): geração da matriz de cada período e leitura por avaliador."""
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+from av360 import cache, db, periods, policies, scoring
+from av360.answers import SQL_PARAMS_CHUNK
+
+
+@dataclass
+class SyncReport:
+    inserted: int = 0
+    updated: int = 0  # flags alteradas ou assignment reposto
+    removed: int = 0  # marcados com removed_at
+
+    def __bool__(self):
+        return bool(self.inserted or self.updated or self.removed)
+
+
+def get_period_policy(period_id: int) -> policies.Policy:
+    period = periods.get_period(period_id)
+    return policies.parse_policy(period["assignment_policy"] if period else None)
+
+
+def _existing_assignments(cur, period_id: int, column: str = None, user_ids=()) -> dict:
+    """{(avaliador, avaliado): (id, include_technical, include_objectives, removed_at)} no âmbito."""
+    sql = ("SELECT id, evaluator_id, evaluatee_id, include_behavioral, include_technical, include_objectives, "
+           "removed_at FROM evaluation_assignments WHERE period_id=?")
+    if column is None:
+        batches = [cur.execute(sql, (period_id,)).fetchall()]
+    else:
+        ids = sorted(user_ids)
+        batches = (
+            cur.execute(f"{sql} AND {column} IN ({','.join('?' * len(chunk))})", [period_id, *chunk]).fetchall()
+            for chunk in (ids[i:i + SQL_PARAMS_CHUNK] for i in range(0, len(ids), SQL_PARAMS_CHUNK))
+        )
+    return {(r["evaluator_id"], r["evaluatee_id"]): r for batch in batches for r in batch}
+
+
+# Classe do advisory lock do PostgreSQL que serializa reconcile_assignments por período
+RECONCILE_LOCK = 360
+
+
+def reconcile_assignments(period_id: int, user_ids=None, policy: policies.Policy = None) -> SyncReport:
+    """Acerta a matriz de assignments do período com a política e as equipas atuais.
+
+    Sem ``user_ids`` percorre a matriz toda; com eles só toca na linha (como
+    avaliador) e na coluna (como avaliado) de cada um, O(N) por utilizador.
+    Insere os pares em falta, corrige ``include_technical``/``include_objectives``
+    quando as equipas partilhadas mudaram e marca com ``removed_at`` os
+    assignments que a política deixou de pedir (ex.: utilizador inativo);
+    as respostas destes deixam de contar nas médias até serem repostos, o que
+    acontece se voltarem a ser pedidos. ValueError se o período estiver
+    arquivado.
+    """
+    periods.check_not_archived(period_id)
+    policy = policy or get_period_policy(period_id)
+    planner = policies.Planner(policy, period_id, policies.Org.load())
+    removed_at = datetime.now().isoformat(timespec="seconds")
+
+    report = SyncReport()
+    with db.transaction() as conn:
+        cur = conn.cursor()
+        if db.dialect() == "postgresql":
+            # Dois nós a sincronizar o mesmo período leriam a mesma matriz e
+            # inseririam os mesmos pares; no SQLite o BEGIN IMMEDIATE já serializa.
+            cur.execute("SELECT pg_advisory_xact_lock(?, ?)", (RECONCILE_LOCK, period_id))
+        if user_ids is None:
+            desired, _, _ = planner.pairs()
+            existing = _existing_assignments(cur, period_id)
+        else:
+            user_ids = set(user_ids)
+            existing = _existing_assignments(cur, period_id, "evaluator_id", user_ids)
+            cols = set(user_ids)
+            if policy.cap is not None:
+                # Sair de uma coluna limitada abre lugar a outro avaliador
+                cols.update(v for (_, v) in existing)
+            desired, _, cols = planner.pairs(user_ids, cols)
+            existing.update(_existing_assignments(cur, period_id, "evaluatee_id", cols))
+
+        inserts, updates, removals = [], [], []
+        for (evaluator_id, evaluatee_id), shared in desired.items():
+            shared = int(shared)
+            row = existing.get((evaluator_id, evaluatee_id))
+            if row is None:
+                inserts.append((period_id, evaluator_id, evaluatee_id, shared, shared))
+            elif (row["include_behavioral"], row["include_technical"], row["include_objectives"]) != (1, shared, shared) \
+                    or row["removed_at"] is not None:
+                updates.append((shared, shared, row["id"]))
+        for pair, row in existing.items():
+            if pair not in desired and row["removed_at"] is None:
+                removals.append((removed_at, row["id"]))
+
+        cur.executemany(
+            """
+            INSERT INTO evaluation_assignments
+            (period_id, evaluator_id, evaluatee_id, include_behavioral, include_technical, include_objectives)
+            VALUES (?,?,?,1,?,?)
+            """,
+            inserts,
+        )
+        cur.executemany(
+            "UPDATE evaluation_assignments "
+            "SET include_behavioral=1, include_technical=?, include_objectives=?, removed_at=NULL WHERE id=?",
+            updates,
+        )
+        cur.executemany("UPDATE evaluation_assignments SET removed_at=? WHERE id=?", removals)
+        report = SyncReport(len(inserts), len(updates), len(removals))
+    if report:
+        cache.invalidate("periods")  # n_assignments em list_periods
+        scoring.invalidate_periods([period_id])  # progresso dos avaliadores
+    return report
+
+
+def generate_assignments_for_period(period_id: int) -> int:
+    """Gera a matriz avaliador × avaliado do período segundo a sua política.
+
+    Por omissão todos avaliam todos, CEO incluído como avaliador e como
+    avaliado (ver :mod:`av360.policies`); as competências técnicas e de
+    objetivos só entram quando partilham equipa. Reconcilia a matriz inteira
+    (ver :func:`reconcile_assignments`) e devolve o número de assignments novos.
+    """
+    return reconcile_assignments(period_id).inserted
+
+
+def set_period_policy(period_id: int, spec: str) -> SyncReport:
+    """Muda a política do período e reconcilia a matriz com ela."""
+    policy = policies.parse_policy(spec)
+    periods.set_period_policy(period_id, policies.format_policy(policy))
+    return sync_assignments(period_id, force=True)
+
+
+def changed_users(before: dict, after: dict) -> set:
+    """Utilizadores que entraram, saíram ou mudaram de equipas entre dois snapshots."""
+    return {user_id for user_id in before.keys() | after.keys() if before.get(user_id) != after.get(user_id)}
+
+
+# Estado com que cada período foi sincronizado neste processo: a chave
+# (versão da organização, política) e o estado (política, base do sorteio e
+# equipas de cada utilizador ativo). Vive no módulo (como o pool de ligações)
+# para sobreviver aos reruns do Streamlit.
+_synced = {}
+_sync_lock = threading.Lock()
+
+
+def _sync_key(period_id: int):
+    return policies.roster_version(), str(get_period_policy(period_id))
+
+
+def _sync_state(period_id: int):
+    memberships = policies.load_memberships()
+    return str(get_period_policy(period_id)), policies.sample_population(len(memberships)), memberships
+
+
+def sync_assignments(period_id: int, force: bool = False) -> SyncReport:
+    """Reflete no período as mudanças de utilizadores/equipas desde a última sincronização.
+
+    A primeira sincronização do processo, uma mudança de política (ou
+    ``force``) reconcilia a matriz toda; as seguintes só tocam nos
+    utilizadores que mudaram. Sem mudanças (o caso de quase todos os reruns)
+    custa a leitura de ``roster_version``: as equipas só se releem quando o
+    contador mudou.
+    """
+    key = _sync_key(period_id)
+    if not force and period_id in _synced and _synced[period_id][0] == key:
+        return SyncReport()
+    with _sync_lock:
+        previous = None if force else _synced.get(period_id)
+        # A chave lê-se antes do estado: uma mudança entretanto fica com a
+        # chave antiga e volta a ser vista na próxima sincronização.
+        key = _sync_key(period_id)
+        if previous is not None and previous[0] == key:
+            return SyncReport()
+        state = _sync_state(period_id)
+        if previous is None or previous[1][:2] != state[:2]:
+            report = reconcile_assignments(period_id)
+        elif previous[1] == state:
+            report = SyncReport()
+        else:
+            report = reconcile_assignments(period_id, changed_users(previous[1][2], state[2]))
+        _synced[period_id] = (key, state)
+    return report
+
+
+# Colunas de estado de um assignment ``ea`` (avaliado ``u``). ``n_competencies``
+# aplica as mesmas regras de get_competencies_for_assignment e ``n_answered``
+# conta as respostas guardadas. "Concluído" escreve-se como ``n_answered > 0 AND
+# n_answered = n_competencies`` para a subquery cara aparecer só uma vez.
+N_COMPETENCIES_SQL = """
+    (
+        SELECT COUNT(*)
+        FROM competencies c
+        WHERE c.active=1
+          AND (
+              (c.category='BEHAVIORAL' AND ea.include_behavioral=1
+               AND (c.leadership_only=0 OR u.role IN ('CEO','RESPONSAVEL')))
+              OR (c.category='OBJECTIVES' AND ea.include_objectives=1)
+              OR (c.category='TECHNICAL' AND ea.include_technical=1
+                  AND c.team_id IN (
+                      SELECT ua.team_id
+                      FROM user_teams ua
+                      JOIN user_teams ub ON ub.team_id=ua.team_id
+                      WHERE ua.user_id=ea.evaluator_id AND ub.user_id=ea.evaluatee_id
+                  ))
+          )
+    )
+"""
+N_ANSWERED_SQL = "(SELECT COUNT(*) FROM evaluation_answers ans WHERE ans.assignment_id=ea.id)"
+
+ASSIGNMENTS_SELECT = f"""
+    SELECT ea.*,
+           u.name AS evaluatee_name,
+           u.role AS evaluatee_role,
+           (
+               SELECT group_concat(ua.team_id)
+               FROM user_teams ua
+               JOIN user_teams ub ON ub.team_id=ua.team_id
+               WHERE ua.user_id=ea.evaluator_id AND ub.user_id=ea.evaluatee_id
+           ) AS shared_team_ids,
+           {N_COMPETENCIES_SQL} AS n_competencies,
+           {N_ANSWERED_SQL} AS n_answered
+    FROM evaluation_assignments ea
+    JOIN users u ON u.id = ea.evaluatee_id
+"""
+
+PAGE_SIZE = 25
+
+
+def get_assignments_page(user_id: int, period_id: int, search: str = "", team_id: int = None,
+                         pending_only: bool = False, page: int = 0, page_size: int = PAGE_SIZE):
+    """Uma página dos assignments do avaliador, por nome do avaliado; devolve (linhas, total).
+
+    Filtros opcionais: parte do nome, equipa do avaliado e só os por concluir.
+    As colunas de estado só são calculadas para as linhas da página.
+    """
+    where = ["ea.evaluator_id=?", "ea.period_id=?", "ea.removed_at IS NULL"]
+    params = [user_id, period_id]
+    if search:
+        where.append("u.name LIKE ?")
+        params.append(f"%{search}%")
+    if team_id is not None:
+        where.append("ea.evaluatee_id IN (SELECT user_id FROM user_teams WHERE team_id=?)")
+        params.append(team_id)
+    if pending_only:
+        where.append(f"NOT ({N_ANSWERED_SQL} > 0 AND {N_ANSWERED_SQL} = {N_COMPETENCIES_SQL})")
+    filtered = f"""
+        FROM evaluation_assignments ea
+        JOIN users u ON u.id = ea.evaluatee_id
+        WHERE {" AND ".join(where)}
+    """
+    with db.connection() as conn:
+        cur = conn.cursor()
+        total = cur.execute("SELECT COUNT(*) " + filtered, params).fetchone()[0]
+        cur.execute(
+            ASSIGNMENTS_SELECT
+            + f" WHERE ea.id IN (SELECT ea.id {filtered} ORDER BY u.name, ea.id LIMIT ? OFFSET ?)"
+            + " ORDER BY u.name, ea.id",
+            params + [page_size, page * page_size],
+        )
+        rows = cur.fetchall()
+    return rows, total
+
+
+@cache.cached("scores", scope=1)
+def get_assignment_progress(user_id: int, period_id: int):
+    """(concluídos, total) dos assignments do avaliador, calculado na base de dados."""
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT COUNT(*) AS total,
+                   COALESCE(SUM(CASE WHEN n_answered > 0 AND n_answered = n_competencies THEN 1 ELSE 0 END), 0) AS done
+            FROM (
+                SELECT {N_COMPETENCIES_SQL} AS n_competencies, {N_ANSWERED_SQL} AS n_answered
+                FROM evaluation_assignments ea
+                JOIN users u ON u.id = ea.evaluatee_id
+                WHERE ea.evaluator_id=? AND ea.period_id=? AND ea.removed_at IS NULL
+            ) AS progress
+            """,
+            (user_id, period_id),
+        )
+        row = cur.fetchone()
+    return row["done"], row["total"]
+
+
+def is_assignment_complete(assignment) -> bool:
+    return assignment["n_competencies"] > 0 and assignment["n_answered"] == assignment["n_competencies"]
@@ -0,0 +1,140 @@
+"""Gravação automática, em segundo plano, das respostas em curso.
+
+Cada alteração a uma pontuação ou comentário é posta numa fila em memória por
+(assignment, competência) — só o último valor conta — e uma thread de escrita
+grava-as em lote com :func:`av360.answers.save_answers_bulk` quando passam
+``DEBOUNCE`` segundos sem novas alterações (ou ``MAX_DELAY`` desde a primeira
+pendente). Assim uma sequência de cliques num slider dá uma única escrita.
+
+Tal como o pool de ligações, o writer vive no módulo e é partilhado pelo
+processo; as alterações pendentes são gravadas à saída. Por isso o estado da
+gravação (última escrita, último erro) é guardado por assignment: cada sessão
+vê só o dos formulários que está a preencher (ver :meth:`DraftWriter.status`).
+"""
+import atexit
+import threading
+import time
+
+from av360 import answers
+
+DEBOUNCE = 1.0
+MAX_DELAY = 5.0
+
+
+class DraftWriter:
+    def __init__(self, debounce: float = DEBOUNCE, max_delay: float = MAX_DELAY):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._pending = {}  # (assignment_id, competency_id) -> (score, comment)
+        self._inflight = {}  # lote a ser gravado neste momento
+        self._first_change = None
+        self._last_change = None
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()  # lotes gravados pela ordem em que saem da fila
+        self._closed = False
+        self._thread = None
+        self.flushes = 0
+        self._last_flush = {}  # assignment_id -> time.time() da última escrita com sucesso
+        self._last_error = {}  # assignment_id -> exceção da última tentativa falhada
+
+    def queue(self, assignment_id: int, competency_id: int, score: int, comment: str):
+        with self._cond:
+            now = time.monotonic()
+            self._pending[(assignment_id, competency_id)] = (score, comment)
+            self._first_change = self._first_change or now
+            self._last_change = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="av360-autosave", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def pending(self, assignment_id: int = None) -> dict:
+        """Alterações ainda por gravar ({(assignment_id, competency_id): (score, comment)})."""
+        with self._cond:
+            merged = {**self._inflight, **self._pending}
+        return {k: v for k, v in merged.items() if assignment_id is None or k[0] == assignment_id}
+
+    def status(self, assignment_id: int) -> tuple:
+        """(última escrita com sucesso, último erro) das alterações deste assignment."""
+        with self._cond:
+            return self._last_flush.get(assignment_id), self._last_error.get(assignment_id)
+
+    def flush(self):
+        """Grava já tudo o que está pendente (na thread de quem chama)."""
+        with self._write_lock:
+            with self._cond:
+                batch = self._take()
+            self._write(batch)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _take(self) -> dict:
+        batch, self._pending = self._pending, {}
+        self._inflight.update(batch)
+        self._first_change = self._last_change = None
+        return batch
+
+    def _write(self, batch: dict):
+        if not batch:
+            return
+        try:
+            answers.save_answers_bulk(
+                (assignment_id, competency_id, score, comment)
+                for (assignment_id, competency_id), (score, comment) in batch.items()
+            )
+        except Exception as e:
+            # Volta para a fila (sem sobrepor alterações mais recentes) e tenta no ciclo seguinte
+            with self._cond:
+                for key in batch:
+                    self._inflight.pop(key, None)
+                for key, value in batch.items():
+                    self._pending.setdefault(key, value)
+                self._first_change = self._first_change or time.monotonic()
+                self._last_change = time.monotonic()
+                for assignment_id, _ in batch:
+                    self._last_error[assignment_id] = e
+            return
+        now = time.time()
+        with self._cond:
+            for key in batch:
+                self._inflight.pop(key, None)
+            for assignment_id, _ in batch:
+                self._last_flush[assignment_id] = now
+                self._last_error.pop(assignment_id, None)
+            self.flushes += 1
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._pending:
+                        now = time.monotonic()
+                        due = min(self._last_change + self.debounce, self._first_change + self.max_delay)
+                        if now >= due:
+                            break
+                        self._cond.wait(due - now)
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+            self.flush()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> DraftWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = DraftWriter()
+                atexit.register(_writer.close)
+    return _writer
@@ -0,0 +1,108 @@
+"""Cache em memória para leituras que mudam pouco.
+
+Cada função decorada com :func:`cached` pertence a um *namespace* ("periods",
+"users", "competencies", "scores"). Os writers chamam :func:`invalidate` com os
+namespaces que afetam, o que incrementa a geração desses namespaces e descarta
+só as entradas correspondentes. Um namespace pode ter sub-namespaces
+(``"scores:3"``, derivado de um argumento com ``scope``): invalidar
+``"scores:3"`` só descarta esse período, invalidar ``"scores"`` descarta todos.
+O TTL limita o tempo em que uma escrita feita por outro processo (ex.: um
+script) pode ficar invisível. A cache tem no máximo :data:`MAX_ENTRIES`
+entradas: ao encher descartam-se as expiradas e, se não chegar, as usadas há
+mais tempo (LRU), para que leituras com argumentos sempre novos (ex.: logins
+com emails desconhecidos) não a façam crescer sem limite.
+
+Tal como o pool de ligações, o estado vive neste módulo para sobreviver aos
+reruns do Streamlit.
+"""
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 60.0
+MAX_ENTRIES = 4096
+
+_generations = {}
+_entries = OrderedDict()  # da menos para a mais recentemente usada
+_lock = threading.Lock()
+
+
+def generation(namespace: str) -> int:
+    return _generations.get(namespace, 0)
+
+
+def _generations_of(namespace: str):
+    """Gerações de que depende uma entrada: a do namespace e a do namespace pai."""
+    return generation(namespace.partition(":")[0]), generation(namespace)
+
+
+def invalidate(*namespaces: str):
+    """Invalida todas as entradas dos namespaces indicados (e dos seus sub-namespaces)."""
+    with _lock:
+        for namespace in namespaces:
+            _generations[namespace] = _generations.get(namespace, 0) + 1
+            prefix = namespace + ":"
+            for key in [k for k in _entries if k[0] == namespace or k[0].startswith(prefix)]:
+                del _entries[key]
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def _make_room(now: float):
+    """Com o lock: liberta espaço para uma entrada nova (expiradas primeiro, depois LRU)."""
+    if len(_entries) < MAX_ENTRIES:
+        return
+    for key in [k for k, entry in _entries.items() if entry[1] <= now]:
+        del _entries[key]
+    while len(_entries) >= MAX_ENTRIES:
+        _entries.popitem(last=False)
+
+
+def cached(namespace: str, ttl: float = DEFAULT_TTL, scope: int = None):
+    """Memoriza o resultado por argumentos até o namespace ser invalidado ou o TTL expirar.
+
+    Argumentos por nome e omitidos são normalizados pela assinatura, pelo que
+    ``f(1)``, ``f(1, None)`` e ``f(1, evaluatee_id=None)`` partilham a entrada.
+    Com ``scope`` a entrada fica no sub-namespace ``namespace:<args[scope]>``
+    (ex.: ``"scores:<period_id>"``).
+    """
+
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+        signature = inspect.signature(fn)
+        n_params = len(signature.parameters)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if kwargs or len(args) != n_params:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                args = bound.args
+            ns = namespace if scope is None else f"{namespace}:{args[scope]}"
+            key = (ns, name, args)
+            gen = _generations_of(ns)
+            now = time.monotonic()
+            entry = _entries.get(key)
+            if entry is not None and entry[0] == gen and entry[1] > now:
+                with _lock:
+                    if key in _entries:
+                        _entries.move_to_end(key)
+                return entry[2]
+            value = fn(*args)
+            with _lock:
+                # Se houve uma escrita durante a leitura, o valor já pode estar desatualizado.
+                if _generations_of(ns) == gen:
+                    _make_room(now)
+                    _entries[key] = (gen, now + ttl, value)
+                    _entries.move_to_end(key)
+            return value
+
+        wrapper.uncached = fn
+        return wrapper
+
+    return decorator
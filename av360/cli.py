@@ -0,0 +1,193 @@
+"""Linha de comandos para as operações de administração, sem Streamlit.
+
+Usa as mesmas funções de dados que a aplicação; serve para cron e scripts
+de operação (criar o período do ano, gerar assignments, importar a lista de
+colaboradores, exportar resultados).
+
+    python -m av360 setup
+    python -m av360 create-period "Avaliação 2025" 2025-01-01 2025-12-31 --policy team:k=3,cap=12
+    python -m av360 regenerate-assignments --period 3
+    python -m av360 import colaboradores.csv --dry-run
+    python -m av360 export aggregates --period 3 -o agregados.parquet
+    python -m av360 archive-period 2
+
+A base de dados é a de ``AV360_DATABASE_URL``/``AV360_DB_PATH`` (ou ``--db``).
+Antes de qualquer comando o esquema é criado/migrado se estiver atrasado.
+"""
+import argparse
+import sys
+from datetime import date
+
+from av360 import archive, assignments, db, export, periods, policies, roster, schema
+
+
+def cmd_setup(args):
+    before = schema.schema_version()
+    after = schema.setup_db()
+    print(f"esquema na versão {after}" + (f" (era {before})" if after != before else ""))
+    return 0
+
+
+def cmd_create_period(args):
+    try:
+        start, end = date.fromisoformat(args.start), date.fromisoformat(args.end)
+    except ValueError as e:
+        print(f"data inválida: {e}", file=sys.stderr)
+        return 2
+    if end < start:
+        print("A data de fim não pode ser anterior à data de início.", file=sys.stderr)
+        return 2
+    try:
+        period_id = periods.create_period(args.name, str(start), str(end), make_active=not args.inactive,
+                                          policy=args.policy)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"período {period_id} criado")
+    if not args.no_assignments:
+        n = assignments.generate_assignments_for_period(period_id)
+        print(f"{n} assignments gerados")
+    return 0
+
+
+def cmd_activate_period(args):
+    if periods.get_period(args.period_id) is None:
+        print(f"Período desconhecido: {args.period_id}", file=sys.stderr)
+        return 1
+    try:
+        periods.set_active_period(args.period_id)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"período {args.period_id} ativo")
+    return 0
+
+
+def cmd_set_policy(args):
+    if periods.get_period(args.period_id) is None:
+        print(f"Período desconhecido: {args.period_id}", file=sys.stderr)
+        return 1
+    try:
+        report = assignments.set_period_policy(args.period_id, args.policy)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"período {args.period_id}: política {assignments.get_period_policy(args.period_id)}; "
+          f"{report.inserted} assignments novos, {report.updated} atualizados, {report.removed} removidos")
+    return 0
+
+
+def cmd_regenerate_assignments(args):
+    period_id = args.period if args.period is not None else periods.get_current_period_id()
+    if period_id is None or periods.get_period(period_id) is None:
+        print(f"Período desconhecido: {period_id}", file=sys.stderr)
+        return 1
+    try:
+        report = assignments.reconcile_assignments(period_id, args.users)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"período {period_id}: {report.inserted} assignments novos, {report.updated} atualizados, "
+          f"{report.removed} removidos")
+    return 0
+
+
+def cmd_archive_period(args):
+    try:
+        summary = archive.archive_period(args.period_id)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"período {args.period_id} arquivado: {summary['n_assignments']} assignments, "
+          f"{summary['n_answers']} respostas")
+    return 0
+
+
+def cmd_restore_period(args):
+    try:
+        restored = archive.restore_period(args.period_id)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"período {args.period_id} reposto: {restored['evaluation_assignments']} assignments, "
+          f"{restored['evaluation_answers']} respostas")
+    return 0
+
+
+def cmd_import(args):
+    return roster.run(args)
+
+
+def cmd_export(args):
+    return export.run(args)
+
+
+def cmd_recompute_aggregates(args):
+    schema.recompute_score_aggregates()
+    print("score_aggregates reconstruída")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m av360", description="Administração da Avaliação 360.")
+    parser.add_argument("--db", help="ficheiro SQLite ou URL postgresql:// "
+                        "(por omissão AV360_DATABASE_URL ou AV360_DB_PATH)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("setup", aliases=["migrate"], help="cria as tabelas e aplica as migrações em falta")
+    p.set_defaults(func=cmd_setup)
+
+    p = sub.add_parser("create-period", help="cria um período e gera os seus assignments")
+    p.add_argument("name")
+    p.add_argument("start", help="AAAA-MM-DD")
+    p.add_argument("end", help="AAAA-MM-DD")
+    p.add_argument("--inactive", action="store_true", help="não o tornar o período ativo")
+    p.add_argument("--no-assignments", action="store_true", help="não gerar assignments")
+    p.add_argument("--policy", default=policies.DEFAULT_POLICY,
+                   help="política de atribuição, ex.: team:k=3,cap=12 (por omissão full)")
+    p.set_defaults(func=cmd_create_period)
+
+    p = sub.add_parser("activate-period", help="define o período ativo")
+    p.add_argument("period_id", type=int)
+    p.set_defaults(func=cmd_activate_period)
+
+    p = sub.add_parser("set-policy", help="muda a política de atribuição de um período")
+    p.add_argument("period_id", type=int)
+    p.add_argument("policy", help="ex.: full, team:k=3,cap=12, manager:k=2")
+    p.set_defaults(func=cmd_set_policy)
+
+    p = sub.add_parser("regenerate-assignments", help="acerta os assignments de um período com as equipas atuais")
+    p.add_argument("--period", type=int, help="id do período (por omissão o ativo)")
+    p.add_argument("--users", type=int, nargs="+", help="só a linha e a coluna destes utilizadores")
+    p.set_defaults(func=cmd_regenerate_assignments)
+
+    p = sub.add_parser("archive-period", help="move os dados de um período fechado para tabelas de arquivo")
+    p.add_argument("period_id", type=int)
+    p.set_defaults(func=cmd_archive_period)
+
+    p = sub.add_parser("restore-period", help="devolve um período arquivado às tabelas vivas")
+    p.add_argument("period_id", type=int)
+    p.set_defaults(func=cmd_restore_period)
+
+    p = sub.add_parser("import", help="importa colaboradores e equipas de um CSV/Excel")
+    roster.add_arguments(p)
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="exporta respostas ou agregados para CSV/Parquet")
+    export.add_arguments(p)
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("recompute-aggregates", help="reconstrói score_aggregates a partir das respostas")
+    p.set_defaults(func=cmd_recompute_aggregates)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.db:
+        db.DB_PATH = args.db
+    if args.func is not cmd_setup:
+        # Como na aplicação: os comandos assumem o esquema na versão atual
+        schema.ensure_db()
+    return args.func(args)
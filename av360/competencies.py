@@ -0,0 +1,87 @@
+"""Índice de aplicabilidade das competências.
+
+Que competências entram num formulário depende apenas das flags do assignment,
+de o avaliado ser ou não líder e do conjunto de equipas partilhadas. O índice
+carrega a tabela ``competencies`` uma vez e memoriza o resultado por essa
+chave, pelo que resolver o formulário de um assignment é um lookup.
+"""
+from av360 import cache, db
+
+LEADER_ROLES = ("CEO", "RESPONSAVEL")
+
+
+class CompetencyIndex:
+    def __init__(self, rows):
+        self.by_id = {r["id"]: r for r in rows}
+        self._ordered = sorted(self.by_id.values(), key=lambda r: r["id"])
+        self._resolved = {}
+
+    def resolve(self, include_behavioral: bool, include_technical: bool, include_objectives: bool,
+                is_leader: bool, shared_teams) -> tuple:
+        """Ids (por ordem) das competências aplicáveis a esta combinação."""
+        key = (bool(include_behavioral), bool(include_technical), bool(include_objectives),
+               bool(is_leader), frozenset(shared_teams))
+        ids = self._resolved.get(key)
+        if ids is None:
+            ids = self._resolved[key] = tuple(c["id"] for c in self._ordered if self._applies(c, key))
+        return ids
+
+    @staticmethod
+    def _applies(c, key) -> bool:
+        include_behavioral, include_technical, include_objectives, is_leader, shared = key
+        cat = c["category"]
+        if cat == "BEHAVIORAL":
+            return include_behavioral and (c["leadership_only"] != 1 or is_leader)
+        if cat == "OBJECTIVES":
+            return include_objectives
+        if cat == "TECHNICAL":
+            return include_technical and c["team_id"] is not None and c["team_id"] in shared
+        return False
+
+
+@cache.cached("competencies")
+def get_index() -> CompetencyIndex:
+    """Índice das competências ativas, construído na primeira utilização."""
+    with db.connection() as conn:
+        rows = conn.execute("SELECT * FROM competencies WHERE active=1 ORDER BY id").fetchall()
+    return CompetencyIndex(rows)
+
+
+def get_competencies_for_assignment(assignment):
+    """Competências do formulário, resolvidas pelo índice de aplicabilidade.
+
+    As linhas de get_assignments_page já trazem o papel do avaliado e
+    as equipas partilhadas; para outras só são precisas duas queries pequenas.
+    """
+    if "evaluatee_role" in assignment.keys():
+        eve_role = assignment["evaluatee_role"]
+        shared = _parse_ids(assignment["shared_team_ids"])
+    else:
+        with db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT role FROM users WHERE id=?", (assignment["evaluatee_id"],))
+            eve_role = cur.fetchone()["role"]
+            cur.execute(
+                """
+                SELECT ua.team_id
+                FROM user_teams ua
+                JOIN user_teams ub ON ub.team_id=ua.team_id
+                WHERE ua.user_id=? AND ub.user_id=?
+                """,
+                (assignment["evaluator_id"], assignment["evaluatee_id"]),
+            )
+            shared = [r["team_id"] for r in cur.fetchall()]
+
+    index = get_index()
+    ids = index.resolve(
+        assignment["include_behavioral"] == 1,
+        assignment["include_technical"] == 1,
+        assignment["include_objectives"] == 1,
+        eve_role in LEADER_ROLES,
+        shared,
+    )
+    return [index.by_id[i] for i in ids]
+
+
+def _parse_ids(csv_ids):
+    return [int(x) for x in csv_ids.split(",")] if csv_ids else []
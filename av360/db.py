@@ -0,0 +1,264 @@
+"""Ligações à base de dados partilhadas pelo processo.
+
+O Streamlit volta a executar ``app.py`` a cada interação, por isso o estado que
+tem de durar (o pool de ligações) vive neste módulo importado. Cada ligação é
+aberta uma única vez, em modo WAL e com os PRAGMAs afinados, e é reutilizada
+por todas as funções de dados através de :func:`connection` (leituras) e
+:func:`transaction` (escritas com vários statements).
+
+As escritas são coordenadas: no processo, um lock deixa entrar uma transação de
+cada vez (as outras threads esperam no lock em vez de disputarem o ficheiro);
+entre processos, cada transação começa com ``BEGIN IMMEDIATE``, que reserva a
+escrita logo no início (com ``BEGIN`` simples a passagem de leitura a escrita
+pode falhar com "database is locked" sem esperar pelo busy_timeout), e se o
+ficheiro continuar ocupado depois do busy_timeout tenta de novo até
+``WRITE_RETRIES`` vezes, com espera exponencial e jitter. Trabalhos longos em
+lote podem ir para a fila de :func:`submit_write`, executada por uma única
+thread.
+
+A base de dados é um ficheiro SQLite (``AV360_DB_PATH``, ou
+``AV360_DATABASE_URL=sqlite:///caminho.db``) ou um servidor PostgreSQL
+(``AV360_DATABASE_URL=postgresql://...``, ver :mod:`av360.postgres`); o SQL das
+funções de dados é o mesmo para os dois.
+"""
+import atexit
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from av360 import postgres, profiling
+
+SQLITE_PREFIX = "sqlite:///"
+
+
+def _target(value: str) -> str:
+    return value[len(SQLITE_PREFIX):] if value.startswith(SQLITE_PREFIX) else value
+
+
+# Caminho do ficheiro SQLite ou URL postgresql:// (o nome ficou do tempo em que só havia SQLite).
+DB_PATH = _target(os.environ.get("AV360_DATABASE_URL") or os.environ.get("AV360_DB_PATH", "avaliacao360.db"))
+
+POOL_SIZE = 8
+POOL_TIMEOUT = 30.0
+BUSY_TIMEOUT_MS = 5000
+BEGIN_MODE = "IMMEDIATE"
+WRITE_RETRIES = 5
+RETRY_BASE_DELAY = 0.05  # segundos; duplica a cada tentativa, mais jitter
+SERIALIZE_WRITES = True
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = (
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",  # ~16 MB de page cache por ligação
+    "PRAGMA mmap_size=134217728",  # 128 MB
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Funções chamadas com cada ligação nova (instrumentação, benchmarks).
+_connect_hooks = []
+
+
+def add_connect_hook(hook):
+    _connect_hooks.append(hook)
+
+
+def remove_connect_hook(hook):
+    _connect_hooks.remove(hook)
+
+
+def dialect(path: str = None) -> str:
+    """"postgresql" ou "sqlite", conforme a base de dados configurada."""
+    return postgres.DIALECT if postgres.is_url(path or DB_PATH) else "sqlite"
+
+
+def connect(path: str):
+    """Abre uma ligação nova já configurada (sem passar pelo pool)."""
+    path = _target(path)
+    if postgres.is_url(path):
+        conn = postgres.connect(path)
+    else:
+        conn = _connect_sqlite(path)
+    for hook in _connect_hooks:
+        hook(conn)
+    profiling.note_connection()
+    return conn
+
+
+def _connect_sqlite(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,  # transações explícitas via transaction()
+        check_same_thread=False,  # o pool entrega cada ligação a uma thread de cada vez
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=profiling.ProfiledConnection,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """Pool limitado de ligações de longa duração a uma base de dados (ficheiro SQLite ou PostgreSQL)."""
+
+    def __init__(self, path: str, max_size: int = POOL_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self.checkouts = 0
+
+    def acquire(self) -> sqlite3.Connection:
+        self.checkouts += 1
+        profiling.note_checkout()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.max_size:
+                self._opened += 1
+                open_new = True
+            else:
+                open_new = False
+        if open_new:
+            try:
+                return connect(self.path)
+            except BaseException:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        try:
+            return self._idle.get(timeout=POOL_TIMEOUT)
+        except queue.Empty:
+            raise RuntimeError(f"Sem ligações livres no pool para {self.path}") from None
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Fecha as ligações livres do pool."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path: str = None) -> ConnectionPool:
+    """Pool da base de dados indicada (por omissão ``DB_PATH``), criado na primeira utilização."""
+    path = _target(path or DB_PATH)
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = ConnectionPool(path)
+    return pool
+
+
+@contextmanager
+def connection():
+    """Ligação do pool para leituras (autocommit)."""
+    with get_pool().connection() as conn:
+        yield conn
+
+
+# Escritas deste processo, uma de cada vez; ``retries`` conta as novas tentativas.
+_write_lock = threading.Lock()
+_local = threading.local()
+retries = 0
+
+
+def _is_busy(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def _begin(conn: sqlite3.Connection):
+    """BEGIN IMMEDIATE com novas tentativas (espera exponencial e jitter) se o ficheiro estiver ocupado."""
+    global retries
+    for attempt in range(WRITE_RETRIES + 1):
+        try:
+            conn.execute(f"BEGIN {BEGIN_MODE}")
+            return
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e) or attempt == WRITE_RETRIES:
+                raise
+        retries += 1
+        time.sleep(RETRY_BASE_DELAY * 2 ** attempt * (0.5 + random.random()))
+
+
+@contextmanager
+def _serialized():
+    # O PostgreSQL tem escritores concorrentes; o lock só serve o ficheiro SQLite.
+    if not SERIALIZE_WRITES or dialect() != "sqlite":
+        yield
+        return
+    if getattr(_local, "writing", False):
+        raise RuntimeError("transaction() dentro de outra transaction() na mesma thread")
+    with _write_lock:
+        _local.writing = True
+        try:
+            yield
+        finally:
+            _local.writing = False
+
+
+@contextmanager
+def transaction():
+    """Ligação do pool dentro de uma transação de escrita: COMMIT no fim, ROLLBACK em caso de erro."""
+    with _serialized(), get_pool().connection() as conn:
+        _begin(conn)
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def submit_write(fn, *args, **kwargs):
+    """Põe um trabalho de escrita em lote na fila do processo; devolve um Future.
+
+    A fila é executada por uma única thread, pela ordem de chegada: importações,
+    reconciliações da matriz e afins não competem entre si e cada um vê o
+    resultado do anterior.
+    """
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="av360-writer")
+                atexit.register(_writer.shutdown)
+    return _writer.submit(fn, *args, **kwargs)
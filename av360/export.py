@@ -0,0 +1,208 @@
+"""Exportação em streaming das respostas e dos agregados para CSV ou Parquet.
+
+As linhas são lidas com ``fetchmany`` em blocos de tamanho fixo e escritas à
+medida, pelo que o histórico nunca é carregado todo para memória. Filtros
+opcionais por período e por equipa (do avaliado). As respostas dos períodos
+arquivados saem das tabelas de arquivo (:mod:`av360.archive`); os agregados
+desses períodos continuam em ``score_aggregates``.
+
+    python -m av360.export answers --period 3 --team Marketing --format parquet -o respostas.parquet
+"""
+import argparse
+import csv
+import os
+import sys
+
+from av360 import archive, db, schema
+
+CHUNK_SIZE = 5000
+FORMATS = ("csv", "parquet")
+
+# Colunas de cada exportação e o tipo Arrow correspondente (para o Parquet).
+KINDS = {
+    "answers": {
+        "columns": [
+            ("period_id", "int64"), ("period_name", "string"),
+            ("evaluator_id", "int64"), ("evaluator_name", "string"), ("evaluator_email", "string"),
+            ("evaluatee_id", "int64"), ("evaluatee_name", "string"), ("evaluatee_email", "string"),
+            ("competency_id", "int64"), ("competency_name", "string"), ("category", "string"),
+            ("weight", "float64"), ("score", "int64"), ("comment", "string"),
+        ],
+        "sql": """
+            SELECT ep.id, ep.name,
+                   ev.id, ev.name, ev.email,
+                   ee.id, ee.name, ee.email,
+                   c.id, c.name, c.category,
+                   c.weight, ans.score, ans.comment
+            FROM {evaluation_answers} ans
+            JOIN {evaluation_assignments} a ON a.id = ans.assignment_id
+            JOIN evaluation_periods ep ON ep.id = a.period_id
+            JOIN users ev ON ev.id = a.evaluator_id
+            JOIN users ee ON ee.id = a.evaluatee_id
+            JOIN competencies c ON c.id = ans.competency_id
+            WHERE {where}
+            ORDER BY a.period_id, a.evaluatee_id, a.evaluator_id, c.id
+        """,
+        "period_column": "a.period_id",
+        "evaluatee_column": "a.evaluatee_id",
+        # Colunas lidas de cada tabela viva (ou de arquivo)
+        "tables": {
+            "evaluation_assignments": "id, period_id, evaluator_id, evaluatee_id",
+            "evaluation_answers": "assignment_id, competency_id, score, comment",
+        },
+    },
+    "aggregates": {
+        "columns": [
+            ("period_id", "int64"), ("period_name", "string"),
+            ("evaluatee_id", "int64"), ("evaluatee_name", "string"), ("category", "string"),
+            ("n_answers", "int64"), ("avg_score", "float64"), ("weighted_avg_score", "float64"),
+        ],
+        "sql": """
+            SELECT ep.id, ep.name,
+                   u.id, u.name, sa.category,
+                   sa.score_count,
+                   sa.score_sum / sa.score_count,
+                   sa.weighted_sum / sa.weight_sum
+            FROM score_aggregates sa
+            JOIN evaluation_periods ep ON ep.id = sa.period_id
+            JOIN users u ON u.id = sa.evaluatee_id
+            WHERE sa.score_count > 0 AND {where}
+            ORDER BY sa.period_id, u.name, sa.category
+        """,
+        "period_column": "sa.period_id",
+        "evaluatee_column": "sa.evaluatee_id",
+    },
+}
+
+
+def column_names(kind: str):
+    return [name for name, _ in KINDS[kind]["columns"]]
+
+
+def _sources(cur, spec: dict, period_id: int = None) -> dict:
+    """De onde ler cada tabela: a viva, a de arquivo ou a união das duas."""
+    tables = spec.get("tables", {})
+    if not tables:
+        return {}
+    sql = "SELECT id FROM evaluation_periods WHERE archived_at IS NOT NULL"
+    if period_id is not None:
+        sql += " AND id = ?"
+    archived = [r[0] for r in cur.execute(sql, () if period_id is None else (period_id,)).fetchall()]
+    if not archived:
+        return {table: table for table in tables}
+    sources = {}
+    for table, columns in tables.items():
+        # Um período pedido que está arquivado só existe nas tabelas de arquivo
+        parts = [] if period_id is not None else [f"SELECT {columns} FROM {table}"]
+        parts += [f"SELECT {columns} FROM {archive.archive_table(pid, table)}" for pid in sorted(archived)]
+        sources[table] = f"({' UNION ALL '.join(parts)})"
+    return sources
+
+
+def iter_chunks(kind: str, period_id: int = None, team_id: int = None, chunk_size: int = CHUNK_SIZE):
+    """Blocos de linhas (tuplos) da exportação pedida, incluindo os períodos arquivados."""
+    spec = KINDS[kind]
+    where, params = ["1=1"], []
+    if period_id is not None:
+        where.append(f"{spec['period_column']} = ?")
+        params.append(period_id)
+    if team_id is not None:
+        where.append(f"{spec['evaluatee_column']} IN (SELECT user_id FROM user_teams WHERE team_id = ?)")
+        params.append(team_id)
+    with db.connection() as conn:
+        cur = conn.cursor()
+        sources = _sources(cur, spec, period_id)
+        cur.row_factory = None
+        cur.execute(spec["sql"].format(where=" AND ".join(where), **sources), params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+def write_csv(out, kind: str, **filters) -> int:
+    """Escreve para um ficheiro de texto aberto; devolve o número de linhas."""
+    writer = csv.writer(out)
+    writer.writerow(column_names(kind))
+    n = 0
+    for rows in iter_chunks(kind, **filters):
+        writer.writerows(rows)
+        n += len(rows)
+    return n
+
+
+def write_parquet(out, kind: str, **filters) -> int:
+    """Escreve um row group por bloco; ``out`` é um caminho ou ficheiro binário."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Para exportar em Parquet é necessário instalar o pyarrow.") from None
+    schema = pa.schema([(name, getattr(pa, type_)()) for name, type_ in KINDS[kind]["columns"]])
+    n = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for rows in iter_chunks(kind, **filters):
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema,
+            ))
+            n += len(rows)
+    return n
+
+
+def export(path: str, kind: str = "answers", fmt: str = "csv", **filters) -> int:
+    """Exporta para ``path`` (``-`` = stdout, só CSV); devolve o número de linhas."""
+    if fmt == "parquet":
+        return write_parquet(path, kind, **filters)
+    if path == "-":
+        return write_csv(sys.stdout, kind, **filters)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        return write_csv(f, kind, **filters)
+
+
+def resolve_team_id(name: str):
+    with db.connection() as conn:
+        row = conn.execute("SELECT id FROM teams WHERE name=?", (name,)).fetchone()
+    if row is None:
+        raise ValueError(f"Equipa desconhecida: {name}")
+    return row["id"]
+
+
+def add_arguments(parser):
+    parser.add_argument("kind", choices=sorted(KINDS))
+    parser.add_argument("-o", "--out", default="-", help="ficheiro de destino (por omissão stdout)")
+    parser.add_argument("--format", choices=FORMATS, default=None,
+                        help="por omissão deduzido da extensão do ficheiro")
+    parser.add_argument("--period", type=int, help="id do período")
+    parser.add_argument("--team", help="nome da equipa do avaliado")
+
+
+def run(args):
+    fmt = args.format or ("parquet" if args.out.endswith(".parquet") else "csv")
+    if fmt == "parquet" and args.out == "-":
+        print("o formato parquet precisa de --out", file=sys.stderr)
+        return 2
+    try:
+        team_id = resolve_team_id(args.team) if args.team else None
+        n = export(args.out, args.kind, fmt, period_id=args.period, team_id=team_id)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"{n} linhas exportadas", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta respostas ou agregados da Avaliação 360.")
+    add_arguments(parser)
+    parser.add_argument("--db", default=os.environ.get("AV360_DB_PATH"), help="ficheiro SQLite")
+    args = parser.parse_args(argv)
+    if args.db:
+        db.DB_PATH = args.db
+    schema.ensure_db()
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Hash das passwords com uma KDF de custo ajustável.
+
+O valor guardado em ``users.password_hash`` leva o esquema e os parâmetros
+com que foi calculado, ``<esquema>$<parâmetros>$<salt>$<hash>``, pelo que o
+custo pode subir sem invalidar as passwords existentes: :func:`needs_rehash`
+diz quando um hash foi feito com outro esquema ou parâmetros e o login volta a
+calculá-lo com os atuais. Os hashes antigos (SHA-256 sem salt, 64 caracteres
+hexadecimais) continuam a ser aceites e são sempre refeitos.
+
+O esquema por omissão é escolhido com ``AV360_PASSWORD_SCHEME`` (``scrypt`` ou
+``pbkdf2_sha256``); ``benchmarks/login.py`` mede o débito de logins para os
+vários custos.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _scrypt(password: bytes, salt: bytes, params: dict) -> bytes:
+    n, r, p = params["n"], params["r"], params["p"]
+    return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p,
+                          maxmem=128 * r * (n + p) + (1 << 20), dklen=KEY_BYTES)
+
+
+def _pbkdf2_sha256(password: bytes, salt: bytes, params: dict) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password, salt, params["i"], dklen=KEY_BYTES)
+
+
+# esquema -> (função de derivação, parâmetros atuais)
+SCHEMES = {
+    "scrypt": (_scrypt, {"n": 2 ** 14, "r": 8, "p": 1}),
+    "pbkdf2_sha256": (_pbkdf2_sha256, {"i": 600_000}),
+}
+DEFAULT_SCHEME = os.environ.get("AV360_PASSWORD_SCHEME", "scrypt")
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def format_params(params: dict) -> str:
+    return ",".join(f"{k}={v}" for k, v in params.items())
+
+
+def parse_params(text: str) -> dict:
+    return {k: int(v) for k, v in (item.split("=", 1) for item in text.split(","))}
+
+
+def _is_legacy(stored: str) -> bool:
+    return len(stored) == 64 and "$" not in stored
+
+
+def hash_password(password: str, scheme: str = None, params: dict = None) -> str:
+    scheme = scheme or DEFAULT_SCHEME
+    derive, defaults = SCHEMES[scheme]
+    params = params or defaults
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = derive(password.encode("utf-8"), salt, params)
+    return f"{scheme}${format_params(params)}${_b64(salt)}${_b64(key)}"
+
+
+def hash_passwords(passwords, scheme: str = None, params: dict = None) -> list:
+    """Vários hashes em paralelo (as KDFs do hashlib libertam o GIL)."""
+    passwords = list(passwords)
+    if len(passwords) < 2:
+        return [hash_password(p, scheme, params) for p in passwords]
+    with ThreadPoolExecutor(max_workers=min(len(passwords), os.cpu_count() or 1)) as pool:
+        return list(pool.map(lambda p: hash_password(p, scheme, params), passwords))
+
+
+def verify_password(password: str, stored: str) -> bool:
+    if _is_legacy(stored):
+        legacy = hashlib.sha256(password.encode("utf-8")).hexdigest()
+        return hmac.compare_digest(legacy, stored)
+    try:
+        scheme, params, salt, key = stored.split("$")
+        derive, _ = SCHEMES[scheme]
+        params = parse_params(params)
+        salt, key = _unb64(salt), _unb64(key)
+    except (ValueError, KeyError):
+        return False
+    return hmac.compare_digest(derive(password.encode("utf-8"), salt, params), key)
+
+
+def needs_rehash(stored: str, scheme: str = None) -> bool:
+    """True se o hash não usa o esquema e os parâmetros atuais."""
+    scheme = scheme or DEFAULT_SCHEME
+    if _is_legacy(stored):
+        return True
+    try:
+        stored_scheme, params, _, _ = stored.split("$")
+        return stored_scheme != scheme or parse_params(params) != SCHEMES[scheme][1]
+    except ValueError:
+        return True
+
+
+# Hash de referência para equalizar o tempo de resposta a emails desconhecidos.
+_DUMMY_HASH = None
+
+
+def dummy_verify(password: str):
+    """Gasta o mesmo tempo que uma verificação real (email inexistente)."""
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None:
+        _DUMMY_HASH = hash_password(secrets.token_hex(8))
+    verify_password(password, _DUMMY_HASH)
@@ -0,0 +1,86 @@
+"""Períodos de avaliação: listagem, criação e período ativo.
+
+Um período arquivado (ver :mod:`av360.archive`) só pode ser consultado; para o
+voltar a ativar ou mudar a sua matriz é preciso repô-lo primeiro.
+"""
+from av360 import cache, db, policies
+
+
+@cache.cached("periods")
+def list_periods():
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT ep.*,
+                   CASE WHEN ps.period_id IS NULL
+                        THEN (SELECT COUNT(*) FROM evaluation_assignments ea
+                              WHERE ea.period_id = ep.id AND ea.removed_at IS NULL)
+                        ELSE ps.n_assignments
+                   END AS n_assignments
+            FROM evaluation_periods ep
+            LEFT JOIN period_summaries ps ON ps.period_id = ep.id
+            ORDER BY start_date DESC, id DESC
+            """
+        )
+        rows = cur.fetchall()
+    return rows
+
+
+@cache.cached("periods")
+def get_period(period_id: int):
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM evaluation_periods WHERE id=?", (period_id,))
+        row = cur.fetchone()
+    return row
+
+
+def create_period(name: str, start_date_str: str, end_date_str: str, make_active: bool = True,
+                  policy: str = policies.DEFAULT_POLICY):
+    policy = policies.format_policy(policies.parse_policy(policy))
+    with db.transaction() as conn:
+        cur = conn.cursor()
+        if make_active:
+            cur.execute("UPDATE evaluation_periods SET is_active=0")
+        cur.execute(
+            "INSERT INTO evaluation_periods(name,start_date,end_date,is_active,assignment_policy) "
+            "VALUES (?,?,?,?,?) RETURNING id",
+            (name, start_date_str, end_date_str, 1 if make_active else 0, policy),
+        )
+        period_id = cur.fetchone()[0]
+    cache.invalidate("periods")
+    return period_id
+
+
+def check_not_archived(period_id: int):
+    """ValueError se o período estiver arquivado."""
+    period = get_period(period_id)
+    if period is not None and period["archived_at"]:
+        raise ValueError(f"O período '{period['name']}' está arquivado; reponha-o primeiro.")
+
+
+def set_active_period(period_id: int):
+    check_not_archived(period_id)
+    with db.transaction() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE evaluation_periods SET is_active=0")
+        cur.execute("UPDATE evaluation_periods SET is_active=1 WHERE id=?", (period_id,))
+    cache.invalidate("periods")
+
+
+def set_period_policy(period_id: int, policy: str):
+    """Grava a política de atribuição; os assignments acertam-se com assignments.set_period_policy."""
+    check_not_archived(period_id)
+    with db.transaction() as conn:
+        conn.execute("UPDATE evaluation_periods SET assignment_policy=? WHERE id=?", (policy, period_id))
+    cache.invalidate("periods")
+
+
+@cache.cached("periods")
+def get_current_period_id():
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM evaluation_periods WHERE is_active=1 ORDER BY start_date DESC, id DESC LIMIT 1")
+        row = cur.fetchone()
+    return row["id"] if row else None
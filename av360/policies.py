@@ -0,0 +1,218 @@
+"""Políticas de atribuição: quem avalia quem em cada período.
+
+Uma política escreve-se ``<nome>[:k=v,...]`` e fica guardada no período
+(``evaluation_periods.assignment_policy``):
+
+``full``
+    todos avaliam todos (a regra original; cresce com N²).
+``team``
+    cada um avalia quem partilha alguma equipa consigo.
+``manager``
+    os responsáveis de equipa (``is_primary``) avaliam os membros das equipas
+    que lideram e são avaliados por eles.
+
+Todas incluem a autoavaliação e aceitam ``k`` (colegas de outras equipas
+sorteados por avaliador: é o valor *esperado*, não um máximo), ``cap`` (máximo
+de avaliadores por avaliado, sem contar o próprio; ficam primeiro os da mesma
+equipa) e ``seed``. O sorteio é por par, com um hash de (seed, período,
+avaliador, avaliado): é determinístico por período e decidir um par não
+depende dos outros, pelo que recalcular a linha e a coluna de quem mudou
+continua a ser O(N). Por isso cada par é uma tiragem independente e o número
+de colegas sorteados varia à volta de ``k`` (ex.: com ``team:k=3`` e 500
+utilizadores a média é ~3 mas há quem tenha 8 ou 9); o limite garantido é o
+``cap``, do lado do avaliado.
+
+    team:k=3,cap=12
+"""
+import hashlib
+import math
+from dataclasses import dataclass, field
+
+from av360 import db
+
+DEFAULT_POLICY = "full"
+
+
+class Org:
+    """Utilizadores ativos, as suas equipas e quem lidera cada equipa."""
+
+    def __init__(self, memberships):
+        self.teams = {}  # user_id -> frozenset(team_ids)
+        self.led = {}  # user_id -> frozenset(team_ids que lidera)
+        for user_id, links in memberships.items():
+            self.teams[user_id] = frozenset(team_id for team_id, _ in links)
+            self.led[user_id] = frozenset(team_id for team_id, is_primary in links if is_primary)
+        self.user_ids = sorted(self.teams)
+
+    @classmethod
+    def load(cls):
+        return cls(load_memberships())
+
+    def shares_team(self, a: int, b: int) -> bool:
+        return not self.teams[a].isdisjoint(self.teams[b])
+
+    def leads(self, a: int, b: int) -> bool:
+        """True se ``a`` lidera alguma equipa de ``b``."""
+        return a != b and not self.led[a].isdisjoint(self.teams[b])
+
+
+def roster_version() -> int:
+    """Contador que os triggers incrementam a cada mudança em utilizadores ativos/equipas."""
+    with db.connection() as conn:
+        return conn.execute("SELECT version FROM roster_version WHERE id=1").fetchone()[0]
+
+
+def load_memberships() -> dict:
+    """``{user_id: frozenset((team_id, is_primary))}`` dos utilizadores ativos."""
+    with db.connection() as conn:
+        cur = conn.cursor()
+        links = {r["id"]: set() for r in cur.execute("SELECT id FROM users WHERE is_active=1").fetchall()}
+        for r in cur.execute("SELECT user_id, team_id, is_primary FROM user_teams").fetchall():
+            if r["user_id"] in links:
+                links[r["user_id"]].add((r["team_id"], r["is_primary"]))
+    return {user_id: frozenset(l) for user_id, l in links.items()}
+
+
+def _full(org, evaluator, evaluatee):
+    return True
+
+
+def _team(org, evaluator, evaluatee):
+    return evaluator == evaluatee or org.shares_team(evaluator, evaluatee)
+
+
+def _manager(org, evaluator, evaluatee):
+    return evaluator == evaluatee or org.leads(evaluator, evaluatee) or org.leads(evaluatee, evaluator)
+
+
+# nome -> relação base (avaliador, avaliado) -> bool
+RULES = {
+    "full": _full,
+    "team": _team,
+    "manager": _manager,
+}
+PARAMS = ("k", "cap", "seed")
+
+
+@dataclass
+class Policy:
+    name: str = DEFAULT_POLICY
+    params: dict = field(default_factory=dict)
+
+    @property
+    def k(self) -> int:
+        return self.params.get("k", 0)
+
+    @property
+    def cap(self):
+        return self.params.get("cap")
+
+    def __str__(self):
+        return format_policy(self)
+
+
+def parse_policy(spec: str) -> Policy:
+    """``"team:k=3,cap=12"`` -> Policy; ValueError se não for válida."""
+    name, _, text = (spec or DEFAULT_POLICY).strip().partition(":")
+    if name not in RULES:
+        raise ValueError(f"política desconhecida: {name} (disponíveis: {', '.join(RULES)})")
+    params = {}
+    for item in filter(None, text.split(",")):
+        key, sep, value = item.partition("=")
+        if not sep or key not in PARAMS:
+            raise ValueError(f"parâmetro inválido na política: {item!r} (aceites: {', '.join(PARAMS)})")
+        params[key] = int(value)
+        if params[key] < 0:
+            raise ValueError(f"parâmetro negativo na política: {item!r}")
+    return Policy(name, params)
+
+
+def format_policy(policy: Policy) -> str:
+    if not policy.params:
+        return policy.name
+    return policy.name + ":" + ",".join(f"{k}={v}" for k, v in policy.params.items())
+
+
+def sample_population(n_active: int) -> int:
+    """Nº de candidatos usado na probabilidade de sorteio.
+
+    Arredondado para cima em degraus de ~19%: uma contratação não muda o sorteio
+    de todos os pares, só a passagem de um degrau (que obriga a reconciliar a
+    matriz toda).
+    """
+    n = max(1, n_active - 1)
+    return math.ceil(2 ** (math.ceil(math.log2(n) * 4) / 4))
+
+
+class Planner:
+    """Matriz pretendida de um período segundo a política."""
+
+    def __init__(self, policy: Policy, period_id: int, org: Org):
+        self.policy = policy
+        self.org = org
+        self.rule = RULES[policy.name]
+        self.salt = f"{policy.params.get('seed', 0)}:{period_id}:".encode("ascii")
+        # Probabilidade de sortear cada par de outra equipa: até k por avaliador
+        self.population = sample_population(len(org.user_ids))
+        self.p_sample = min(1.0, policy.k / self.population) if policy.name != "full" else 0.0
+
+    def _rank(self, evaluator: int, evaluatee: int) -> float:
+        digest = hashlib.blake2b(self.salt + f"{evaluator}:{evaluatee}".encode("ascii"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") / 2 ** 64
+
+    def candidate(self, evaluator: int, evaluatee: int) -> bool:
+        if self.rule(self.org, evaluator, evaluatee):
+            return True
+        return self.p_sample > 0 and self._rank(evaluator, evaluatee) < self.p_sample
+
+    def column(self, evaluatee: int) -> list:
+        """Avaliadores de ``evaluatee``, já com o limite ``cap`` aplicado."""
+        reviewers = [e for e in self.org.user_ids if self.candidate(e, evaluatee)]
+        cap = self.policy.cap
+        if cap is None or len(reviewers) <= cap + (evaluatee in reviewers):
+            return reviewers
+        others = sorted(
+            (e for e in reviewers if e != evaluatee),
+            key=lambda e: (not self.org.shares_team(e, evaluatee), self._rank(e, evaluatee)),
+        )
+        kept = others[:cap]
+        return sorted(kept + [evaluatee] if evaluatee in reviewers else kept)
+
+    def pairs(self, rows=None, cols=None):
+        """Pares pretendidos e o âmbito que cobrem: ``({(avaliador, avaliado): shared}, rows, cols)``.
+
+        Sem ``rows``/``cols`` é a matriz toda. Com eles, são os pares na linha
+        dos ``rows`` e na coluna dos ``cols``; com ``cap`` o âmbito alarga-se às
+        colunas onde os ``rows`` podem entrar (entrar numa coluna pode tirar
+        de lá outro avaliador). ``rows``/``cols`` devolvidos são o âmbito
+        efetivo (None = todos).
+        """
+        org = self.org
+        active = set(org.user_ids)
+        desired = {}
+        if rows is None and cols is None:
+            if self.policy.cap is None:
+                for e in org.user_ids:
+                    for v in org.user_ids:
+                        if self.candidate(e, v):
+                            desired[(e, v)] = org.shares_team(e, v)
+            else:
+                for v in org.user_ids:
+                    for e in self.column(v):
+                        desired[(e, v)] = org.shares_team(e, v)
+            return desired, None, None
+
+        rows, cols = set(rows or ()), set(cols or ())
+        if self.policy.cap is None:
+            for e in rows & active:
+                for v in org.user_ids:
+                    if self.candidate(e, v):
+                        desired[(e, v)] = org.shares_team(e, v)
+        else:
+            for e in rows & active:
+                cols.update(v for v in org.user_ids if self.candidate(e, v))
+        for v in cols & active:
+            for e in (self.column(v) if self.policy.cap is not None
+                      else [e for e in org.user_ids if self.candidate(e, v)]):
+                desired[(e, v)] = org.shares_team(e, v)
+        return desired, rows, cols
@@ -0,0 +1,185 @@
+"""Backend PostgreSQL da camada de dados.
+
+As funções de dados escrevem SQL no dialeto do SQLite (``?``, ``INSERT OR
+IGNORE``, ``group_concat``...) e usam as linhas como ``sqlite3.Row``. Aqui as
+ligações psycopg são embrulhadas para se comportarem da mesma forma: cada
+statement é traduzido uma vez (e memorizado) para o dialeto do PostgreSQL e as
+linhas aceitam acesso por posição e por nome. As ligações ficam em autocommit;
+as transações são os ``BEGIN``/``COMMIT`` explícitos de :func:`av360.db.transaction`,
+tal como no SQLite, e o pool de ligações é o mesmo.
+
+Escolhe-se com ``AV360_DATABASE_URL=postgresql://utilizador@servidor/base``.
+Requer o ``psycopg`` (versão 3).
+"""
+import functools
+import re
+import time
+
+from av360 import profiling
+
+DIALECT = "postgresql"
+URL_PREFIXES = ("postgresql://", "postgres://")
+
+_GROUP_CONCAT = re.compile(r"\bgroup_concat\(([^()]*)\)", re.IGNORECASE)
+_INSERT_OR_IGNORE = re.compile(r"^(\s*)INSERT\s+OR\s+IGNORE\s+INTO\b", re.IGNORECASE)
+_LIKE = re.compile(r"\bLIKE\b")
+_BEGIN = re.compile(r"^\s*BEGIN\s+(IMMEDIATE|EXCLUSIVE|DEFERRED)\s*$", re.IGNORECASE)
+_DDL = re.compile(r"^\s*(CREATE|ALTER)\s+TABLE\b", re.IGNORECASE)
+_AUTOINCREMENT = re.compile(r"\bINTEGER\s+PRIMARY\s+KEY\s+AUTOINCREMENT\b", re.IGNORECASE)
+_REAL = re.compile(r"\bREAL\b")
+
+
+def is_url(target: str) -> bool:
+    return target.startswith(URL_PREFIXES)
+
+
+@functools.lru_cache(maxsize=1024)
+def translate(sql: str) -> str:
+    """Statement no dialeto do SQLite -> PostgreSQL (parâmetros ``%s``)."""
+    if _BEGIN.match(sql):
+        return "BEGIN"
+    sql = _GROUP_CONCAT.sub(r"string_agg(CAST(\1 AS TEXT), ',')", sql)
+    if _INSERT_OR_IGNORE.match(sql):
+        sql = _INSERT_OR_IGNORE.sub(r"\1INSERT INTO", sql).rstrip().rstrip(";") + " ON CONFLICT DO NOTHING"
+    if _DDL.match(sql):
+        sql = _AUTOINCREMENT.sub("INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY", sql)
+        sql = _REAL.sub("DOUBLE PRECISION", sql)
+    # O LIKE do SQLite ignora maiúsculas/minúsculas (ASCII)
+    sql = _LIKE.sub("ILIKE", sql)
+    out, quoted = [], False
+    for ch in sql:
+        if ch == "'":
+            quoted = not quoted
+        if ch == "%":
+            out.append("%%")
+        elif ch == "?" and not quoted:
+            out.append("%s")
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+class Row(tuple):
+    """Linha com acesso por posição e por nome, como ``sqlite3.Row``."""
+
+    __slots__ = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def keys(self):
+        return list(self._index)
+
+
+@functools.lru_cache(maxsize=256)
+def _row_class(names: tuple):
+    return type("Row", (Row,), {"__slots__": (), "_index": {name: i for i, name in enumerate(names)}})
+
+
+class Cursor:
+    """Cursor com a interface usada pela camada de dados (a do ``sqlite3``)."""
+
+    def __init__(self, conn: "Connection"):
+        self.connection = conn
+        self.row_factory = conn.row_factory
+        self._cur = conn.raw.cursor()
+        self._event = None
+
+    def _run(self, method, sql, parameters):
+        translated = translate(sql)
+        if self.connection.trace_callback is not None:
+            self.connection.trace_callback(sql)
+        profile = profiling.current()
+        if profile is None:
+            method(translated, parameters)
+            return self
+        t0 = time.perf_counter()
+        try:
+            method(translated, parameters)
+        finally:
+            self._event = profile.record(sql, time.perf_counter() - t0, max(self._cur.rowcount, 0))
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self._run(self._cur.execute, sql, tuple(parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = [tuple(p) for p in seq_of_parameters]
+        if not seq_of_parameters:
+            return self
+        return self._run(self._cur.executemany, sql, seq_of_parameters)
+
+    @property
+    def rowcount(self) -> int:
+        return self._cur.rowcount
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    def _rows(self, rows):
+        if self._event is not None:
+            self._event["rows"] += len(rows)
+        if self.row_factory is None or self._cur.description is None:
+            return rows
+        cls = _row_class(tuple(c.name for c in self._cur.description))
+        return [cls(r) for r in rows]
+
+    def fetchone(self):
+        row = self._cur.fetchone()
+        return None if row is None else self._rows([row])[0]
+
+    def fetchmany(self, size=None):
+        return self._rows(self._cur.fetchmany(size or self._cur.arraysize))
+
+    def fetchall(self):
+        return self._rows(self._cur.fetchall())
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class Connection:
+    """Ligação psycopg em autocommit, com a interface ``sqlite3.Connection`` usada pelo pool."""
+
+    dialect = DIALECT
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.row_factory = Row
+        self.trace_callback = None
+
+    def cursor(self) -> Cursor:
+        return Cursor(self)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def set_trace_callback(self, callback):
+        self.trace_callback = callback
+
+    @property
+    def in_transaction(self) -> bool:
+        from psycopg.pq import TransactionStatus
+
+        return self.raw.info.transaction_status != TransactionStatus.IDLE
+
+    def rollback(self):
+        self.raw.execute("ROLLBACK")
+
+    def close(self):
+        self.raw.close()
+
+
+def connect(url: str) -> Connection:
+    try:
+        import psycopg
+    except ImportError:
+        raise RuntimeError("Para usar PostgreSQL é necessário instalar o psycopg (versão 3).") from None
+    return Connection(psycopg.connect(url, autocommit=True))
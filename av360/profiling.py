@@ -0,0 +1,179 @@
+"""Instrumentação de queries e ligações por execução (rerun) do Streamlit.
+
+As ligações do pool usam :class:`ProfiledConnection`, cujos cursores registam
+cada statement (texto, duração, linhas, local de chamada) no perfil ativo da
+thread atual. Sem perfil ativo o custo é só uma verificação. Um perfil é
+ativado com :func:`start` no início do rerun e fechado com :func:`stop`; com
+``AV360_PROFILE=1`` fica ligado para todos os reruns e, se
+``AV360_PROFILE_LOG`` apontar para um ficheiro, cada perfil é acrescentado
+como uma linha JSON.
+"""
+import contextlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+ENABLED = os.environ.get("AV360_PROFILE", "") not in ("", "0")
+LOG_PATH = os.environ.get("AV360_PROFILE_LOG")
+
+_local = threading.local()
+
+# Frames a ignorar ao procurar quem chamou a query.
+_SKIP_FILES = {
+    __file__,
+    os.path.join(os.path.dirname(__file__), "db.py"),
+    os.path.join(os.path.dirname(__file__), "cache.py"),
+    os.path.join(os.path.dirname(__file__), "postgres.py"),
+    contextlib.__file__,
+}
+
+
+class QueryProfile:
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.started = time.perf_counter()
+        self.wall_ms = None
+        self.statements = []
+        self.checkouts = 0
+        self.connections = 0
+
+    def record(self, sql: str, duration: float, rows: int) -> dict:
+        event = {
+            "sql": " ".join(sql.split()),
+            "ms": duration * 1000,
+            "rows": rows,
+            "call_site": _call_site(),
+        }
+        self.statements.append(event)
+        return event
+
+    @property
+    def sql_ms(self) -> float:
+        return sum(e["ms"] for e in self.statements)
+
+    def slowest(self, n: int = 10):
+        return sorted(self.statements, key=lambda e: e["ms"], reverse=True)[:n]
+
+    def summary(self) -> dict:
+        return {
+            "label": self.label,
+            "statements": len(self.statements),
+            "sql_ms": self.sql_ms,
+            "wall_ms": self.wall_ms,
+            "checkouts": self.checkouts,
+            "connections": self.connections,
+        }
+
+
+def _call_site() -> str:
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_code.co_filename in _SKIP_FILES:
+        frame = frame.f_back
+    if frame is None:
+        return "?"
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+def current():
+    """Perfil ativo nesta thread (ou None)."""
+    return getattr(_local, "profile", None)
+
+
+def start(label: str = "") -> QueryProfile:
+    profile = _local.profile = QueryProfile(label)
+    return profile
+
+
+def stop():
+    profile = current()
+    if profile is not None:
+        profile.wall_ms = (time.perf_counter() - profile.started) * 1000
+    _local.profile = None
+    return profile
+
+
+def note_checkout():
+    profile = current()
+    if profile is not None:
+        profile.checkouts += 1
+
+
+def note_connection():
+    profile = current()
+    if profile is not None:
+        profile.connections += 1
+
+
+def export(profile: QueryProfile, path: str = None):
+    """Acrescenta o perfil como uma linha JSON ao ficheiro de log (se configurado)."""
+    path = path or LOG_PATH
+    if not path:
+        return
+    record = {"at": datetime.now().isoformat(timespec="seconds"), **profile.summary(),
+              "statements_detail": profile.statements}
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    _event = None
+
+    def execute(self, sql, parameters=()):
+        profile = current()
+        if profile is None:
+            return super().execute(sql, parameters)
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._event = profile.record(sql, time.perf_counter() - t0, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        profile = current()
+        if profile is None:
+            return super().executemany(sql, seq_of_parameters)
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._event = profile.record(sql, time.perf_counter() - t0, max(self.rowcount, 0))
+
+    def _fetched(self, t0, rows):
+        if self._event is not None:
+            self._event["ms"] += (time.perf_counter() - t0) * 1000
+            self._event["rows"] += rows
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(t0, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(t0, len(rows))
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(t0, len(rows))
+        return rows
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Ligação cujos cursores (incluindo os de ``execute``) são instrumentados."""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
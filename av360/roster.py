@@ -0,0 +1,278 @@
+"""Importação em massa de colaboradores, equipas e ligações utilizador–equipa.
+
+O ficheiro (CSV ou Excel) tem uma linha por pessoa e equipa, com as colunas
+``email``, ``name`` e ``team`` e, opcionalmente, ``role``, ``password``,
+``is_primary`` e ``is_active``. Quem pertence a várias equipas aparece em
+várias linhas. O ficheiro é lido em blocos; emails e nomes de equipa são
+resolvidos por dicionários carregados uma vez e as escritas são feitas com
+``executemany`` numa única transação.
+
+    python -m av360.roster colaboradores.csv [--dry-run] [--keep-memberships]
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+from dataclasses import asdict, dataclass, field
+
+from av360 import cache, db, passwords, schema
+
+REQUIRED_COLUMNS = ("email", "name", "team")
+ROLES = ("CEO", "RESPONSAVEL", "MEMBRO", "ESTAGIARIO")
+DEFAULT_ROLE = "MEMBRO"
+CHUNK_SIZE = 1000
+
+_TRUE = {"1", "true", "sim", "yes", "x", "s", "y"}
+
+
+@dataclass
+class ImportReport:
+    users_created: list = field(default_factory=list)
+    users_updated: list = field(default_factory=list)
+    users_unchanged: int = 0
+    teams_created: list = field(default_factory=list)
+    memberships_added: int = 0
+    memberships_updated: int = 0
+    memberships_removed: int = 0
+    rows: int = 0
+    errors: list = field(default_factory=list)
+    dry_run: bool = False
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class _DryRun(Exception):
+    pass
+
+
+def _flag(value, default: int) -> int:
+    if value is None or str(value).strip() == "":
+        return default
+    return 1 if str(value).strip().lower() in _TRUE else 0
+
+
+def iter_rows(source, filename: str = None):
+    """Itera as linhas do ficheiro como dicts (chaves em minúsculas), sem o carregar todo.
+
+    ``source`` é um caminho ou um ficheiro binário (ex.: upload do Streamlit).
+    """
+    name = (filename or (source if isinstance(source, str) else getattr(source, "name", ""))).lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        yield from _iter_excel(source)
+        return
+    if isinstance(source, str):
+        with open(source, newline="", encoding="utf-8-sig") as f:
+            yield from _iter_csv(f)
+    else:
+        yield from _iter_csv(io.TextIOWrapper(source, encoding="utf-8-sig", newline=""))
+
+
+def _iter_csv(f):
+    sample = f.read(4096)
+    f.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(f, dialect=dialect)
+    reader.fieldnames = [(c or "").strip().lower() for c in reader.fieldnames or []]
+    _check_columns(reader.fieldnames)
+    yield from reader
+
+
+def _iter_excel(source):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError("Para importar ficheiros Excel é necessário instalar o openpyxl.") from None
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(c or "").strip().lower() for c in next(rows, ())]
+        _check_columns(header)
+        for values in rows:
+            yield {k: ("" if v is None else str(v)) for k, v in zip(header, values)}
+    finally:
+        wb.close()
+
+
+def _check_columns(columns):
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f"Colunas em falta no ficheiro: {', '.join(missing)}")
+
+
+def import_roster(source, filename: str = None, replace_memberships: bool = True,
+                  dry_run: bool = False, chunk_size: int = CHUNK_SIZE) -> ImportReport:
+    """Importa/atualiza utilizadores, equipas e ligações a partir de um ficheiro.
+
+    Com ``replace_memberships`` as equipas de cada pessoa presente no ficheiro
+    passam a ser exatamente as indicadas (mudanças de equipa removem a antiga).
+    Com ``dry_run`` tudo é calculado mas a transação é revertida.
+    """
+    report = ImportReport(dry_run=dry_run)
+    rows = iter_rows(source, filename)
+    try:
+        with db.transaction() as conn:
+            _import(conn.cursor(), rows, report, replace_memberships, chunk_size, dry_run)
+            if dry_run:
+                raise _DryRun
+    except _DryRun:
+        pass
+    if not dry_run:
+        cache.invalidate("users", "teams", "scores")
+    return report
+
+
+def _import(cur, rows, report, replace_memberships, chunk_size, dry_run=False):
+    users = {
+        r["email"].lower(): r
+        for r in cur.execute("SELECT id, email, name, role, is_active FROM users").fetchall()
+    }
+    teams = {r["name"]: r["id"] for r in cur.execute("SELECT id, name FROM teams").fetchall()}
+    memberships = {}
+    for r in cur.execute("SELECT user_id, team_id, is_primary FROM user_teams").fetchall():
+        memberships[(r["user_id"], r["team_id"])] = r["is_primary"]
+
+    seen = set()
+    file_teams = {}  # user_id -> equipas no ficheiro
+    line = 1
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        new_users, updated_users, links = [], [], []
+
+        for raw in chunk:
+            line += 1
+            report.rows += 1
+            email = (raw.get("email") or "").strip().lower()
+            name = (raw.get("name") or "").strip()
+            team = (raw.get("team") or "").strip()
+            role = (raw.get("role") or "").strip().upper()
+            password = raw.get("password") or ""
+            if "@" not in email:
+                report.errors.append((line, f"email inválido: {email!r}"))
+                continue
+            if not name or not team:
+                report.errors.append((line, "nome e equipa são obrigatórios"))
+                continue
+            if role and role not in ROLES:
+                report.errors.append((line, f"papel desconhecido: {role}"))
+                continue
+
+            if email not in seen:
+                seen.add(email)
+                existing = users.get(email)
+                # Papel/estado vazios mantêm os atuais (ou os valores por omissão, se novo)
+                role = role or (existing["role"] if existing else DEFAULT_ROLE)
+                is_active = _flag(raw.get("is_active"), existing["is_active"] if existing else 1)
+                if existing is None:
+                    if not password:
+                        report.errors.append((line, f"password obrigatória para o novo utilizador {email}"))
+                        seen.discard(email)
+                        continue
+                    new_users.append((name, email, password, role, is_active))
+                elif (existing["name"], existing["role"], existing["is_active"]) != (name, role, is_active):
+                    updated_users.append((name, role, is_active, existing["id"]))
+                    report.users_updated.append(email)
+                else:
+                    report.users_unchanged += 1
+            links.append((email, team, _flag(raw.get("is_primary"), 0)))
+
+        if new_users:
+            # A KDF é o passo caro da importação: em paralelo, e não na simulação
+            hashes = [""] * len(new_users) if dry_run else passwords.hash_passwords(u[2] for u in new_users)
+            cur.executemany(
+                "INSERT INTO users(name,email,password_hash,role,is_active) VALUES (?,?,?,?,?)",
+                [(n, e, h, r, a) for (n, e, _, r, a), h in zip(new_users, hashes)],
+            )
+            emails = [u[1] for u in new_users]
+            for r in _select_in(cur, "SELECT id, email, name, role, is_active FROM users WHERE email IN ({})", emails):
+                users[r["email"].lower()] = r
+            report.users_created.extend(emails)
+        if updated_users:
+            cur.executemany("UPDATE users SET name=?, role=?, is_active=? WHERE id=?", updated_users)
+
+        new_teams = sorted({t for _, t, _ in links if t not in teams})
+        if new_teams:
+            cur.executemany("INSERT INTO teams(name) VALUES (?)", [(t,) for t in new_teams])
+            for r in _select_in(cur, "SELECT id, name FROM teams WHERE name IN ({})", new_teams):
+                teams[r["name"]] = r["id"]
+            report.teams_created.extend(new_teams)
+
+        upserts = []
+        for email, team, is_primary in links:
+            user_id, team_id = users[email]["id"], teams[team]
+            file_teams.setdefault(user_id, set()).add(team_id)
+            current = memberships.get((user_id, team_id))
+            if current is None:
+                report.memberships_added += 1
+            elif current != is_primary:
+                report.memberships_updated += 1
+            else:
+                continue
+            memberships[(user_id, team_id)] = is_primary
+            upserts.append((user_id, team_id, is_primary))
+        cur.executemany(
+            """
+            INSERT INTO user_teams(user_id, team_id, is_primary) VALUES (?,?,?)
+            ON CONFLICT(user_id, team_id) DO UPDATE SET is_primary=excluded.is_primary
+            """,
+            upserts,
+        )
+
+    if replace_memberships:
+        stale = [
+            (user_id, team_id)
+            for (user_id, team_id) in memberships
+            if user_id in file_teams and team_id not in file_teams[user_id]
+        ]
+        cur.executemany("DELETE FROM user_teams WHERE user_id=? AND team_id=?", stale)
+        report.memberships_removed = len(stale)
+
+
+def _select_in(cur, sql, values, chunk_size=900):
+    """SELECT ... IN ({}) em blocos que respeitam o limite de parâmetros do SQLite."""
+    rows = []
+    for i in range(0, len(values), chunk_size):
+        part = values[i:i + chunk_size]
+        rows.extend(cur.execute(sql.format(",".join("?" * len(part))), part).fetchall())
+    return rows
+
+
+def add_arguments(parser):
+    parser.add_argument("file")
+    parser.add_argument("--dry-run", action="store_true", help="mostra o relatório sem gravar")
+    parser.add_argument("--keep-memberships", action="store_true",
+                        help="não remove ligações a equipas ausentes do ficheiro")
+
+
+def run(args):
+    try:
+        report = import_roster(args.file, replace_memberships=not args.keep_memberships, dry_run=args.dry_run)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(json.dumps(report.as_dict(), indent=2, ensure_ascii=False))
+    return 1 if report.errors else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa colaboradores e equipas de um ficheiro CSV/Excel.")
+    add_arguments(parser)
+    parser.add_argument("--db", default=os.environ.get("AV360_DB_PATH"), help="ficheiro SQLite")
+    args = parser.parse_args(argv)
+    if args.db:
+        db.DB_PATH = args.db
+    schema.ensure_db()
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,791 @@
+"""Esquema da base de dados: tabelas base, dados iniciais e migrações.
+
+A versão do esquema é o ``PRAGMA user_version`` (no PostgreSQL, a tabela
+``schema_version``). Uma base de dados na versão 0
+(nova, ou anterior às migrações) recebe as tabelas base e os dados iniciais;
+depois cada entrada de :data:`MIGRATIONS` acima da versão atual corre uma
+única vez, por ordem, na mesma transação. Com a base de dados atualizada,
+:func:`setup_db` é apenas a leitura da versão.
+"""
+import threading
+from datetime import date
+
+from av360 import cache, db, passwords
+
+# Agregados por (período, avaliado, categoria) a partir das respostas atuais.
+SCORE_AGGREGATES_BACKFILL = """
+    INSERT INTO score_aggregates
+    (period_id, evaluatee_id, category, score_sum, score_count, weighted_sum, weight_sum)
+    SELECT a.period_id, a.evaluatee_id, c.category,
+           SUM(ea.score), COUNT(*), SUM(ea.score * c.weight), SUM(c.weight)
+    FROM evaluation_answers ea
+    JOIN evaluation_assignments a ON a.id = ea.assignment_id
+    JOIN competencies c ON c.id = ea.competency_id
+    GROUP BY a.period_id, a.evaluatee_id, c.category
+"""
+
+# O mesmo, sem as respostas de assignments removidos (removed_at, migração 3):
+# essas deixam de contar nas médias a partir da migração 8.
+SCORE_AGGREGATES_REBUILD = """
+    INSERT INTO score_aggregates
+    (period_id, evaluatee_id, category, score_sum, score_count, weighted_sum, weight_sum)
+    SELECT a.period_id, a.evaluatee_id, c.category,
+           SUM(ea.score), COUNT(*), SUM(ea.score * c.weight), SUM(c.weight)
+    FROM evaluation_answers ea
+    JOIN evaluation_assignments a ON a.id = ea.assignment_id
+    JOIN competencies c ON c.id = ea.competency_id
+    WHERE a.removed_at IS NULL
+    GROUP BY a.period_id, a.evaluatee_id, c.category
+"""
+
+# Mudanças que alteram a organização vista pelas políticas de atribuição
+ROSTER_EVENTS = {
+    "users": ("INSERT", "UPDATE OF is_active", "DELETE"),
+    "user_teams": ("INSERT", "UPDATE", "DELETE"),
+}
+
+# Migrações versionadas (PRAGMA user_version): cada entrada corre uma única vez,
+# por ordem, depois das tabelas base existirem. Um statement que dependa do
+# dialeto escreve-se {"sqlite": ..., "postgresql": ...}; falta de chave = não se aplica.
+MIGRATIONS = [
+    (1, (
+        # get_my_scores / get_my_scores_over_time filtram pelo avaliado
+        "CREATE INDEX IF NOT EXISTS idx_assignments_evaluatee_period "
+        "ON evaluation_assignments(evaluatee_id, period_id)",
+        # equipas partilhadas: join user_teams × user_teams pela equipa
+        "CREATE INDEX IF NOT EXISTS idx_user_teams_team ON user_teams(team_id, user_id)",
+    )),
+    (2, (
+        # Médias materializadas, mantidas por triggers a cada resposta gravada
+        """
+        CREATE TABLE IF NOT EXISTS score_aggregates (
+            period_id INTEGER NOT NULL,
+            evaluatee_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            score_sum REAL NOT NULL DEFAULT 0,
+            score_count INTEGER NOT NULL DEFAULT 0,
+            weighted_sum REAL NOT NULL DEFAULT 0,
+            weight_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (period_id, evaluatee_id, category)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_score_aggregates_evaluatee "
+        "ON score_aggregates(evaluatee_id, period_id)",
+        {"sqlite": """
+        CREATE TRIGGER IF NOT EXISTS trg_answers_aggregate_insert
+        AFTER INSERT ON evaluation_answers
+        BEGIN
+            INSERT INTO score_aggregates
+            (period_id, evaluatee_id, category, score_sum, score_count, weighted_sum, weight_sum)
+            SELECT a.period_id, a.evaluatee_id, c.category, NEW.score, 1, NEW.score * c.weight, c.weight
+            FROM evaluation_assignments a, competencies c
+            WHERE a.id = NEW.assignment_id AND c.id = NEW.competency_id
+            ON CONFLICT(period_id, evaluatee_id, category) DO UPDATE SET
+                score_sum = score_sum + excluded.score_sum,
+                score_count = score_count + 1,
+                weighted_sum = weighted_sum + excluded.weighted_sum,
+                weight_sum = weight_sum + excluded.weight_sum;
+        END
+        """},
+        {"sqlite": """
+        CREATE TRIGGER IF NOT EXISTS trg_answers_aggregate_delete
+        AFTER DELETE ON evaluation_answers
+        BEGIN
+            UPDATE score_aggregates
+            SET score_sum = score_sum - OLD.score,
+                score_count = score_count - 1,
+                weighted_sum = weighted_sum - OLD.score * (SELECT weight FROM competencies WHERE id = OLD.competency_id),
+                weight_sum = weight_sum - (SELECT weight FROM competencies WHERE id = OLD.competency_id)
+            WHERE (period_id, evaluatee_id) = (SELECT period_id, evaluatee_id FROM evaluation_assignments WHERE id = OLD.assignment_id)
+              AND category = (SELECT category FROM competencies WHERE id = OLD.competency_id);
+        END
+        """},
+        {"sqlite": """
+        CREATE TRIGGER IF NOT EXISTS trg_answers_aggregate_update
+        AFTER UPDATE OF assignment_id, competency_id, score ON evaluation_answers
+        BEGIN
+            UPDATE score_aggregates
+            SET score_sum = score_sum - OLD.score,
+                score_count = score_count - 1,
+                weighted_sum = weighted_sum - OLD.score * (SELECT weight FROM competencies WHERE id = OLD.competency_id),
+                weight_sum = weight_sum - (SELECT weight FROM competencies WHERE id = OLD.competency_id)
+            WHERE (period_id, evaluatee_id) = (SELECT period_id, evaluatee_id FROM evaluation_assignments WHERE id = OLD.assignment_id)
+              AND category = (SELECT category FROM competencies WHERE id = OLD.competency_id);
+            INSERT INTO score_aggregates
+            (period_id, evaluatee_id, category, score_sum, score_count, weighted_sum, weight_sum)
+            SELECT a.period_id, a.evaluatee_id, c.category, NEW.score, 1, NEW.score * c.weight, c.weight
+            FROM evaluation_assignments a, competencies c
+            WHERE a.id = NEW.assignment_id AND c.id = NEW.competency_id
+            ON CONFLICT(period_id, evaluatee_id, category) DO UPDATE SET
+                score_sum = score_sum + excluded.score_sum,
+                score_count = score_count + 1,
+                weighted_sum = weighted_sum + excluded.weighted_sum,
+                weight_sum = weight_sum + excluded.weight_sum;
+        END
+        """},
+        # No PostgreSQL os três triggers são uma função plpgsql
+        {"postgresql": """
+        CREATE OR REPLACE FUNCTION trg_answers_aggregate() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                UPDATE score_aggregates sa
+                SET score_sum = sa.score_sum - OLD.score,
+                    score_count = sa.score_count - 1,
+                    weighted_sum = sa.weighted_sum - OLD.score * c.weight,
+                    weight_sum = sa.weight_sum - c.weight
+                FROM evaluation_assignments a, competencies c
+                WHERE a.id = OLD.assignment_id AND c.id = OLD.competency_id
+                  AND sa.period_id = a.period_id AND sa.evaluatee_id = a.evaluatee_id
+                  AND sa.category = c.category;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO score_aggregates
+                (period_id, evaluatee_id, category, score_sum, score_count, weighted_sum, weight_sum)
+                SELECT a.period_id, a.evaluatee_id, c.category, NEW.score, 1, NEW.score * c.weight, c.weight
+                FROM evaluation_assignments a, competencies c
+                WHERE a.id = NEW.assignment_id AND c.id = NEW.competency_id
+                ON CONFLICT (period_id, evaluatee_id, category) DO UPDATE SET
+                    score_sum = score_aggregates.score_sum + excluded.score_sum,
+                    score_count = score_aggregates.score_count + 1,
+                    weighted_sum = score_aggregates.weighted_sum + excluded.weighted_sum,
+                    weight_sum = score_aggregates.weight_sum + excluded.weight_sum;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """},
+        {"postgresql": """
+        CREATE TRIGGER trg_answers_aggregate
+        AFTER INSERT OR DELETE OR UPDATE OF assignment_id, competency_id, score ON evaluation_answers
+        FOR EACH ROW EXECUTE FUNCTION trg_answers_aggregate()
+        """},
+        SCORE_AGGREGATES_BACKFILL,
+    )),
+    (3, (
+        # Assignments que deixaram de fazer sentido (utilizador desativado) ficam
+        # marcados em vez de apagados: as respostas já dadas ficam guardadas mas,
+        # desde a migração 8, deixam de contar nas médias enquanto o assignment
+        # estiver removido; voltam a contar se ele for reposto.
+        "ALTER TABLE evaluation_assignments ADD COLUMN removed_at TEXT",
+    )),
+    (4, (
+        # Política de atribuição do período (av360.policies); "full" é a regra original
+        "ALTER TABLE evaluation_periods ADD COLUMN assignment_policy TEXT NOT NULL DEFAULT 'full'",
+    )),
+    (5, (
+        # Períodos arquivados (av360.archive): as linhas saem das tabelas vivas e
+        # ficam as contagens; as médias continuam em score_aggregates.
+        "ALTER TABLE evaluation_periods ADD COLUMN archived_at TEXT",
+        """
+        CREATE TABLE IF NOT EXISTS period_summaries (
+            period_id INTEGER PRIMARY KEY,
+            n_assignments INTEGER NOT NULL,
+            n_answered INTEGER NOT NULL,
+            n_answers INTEGER NOT NULL,
+            n_evaluatees INTEGER NOT NULL,
+            FOREIGN KEY(period_id) REFERENCES evaluation_periods(id)
+        )
+        """,
+    )),
+    (6, (
+        # Sessões de login do lado do servidor (av360.sessions); só o hash do token
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            token_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+        """,
+    )),
+    (7, (
+        # Contador de mudanças da organização (utilizadores ativos e equipas):
+        # sync_assignments compara-o em cada rerun em vez de reler user_teams.
+        """
+        CREATE TABLE IF NOT EXISTS roster_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+        """,
+        "INSERT OR IGNORE INTO roster_version(id, version) VALUES (1, 0)",
+        *(
+            {"sqlite": f"""
+            CREATE TRIGGER IF NOT EXISTS trg_roster_version_{table}_{event.split()[0].lower()}
+            AFTER {event} ON {table}
+            BEGIN
+                UPDATE roster_version SET version = version + 1 WHERE id = 1;
+            END
+            """}
+            for table, events in ROSTER_EVENTS.items()
+            for event in events
+        ),
+        {"postgresql": """
+        CREATE OR REPLACE FUNCTION trg_roster_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE roster_version SET version = version + 1 WHERE id = 1;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """},
+        *(
+            {"postgresql": f"""
+            CREATE TRIGGER trg_roster_version_{table}
+            AFTER {" OR ".join(events)} ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION trg_roster_version()
+            """}
+            for table, events in ROSTER_EVENTS.items()
+        ),
+    )),
+    (8, (
+        # As respostas de assignments removidos deixam de contar em score_aggregates:
+        # os triggers das respostas ignoram-nas e marcar/repor um assignment
+        # desconta/volta a somar as respostas dele.
+        {"sqlite": "DROP TRIGGER IF EXISTS trg_answers_aggregate_insert"},
+        {"sqlite": "DROP TRIGGER IF EXISTS trg_answers_aggregate_delete"},
+        {"sqlite": "DROP TRIGGER IF EXISTS trg_answers_aggregate_update"},
+        {"sqlite": """
+        CREATE TRIGGER trg_answers_aggregate_insert
+        AFTER INSERT ON evaluation_answers
+        BEGIN
+            INSERT INTO score_aggregates
+            (period_id, evaluatee_id, category, score_sum, score_count, weighted_sum, weight_sum)
+            SELECT a.period_id, a.evaluatee_id, c.category, NEW.score, 1, NEW.score * c.weight, c.weight
+            FROM evaluation_assignments a, competencies c
+            WHERE a.id = NEW.assignment_id AND a.removed_at IS NULL AND c.id = NEW.competency_id
+            ON CONFLICT(period_id, evaluatee_id, category) DO UPDATE SET
+                score_sum = score_sum + excluded.score_sum,
+                score_count = score_count + 1,
+                weighted_sum = weighted_sum + excluded.weighted_sum,
+                weight_sum = weight_sum + excluded.weight_sum;
+        END
+        """},
+        {"sqlite": """
+        CREATE TRIGGER trg_answers_aggregate_delete
+        AFTER DELETE ON evaluation_answers
+        BEGIN
+            UPDATE score_aggregates
+            SET score_sum = score_sum - OLD.score,
+                score_count = score_count - 1,
+                weighted_sum = weighted_sum - OLD.score * (SELECT weight FROM competencies WHERE id = OLD.competency_id),
+                weight_sum = weight_sum - (SELECT weight FROM competencies WHERE id = OLD.competency_id)
+            WHERE (period_id, evaluatee_id) = (SELECT period_id, evaluatee_id FROM evaluation_assignments
+                                               WHERE id = OLD.assignment_id AND removed_at IS NULL)
+              AND category = (SELECT category FROM competencies WHERE id = OLD.competency_id);
+        END
+        """},
+        {"sqlite": """
+        CREATE TRIGGER trg_answers_aggregate_update
+        AFTER UPDATE OF assignment_id, competency_id, score ON evaluation_answers
+        BEGIN
+            UPDATE score_aggregates
+            SET score_sum = score_sum - OLD.score,
+                score_count = score_count - 1,
+                weighted_sum = weighted_sum - OLD.score * (SELECT weight FROM competencies WHERE id = OLD.competency_id),
+                weight_sum = weight_sum - (SELECT weight FROM competencies WHERE id = OLD.competency_id)
+            WHERE (period_id, evaluatee_id) = (SELECT period_id, evaluatee_id FROM evaluation_assignments
+                                               WHERE id = OLD.assignment_id AND removed_at IS NULL)
+              AND category = (SELECT category FROM competencies WHERE id = OLD.competency_id);
+            INSERT INTO score_aggregates
+            (period_id, evaluatee_id, category, score_sum, score_count, weighted_sum, weight_sum)
+            SELECT a.period_id, a.evaluatee_id, c.category, NEW.score, 1, NEW.score * c.weight, c.weight
+            FROM evaluation_assignments a, competencies c
+            WHERE a.id = NEW.assignment_id AND a.removed_at IS NULL AND c.id = NEW.competency_id
+            ON CONFLICT(period_id, evaluatee_id, category) DO UPDATE SET
+                score_sum = score_sum + excluded.score_sum,
+                score_count = score_count + 1,
+                weighted_sum = weighted_sum + excluded.weighted_sum,
+                weight_sum = weight_sum + excluded.weight_sum;
+        END
+        """},
+        {"sqlite": """
+        CREATE TRIGGER IF NOT EXISTS trg_assignment_removed_aggregate
+        AFTER UPDATE OF removed_at ON evaluation_assignments
+        WHEN (OLD.removed_at IS NULL) <> (NEW.removed_at IS NULL)
+        BEGIN
+            INSERT INTO score_aggregates
+            (period_id, evaluatee_id, category, score_sum, score_count, weighted_sum, weight_sum)
+            SELECT NEW.period_id, NEW.evaluatee_id, c.category,
+                   s.direction * SUM(ans.score), s.direction * COUNT(*),
+                   s.direction * SUM(ans.score * c.weight), s.direction * SUM(c.weight)
+            FROM evaluation_answers ans
+            JOIN competencies c ON c.id = ans.competency_id
+            JOIN (SELECT CASE WHEN NEW.removed_at IS NULL THEN 1 ELSE -1 END AS direction) s
+            WHERE ans.assignment_id = NEW.id
+            GROUP BY c.category
+            ON CONFLICT(period_id, evaluatee_id, category) DO UPDATE SET
+                score_sum = score_sum + excluded.score_sum,
+                score_count = score_count + excluded.score_count,
+                weighted_sum = weighted_sum + excluded.weighted_sum,
+                weight_sum = weight_sum + excluded.weight_sum;
+        END
+        """},
+        {"postgresql": """
+        CREATE OR REPLACE FUNCTION trg_answers_aggregate() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                UPDATE score_aggregates sa
+                SET score_sum = sa.score_sum - OLD.score,
+                    score_count = sa.score_count - 1,
+                    weighted_sum = sa.weighted_sum - OLD.score * c.weight,
+                    weight_sum = sa.weight_sum - c.weight
+                FROM evaluation_assignments a, competencies c
+                WHERE a.id = OLD.assignment_id AND a.removed_at IS NULL AND c.id = OLD.competency_id
+                  AND sa.period_id = a.period_id AND sa.evaluatee_id = a.evaluatee_id
+                  AND sa.category = c.category;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO score_aggregates
+                (period_id, evaluatee_id, category, score_sum, score_count, weighted_sum, weight_sum)
+                SELECT a.period_id, a.evaluatee_id, c.category, NEW.score, 1, NEW.score * c.weight, c.weight
+                FROM evaluation_assignments a, competencies c
+                WHERE a.id = NEW.assignment_id AND a.removed_at IS NULL AND c.id = NEW.competency_id
+                ON CONFLICT (period_id, evaluatee_id, category) DO UPDATE SET
+                    score_sum = score_aggregates.score_sum + excluded.score_sum,
+                    score_count = score_aggregates.score_count + 1,
+                    weighted_sum = score_aggregates.weighted_sum + excluded.weighted_sum,
+                    weight_sum = score_aggregates.weight_sum + excluded.weight_sum;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """},
+        {"postgresql": """
+        CREATE OR REPLACE FUNCTION trg_assignment_removed_aggregate() RETURNS trigger AS $$
+        DECLARE
+            direction INTEGER := CASE WHEN NEW.removed_at IS NULL THEN 1 ELSE -1 END;
+        BEGIN
+            INSERT INTO score_aggregates
+            (period_id, evaluatee_id, category, score_sum, score_count, weighted_sum, weight_sum)
+            SELECT NEW.period_id, NEW.evaluatee_id, c.category,
+                   direction * SUM(ans.score), direction * COUNT(*),
+                   direction * SUM(ans.score * c.weight), direction * SUM(c.weight)
+            FROM evaluation_answers ans
+            JOIN competencies c ON c.id = ans.competency_id
+            WHERE ans.assignment_id = NEW.id
+            GROUP BY c.category
+            ON CONFLICT (period_id, evaluatee_id, category) DO UPDATE SET
+                score_sum = score_aggregates.score_sum + excluded.score_sum,
+                score_count = score_aggregates.score_count + excluded.score_count,
+                weighted_sum = score_aggregates.weighted_sum + excluded.weighted_sum,
+                weight_sum = score_aggregates.weight_sum + excluded.weight_sum;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """},
+        {"postgresql": """
+        CREATE TRIGGER trg_assignment_removed_aggregate
+        AFTER UPDATE OF removed_at ON evaluation_assignments
+        FOR EACH ROW WHEN ((OLD.removed_at IS NULL) <> (NEW.removed_at IS NULL))
+        EXECUTE FUNCTION trg_assignment_removed_aggregate()
+        """},
+        # Refaz as médias dos períodos vivos sem as respostas já removidas
+        "DELETE FROM score_aggregates WHERE period_id NOT IN "
+        "(SELECT id FROM evaluation_periods WHERE archived_at IS NOT NULL)",
+        SCORE_AGGREGATES_REBUILD,
+    )),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def ensure_db():
+    """Cria/semeia a base de dados uma única vez por processo."""
+    global _ready
+    if _ready:
+        return
+    with _ready_lock:
+        if not _ready:
+            setup_db()
+            _ready = True
+
+
+def setup_db():
+    """Leva a base de dados para :data:`LATEST_VERSION`; devolve a versão final."""
+    version = schema_version()
+    if version >= LATEST_VERSION:
+        return version
+    with db.transaction() as conn:
+        cur = conn.cursor()
+        if db.dialect() == "postgresql":
+            # BEGIN IMMEDIATE não serializa o DDL no PostgreSQL; este lock sim
+            cur.execute("SELECT pg_advisory_xact_lock(360)")
+        # Relida dentro da transação: outro processo pode ter migrado entretanto.
+        version = _read_version(cur)
+        if version == 0:
+            _create_base_schema(cur)
+        version = _apply_migrations(cur, version)
+    cache.invalidate("periods", "users", "teams", "competencies", "scores")
+    return version
+
+
+def _create_base_schema(cur):
+    # Tabelas base
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS teams (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL
+        );
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT NOT NULL,
+            is_active INTEGER NOT NULL DEFAULT 1
+        );
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS user_teams (
+            user_id INTEGER NOT NULL,
+            team_id INTEGER NOT NULL,
+            is_primary INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, team_id),
+            FOREIGN KEY(user_id) REFERENCES users(id),
+            FOREIGN KEY(team_id) REFERENCES teams(id)
+        );
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS evaluation_periods (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            is_active INTEGER NOT NULL DEFAULT 1
+        );
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS competencies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            category TEXT NOT NULL,
+            team_id INTEGER,
+            leadership_only INTEGER NOT NULL DEFAULT 0,
+            weight REAL NOT NULL DEFAULT 1.0,
+            active INTEGER NOT NULL DEFAULT 1,
+            FOREIGN KEY(team_id) REFERENCES teams(id)
+        );
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS evaluation_assignments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            period_id INTEGER NOT NULL,
+            evaluator_id INTEGER NOT NULL,
+            evaluatee_id INTEGER NOT NULL,
+            include_behavioral INTEGER NOT NULL DEFAULT 0,
+            include_technical INTEGER NOT NULL DEFAULT 0,
+            include_objectives INTEGER NOT NULL DEFAULT 0,
+            UNIQUE(period_id, evaluator_id, evaluatee_id),
+            FOREIGN KEY(period_id) REFERENCES evaluation_periods(id),
+            FOREIGN KEY(evaluator_id) REFERENCES users(id),
+            FOREIGN KEY(evaluatee_id) REFERENCES users(id)
+        );
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS evaluation_answers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            assignment_id INTEGER NOT NULL,
+            competency_id INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            comment TEXT,
+            UNIQUE(assignment_id, competency_id),
+            FOREIGN KEY(assignment_id) REFERENCES evaluation_assignments(id),
+            FOREIGN KEY(competency_id) REFERENCES competencies(id)
+        );
+    """)
+
+    # Equipas
+    teams = [
+        ("Marketing",),
+        ("Administrativo",),
+        ("Projetos",),
+        ("Consultoria & Ecossistema",),
+    ]
+    cur.executemany("INSERT OR IGNORE INTO teams(name) VALUES (?)", teams)
+
+    # Utilizadores
+    cur.execute("SELECT COUNT(*) AS c FROM users")
+    if cur.fetchone()["c"] == 0:
+        base_users = [
+            ("Vítor", "vitor@empresa.local", "1234", "CEO"),
+            ("Francisco", "francisco@empresa.local", "1234", "RESPONSAVEL"),
+            ("Natacha", "natacha@empresa.local", "1234", "MEMBRO"),
+            ("Mariana", "mariana@empresa.local", "1234", "MEMBRO"),
+            ("Nicole", "nicole@empresa.local", "1234", "ESTAGIARIO"),
+            ("Ana", "ana@empresa.local", "1234", "RESPONSAVEL"),
+            ("Paula", "paula@empresa.local", "1234", "MEMBRO"),
+            ("Bruno", "bruno@empresa.local", "1234", "RESPONSAVEL"),
+            ("Rita", "rita@empresa.local", "1234", "MEMBRO"),
+            ("Bernardo", "bernardo@empresa.local", "1234", "ESTAGIARIO"),
+            ("Luís Fonseca", "luis@empresa.local", "1234", "MEMBRO"),
+            ("Margarida", "margarida@empresa.local", "1234", "MEMBRO"),
+            ("Pacheco", "pacheco@empresa.local", "1234", "ESTAGIARIO"),
+            ("João", "joao@empresa.local", "1234", "RESPONSAVEL"),
+            ("Colaço", "colaco@empresa.local", "1234", "MEMBRO"),
+            ("Sandra", "sandra@empresa.local", "1234", "ESTAGIARIO"),
+            ("Cláudia", "claudia@empresa.local", "1234", "ESTAGIARIO"),
+        ]
+        hashes = passwords.hash_passwords(p for (_, _, p, _) in base_users)
+        cur.executemany(
+            "INSERT INTO users(name,email,password_hash,role) VALUES (?,?,?,?)",
+            [(n, e, h, r) for (n, e, _, r), h in zip(base_users, hashes)],
+        )
+
+    # Ligações utilizador–equipa
+    # Basta saber se há alguma linha (COUNT(*) leria a tabela toda)
+    cur.execute("SELECT 1 FROM user_teams LIMIT 1")
+    if cur.fetchone() is None:
+        user_ids = {r["email"]: r["id"] for r in cur.execute("SELECT id, email FROM users").fetchall()}
+        team_ids = {r["name"]: r["id"] for r in cur.execute("SELECT id, name FROM teams").fetchall()}
+        user_id = user_ids.get
+        team_id = team_ids.get
+
+        links = []
+
+        # Marketing
+        for email in ["francisco@empresa.local", "natacha@empresa.local", "mariana@empresa.local", "nicole@empresa.local"]:
+            links.append((user_id(email), team_id("Marketing"), 1 if email == "francisco@empresa.local" else 0))
+
+        # Administrativo
+        for email in ["ana@empresa.local", "paula@empresa.local", "bruno@empresa.local", "rita@empresa.local", "bernardo@empresa.local"]:
+            links.append((user_id(email), team_id("Administrativo"), 1 if email == "ana@empresa.local" else 0))
+
+        # Projetos
+        for email in ["luis@empresa.local", "bruno@empresa.local", "margarida@empresa.local", "pacheco@empresa.local"]:
+            links.append((user_id(email), team_id("Projetos"), 1 if email == "bruno@empresa.local" else 0))
+
+        # Consultoria & Ecossistema
+        for email in [
+            "joao@empresa.local",
+            "colaco@empresa.local",
+            "francisco@empresa.local",
+            "vitor@empresa.local",
+            "bruno@empresa.local",
+            "margarida@empresa.local",
+            "luis@empresa.local",
+            "sandra@empresa.local",
+            "claudia@empresa.local",
+        ]:
+            links.append((user_id(email), team_id("Consultoria & Ecossistema"), 1 if email == "joao@empresa.local" else 0))
+
+        links = [l for l in links if l[0] is not None and l[1] is not None]
+        cur.executemany(
+            "INSERT OR IGNORE INTO user_teams(user_id,team_id,is_primary) VALUES (?,?,?)",
+            links,
+        )
+
+    # Competências
+    cur.execute("SELECT COUNT(*) AS c FROM competencies")
+    if cur.fetchone()["c"] == 0:
+        behavioral = [
+            ("Colaboração & Trabalho em Equipa",
+             "Contribui de forma construtiva para o trabalho em equipa e apoia colegas quando necessário.",
+             "BEHAVIORAL", None, 0, 1.0),
+            ("Comunicação",
+             "Comunica de forma clara, ajustando a mensagem ao interlocutor e ouvindo ativamente.",
+             "BEHAVIORAL", None, 0, 1.0),
+            ("Responsabilidade & Fiabilidade",
+             "Cumpre prazos, assume responsabilidade pelos erros e é alguém em quem se pode confiar.",
+             "BEHAVIORAL", None, 0, 1.0),
+            ("Orientação para Resultados",
+             "Mantém foco nos objetivos, prioriza bem e entrega trabalho com qualidade.",
+             "BEHAVIORAL", None, 0, 1.0),
+            ("Proatividade & Inovação",
+             "Antecipar problemas, propõe melhorias e está disponível para experimentar novas abordagens.",
+             "BEHAVIORAL", None, 0, 1.0),
+            ("Desenvolvimento & Aprendizagem Contínua",
+             "Procura feedback, atualiza conhecimentos e aprende com os erros.",
+             "BEHAVIORAL", None, 0, 1.0),
+            ("Liderança",
+             "Dá orientação clara, apoia a equipa e reconhece o contributo dos outros.",
+             "BEHAVIORAL", None, 1, 1.2),
+        ]
+        cur.executemany(
+            "INSERT INTO competencies(name,description,category,team_id,leadership_only,weight) VALUES (?,?,?,?,?,?)",
+            behavioral,
+        )
+
+        t = {r["name"]: r["id"] for r in cur.execute("SELECT id, name FROM teams").fetchall()}.get
+
+        marketing_comps = [
+            ("Planeamento & Execução de Campanhas",
+             "Planeia e executa campanhas alinhadas com os objetivos e prazos.",
+             "TECHNICAL", t("Marketing")),
+            ("Conteúdos & Copywriting",
+             "Produz conteúdos claros, relevantes e ajustados ao público-alvo.",
+             "TECHNICAL", t("Marketing")),
+            ("Gestão de Redes Sociais & Comunidade",
+             "Garante presença consistente e interação adequada com a comunidade.",
+             "TECHNICAL", t("Marketing")),
+            ("Análise de Métricas de Marketing",
+             "Usa dados e métricas para melhorar campanhas e decisões.",
+             "TECHNICAL", t("Marketing")),
+            ("Branding & Posicionamento",
+             "Respeita e reforça a identidade e posicionamento da marca.",
+             "TECHNICAL", t("Marketing")),
+        ]
+        cur.executemany(
+            "INSERT INTO competencies(name,description,category,team_id) VALUES (?,?,?,?)",
+            marketing_comps,
+        )
+
+        admin_comps = [
+            ("Organização & Gestão de Tarefas",
+             "Mantém processos e documentação bem organizados.",
+             "TECHNICAL", t("Administrativo")),
+            ("Rigor & Atenção ao Detalhe",
+             "Minimiza erros em registos, documentos e processos.",
+             "TECHNICAL", t("Administrativo")),
+            ("Cumprimento de Procedimentos",
+             "Segue procedimentos definidos e garante conformidade.",
+             "TECHNICAL", t("Administrativo")),
+            ("Apoio à Equipa & Atendimento",
+             "Responde de forma profissional a pedidos internos e externos.",
+             "TECHNICAL", t("Administrativo")),
+            ("Eficiência Operacional",
+             "Procura simplificar processos e usar bem as ferramentas digitais.",
+             "TECHNICAL", t("Administrativo")),
+        ]
+        cur.executemany(
+            "INSERT INTO competencies(name,description,category,team_id) VALUES (?,?,?,?)",
+            admin_comps,
+        )
+
+        proj_comps = [
+            ("Planeamento de Projetos",
+             "Define objetivos, fases, prazos e recursos de forma clara.",
+             "TECHNICAL", t("Projetos")),
+            ("Gestão de Stakeholders",
+             "Comunica e alinha expectativas com clientes, parceiros e equipa.",
+             "TECHNICAL", t("Projetos")),
+            ("Execução & Qualidade das Entregas",
+             "Entrega outputs com qualidade e de acordo com os standards acordados.",
+             "TECHNICAL", t("Projetos")),
+            ("Controlo de Prazos & Orçamento",
+             "Monitoriza prazos e custos, reagindo a desvios.",
+             "TECHNICAL", t("Projetos")),
+            ("Resolução de Problemas",
+             "Identifica riscos e propõe alternativas realistas.",
+             "TECHNICAL", t("Projetos")),
+        ]
+        cur.executemany(
+            "INSERT INTO competencies(name,description,category,team_id) VALUES (?,?,?,?)",
+            proj_comps,
+        )
+
+        cons_comps = [
+            ("Diagnóstico & Pensamento Crítico",
+             "Analisa a situação de clientes e parceiros com base em dados.",
+             "TECHNICAL", t("Consultoria & Ecossistema")),
+            ("Desenho de Soluções & Propostas de Valor",
+             "Cria propostas claras, realistas e alinhadas com a estratégia do cliente.",
+             "TECHNICAL", t("Consultoria & Ecossistema")),
+            ("Facilitação & Formação",
+             "Conduz reuniões, workshops e sessões de forma estruturada.",
+             "TECHNICAL", t("Consultoria & Ecossistema")),
+            ("Relação com Clientes & Parceiros",
+             "Constrói confiança e mantém follow-up adequado.",
+             "TECHNICAL", t("Consultoria & Ecossistema")),
+            ("Networking & Desenvolvimento de Ecossistema",
+             "Identifica e ativa oportunidades no ecossistema.",
+             "TECHNICAL", t("Consultoria & Ecossistema")),
+        ]
+        cur.executemany(
+            "INSERT INTO competencies(name,description,category,team_id) VALUES (?,?,?,?)",
+            cons_comps,
+        )
+
+        objective_comps = [
+            ("Cumprimento de Objetivos",
+             "Grau de cumprimento dos objetivos acordados para o período.",
+             "OBJECTIVES", None),
+            ("Alinhamento com Prioridades",
+             "Foco nas prioridades estratégicas da organização.",
+             "OBJECTIVES", None),
+            ("Qualidade dos Resultados",
+             "Impacto e qualidade dos resultados alcançados.",
+             "OBJECTIVES", None),
+        ]
+        cur.executemany(
+            "INSERT INTO competencies(name,description,category,team_id) VALUES (?,?,?,?)",
+            objective_comps,
+        )
+
+    # Período ativo inicial
+    cur.execute("SELECT id FROM evaluation_periods WHERE is_active=1 LIMIT 1")
+    row = cur.fetchone()
+    if not row:
+        today = date.today()
+        name = f"Avaliação {today.year}"
+        cur.execute(
+            "INSERT INTO evaluation_periods(name,start_date,end_date,is_active) VALUES (?,?,?,1)",
+            (name, str(today), str(today)),
+        )
+
+
+def schema_version() -> int:
+    with db.connection() as conn:
+        return _read_version(conn.cursor())
+
+
+def _read_version(cur) -> int:
+    if db.dialect() == "sqlite":
+        return cur.execute("PRAGMA user_version").fetchone()[0]
+    if cur.execute("SELECT to_regclass('schema_version')").fetchone()[0] is None:
+        return 0
+    row = cur.execute("SELECT version FROM schema_version").fetchone()
+    return row[0] if row else 0
+
+
+def _write_version(cur, version: int):
+    if db.dialect() == "sqlite":
+        cur.execute(f"PRAGMA user_version={version}")
+        return
+    cur.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    cur.execute("DELETE FROM schema_version")
+    cur.execute("INSERT INTO schema_version(version) VALUES (?)", (version,))
+
+
+def _apply_migrations(cur, version: int) -> int:
+    dialect = db.dialect()
+    for target, statements in MIGRATIONS:
+        if target <= version:
+            continue
+        for sql in statements:
+            if isinstance(sql, dict):
+                sql = sql.get(dialect)
+            if sql:
+                cur.execute(sql)
+        _write_version(cur, target)
+        version = target
+    return version
+
+
+def recompute_score_aggregates():
+    """Reconstrói score_aggregates a partir das respostas.
+
+    Os triggers mantêm a tabela a cada resposta gravada (e a cada assignment
+    removido ou reposto); isto só é preciso se
+    o peso ou a categoria de uma competência mudar. As médias dos períodos
+    arquivados ficam como estão: as respostas deles já não estão nas tabelas vivas.
+    """
+    with db.transaction() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "DELETE FROM score_aggregates WHERE period_id NOT IN "
+            "(SELECT id FROM evaluation_periods WHERE archived_at IS NOT NULL)"
+        )
+        cur.execute(SCORE_AGGREGATES_REBUILD)
+    cache.invalidate("scores")
@@ -0,0 +1,289 @@
+"""Motor de pontuação partilhado pelos resultados pessoais e pelo painel do CEO.
+
+As médias por categoria e a média global leem ``score_aggregates`` (mantida
+pelos triggers), pelo que não dependem do número de respostas. A divisão por
+tipo de avaliador e a distribuição precisam das respostas: são agrupadas na
+base de dados por (avaliado, categoria, tipo de avaliador, peso, nota) e só
+esses grupos chegam a um DataFrame, onde as vistas são calculadas de forma
+vetorizada, com as médias ponderadas pelo ``weight`` de cada competência. A
+página pessoal carrega apenas os grupos da própria pessoa.
+
+O pandas só é importado quando um DataFrame é de facto construído; as leituras
+de ``score_aggregates`` não precisam dele.
+"""
+import math
+from typing import TYPE_CHECKING
+
+from av360 import cache, db
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+EVALUATOR_TYPES = ("SELF", "SAME_TEAM", "CROSS_TEAM")
+
+# As leituras de um período ficam em "scores:<period_id>"; a evolução ao longo
+# dos períodos lê todos e tem o seu próprio sub-namespace.
+HISTORY_NAMESPACE = "scores:history"
+
+# Uma linha por grupo de respostas iguais; ``n`` é o número de respostas do grupo
+ANSWER_COLUMNS = [
+    "evaluatee_id", "evaluatee_name", "category", "evaluator_type", "weight", "score", "n",
+]
+
+# O tipo de avaliador é decidido por assignment, antes de juntar as respostas
+PERIOD_ANSWERS_QUERY = """
+    SELECT a.evaluatee_id,
+           u.name AS evaluatee_name,
+           c.category,
+           a.evaluator_type,
+           c.weight,
+           ea.score,
+           COUNT(*) AS n
+    FROM (
+        SELECT a.id,
+               a.evaluatee_id,
+               CASE
+                   WHEN a.evaluator_id = a.evaluatee_id THEN 'SELF'
+                   WHEN EXISTS (
+                       SELECT 1
+                       FROM user_teams ua
+                       JOIN user_teams ub ON ub.team_id = ua.team_id
+                       WHERE ua.user_id = a.evaluator_id AND ub.user_id = a.evaluatee_id
+                   ) THEN 'SAME_TEAM'
+                   ELSE 'CROSS_TEAM'
+               END AS evaluator_type
+        FROM evaluation_assignments a
+        WHERE a.period_id = ? AND a.removed_at IS NULL {evaluatee_filter}
+    ) a
+    JOIN evaluation_answers ea ON ea.assignment_id = a.id
+    JOIN competencies c ON c.id = ea.competency_id
+    JOIN users u ON u.id = a.evaluatee_id
+    GROUP BY a.evaluatee_id, u.name, c.category, a.evaluator_type, c.weight, ea.score
+"""
+
+
+def _describe_counts(counts) -> dict:
+    """``Series.describe()`` das notas a partir da contagem de cada nota."""
+    values = [(score, int(n)) for score, n in sorted(counts.items()) if n > 0]
+    total = sum(n for _, n in values)
+    mean = sum(score * n for score, n in values) / total
+    std = (math.sqrt(sum(n * (score - mean) ** 2 for score, n in values) / (total - 1))
+           if total > 1 else float("nan"))
+
+    def value_at(k):  # k-ésima nota (0-based) por ordem crescente
+        for score, n in values:
+            if k < n:
+                return score
+            k -= n
+
+    def quantile(q):  # interpolação linear, como o pandas
+        pos = q * (total - 1)
+        lo = math.floor(pos)
+        return value_at(lo) + (value_at(math.ceil(pos)) - value_at(lo)) * (pos - lo)
+
+    return {
+        "count": float(total), "mean": mean, "std": std, "min": float(values[0][0]),
+        "25%": quantile(0.25), "50%": quantile(0.5), "75%": quantile(0.75), "max": float(values[-1][0]),
+    }
+
+
+class PeriodScores:
+    """Respostas de um período, agrupadas, e as agregações ponderadas sobre elas."""
+
+    def __init__(self, answers: "pd.DataFrame"):
+        self.answers = answers.assign(
+            weighted=answers["score"] * answers["weight"] * answers["n"],
+            total_weight=answers["weight"] * answers["n"],
+        )
+
+    @classmethod
+    def load(cls, conn, period_id: int, evaluatee_id: int = None) -> "PeriodScores":
+        cur = conn.cursor()
+        cur.row_factory = None  # tuplos simples: muito mais rápido para muitas linhas
+        if evaluatee_id is None:
+            sql, params = PERIOD_ANSWERS_QUERY.format(evaluatee_filter=""), (period_id,)
+        else:
+            sql = PERIOD_ANSWERS_QUERY.format(evaluatee_filter="AND a.evaluatee_id = ?")
+            params = (period_id, evaluatee_id)
+        rows = cur.execute(sql, params).fetchall()
+        import pandas as pd
+
+        return cls(pd.DataFrame.from_records(rows, columns=ANSWER_COLUMNS))
+
+    @property
+    def empty(self) -> bool:
+        return self.answers.empty
+
+    def _subset(self, evaluatee_id):
+        if evaluatee_id is None:
+            return self.answers
+        return self.answers[self.answers["evaluatee_id"] == evaluatee_id]
+
+    @staticmethod
+    def _weighted_mean(df: "pd.DataFrame", keys) -> "pd.DataFrame":
+        g = df.groupby(keys, sort=True).agg(
+            weighted=("weighted", "sum"), weight=("total_weight", "sum"), n_answers=("n", "sum"),
+        )
+        g["score"] = g["weighted"] / g["weight"]
+        return g[["score", "n_answers"]].reset_index()
+
+    def category_scores(self, evaluatee_id: int = None) -> "pd.DataFrame":
+        """Média ponderada por avaliado e categoria."""
+        return self._weighted_mean(
+            self._subset(evaluatee_id), ["evaluatee_id", "evaluatee_name", "category"]
+        )
+
+    def overall_scores(self, evaluatee_id: int = None) -> "pd.DataFrame":
+        """Média ponderada global por avaliado (todas as categorias)."""
+        return self._weighted_mean(self._subset(evaluatee_id), ["evaluatee_id", "evaluatee_name"])
+
+    def evaluator_type_scores(self, evaluatee_id: int = None) -> "pd.DataFrame":
+        """Média ponderada por avaliado e categoria, em colunas por tipo de avaliador."""
+        g = self._weighted_mean(
+            self._subset(evaluatee_id), ["evaluatee_id", "evaluatee_name", "category", "evaluator_type"]
+        )
+        wide = g.pivot_table(
+            index=["evaluatee_id", "evaluatee_name", "category"],
+            columns="evaluator_type",
+            values="score",
+        )
+        wide = wide.reindex(columns=list(EVALUATOR_TYPES))
+        wide.columns.name = None
+        return wide.reset_index()
+
+    def distribution(self, evaluatee_id: int = None) -> "pd.DataFrame":
+        """Estatísticas das pontuações por categoria, com a contagem de cada nota 1–5."""
+        import pandas as pd
+
+        df = self._subset(evaluatee_id)
+        counts = df.groupby(["category", "score"])["n"].sum().unstack(fill_value=0)
+        stats = pd.DataFrame({category: _describe_counts(row) for category, row in counts.iterrows()}).T
+        stats.index.name = "category"
+        counts = counts.reindex(columns=range(1, 6), fill_value=0)
+        counts.columns = [f"n_{s}" for s in counts.columns]
+        return stats.join(counts).reset_index()
+
+
+@cache.cached("scores", scope=0)
+def load_period_scores(period_id: int, evaluatee_id: int = None) -> PeriodScores:
+    """Respostas agrupadas do período (ou só as de ``evaluatee_id``)."""
+    with db.connection() as conn:
+        return PeriodScores.load(conn, period_id, evaluatee_id)
+
+
+def invalidate_periods(period_ids):
+    """Invalida as leituras em cache dos períodos indicados (e a evolução)."""
+    cache.invalidate(*(f"scores:{period_id}" for period_id in period_ids), HISTORY_NAMESPACE)
+
+
+def _aggregate_filter(evaluatee_id):
+    if evaluatee_id is None:
+        return "", ()
+    return " AND sa.evaluatee_id=?", (evaluatee_id,)
+
+
+@cache.cached("scores", scope=0)
+def get_category_scores(period_id: int, evaluatee_id: int = None):
+    """Média ponderada por avaliado e categoria, de ``score_aggregates``."""
+    where, params = _aggregate_filter(evaluatee_id)
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT sa.evaluatee_id,
+                   u.name AS evaluatee_name,
+                   sa.category,
+                   sa.weighted_sum / sa.weight_sum AS score,
+                   sa.score_count AS n_answers
+            FROM score_aggregates sa
+            JOIN users u ON u.id = sa.evaluatee_id
+            WHERE sa.period_id=? AND sa.score_count > 0{where}
+            ORDER BY u.name, sa.evaluatee_id, sa.category
+            """,
+            (period_id, *params),
+        )
+        rows = cur.fetchall()
+    return rows
+
+
+@cache.cached("scores", scope=0)
+def get_overall_scores(period_id: int, evaluatee_id: int = None):
+    """Média ponderada global por avaliado (todas as categorias), de ``score_aggregates``."""
+    where, params = _aggregate_filter(evaluatee_id)
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT sa.evaluatee_id,
+                   u.name AS evaluatee_name,
+                   SUM(sa.weighted_sum) / SUM(sa.weight_sum) AS score,
+                   SUM(sa.score_count) AS n_answers
+            FROM score_aggregates sa
+            JOIN users u ON u.id = sa.evaluatee_id
+            WHERE sa.period_id=? AND sa.score_count > 0{where}
+            GROUP BY sa.evaluatee_id, u.name
+            ORDER BY u.name, sa.evaluatee_id
+            """,
+            (period_id, *params),
+        )
+        rows = cur.fetchall()
+    return rows
+
+
+@cache.cached("scores", scope=1)
+def get_my_scores(user_id: int, period_id: int):
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT category, weighted_sum / weight_sum AS avg_score
+            FROM score_aggregates
+            WHERE evaluatee_id=? AND period_id=? AND score_count > 0
+            ORDER BY category
+            """,
+            (user_id, period_id),
+        )
+        rows = cur.fetchall()
+    return rows
+
+
+@cache.cached(HISTORY_NAMESPACE)
+def get_my_scores_over_time(user_id: int):
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT ep.name AS period_name,
+                   ep.start_date,
+                   sa.category,
+                   sa.weighted_sum / sa.weight_sum AS avg_score
+            FROM score_aggregates sa
+            JOIN evaluation_periods ep ON ep.id = sa.period_id
+            WHERE sa.evaluatee_id=? AND sa.score_count > 0
+            ORDER BY ep.start_date, ep.id, sa.category
+            """,
+            (user_id,),
+        )
+        rows = cur.fetchall()
+    return rows
+
+
+@cache.cached("scores", scope=0)
+def get_global_scores(period_id: int):
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT u.name AS evaluatee_name,
+                   sa.category,
+                   SUM(sa.weighted_sum) / SUM(sa.weight_sum) AS avg_score
+            FROM score_aggregates sa
+            JOIN users u ON u.id = sa.evaluatee_id
+            WHERE sa.period_id=? AND sa.score_count > 0
+            GROUP BY u.name, sa.category
+            ORDER BY u.name, sa.category
+            """,
+            (period_id,),
+        )
+        rows = cur.fetchall()
+    return rows
@@ -0,0 +1,87 @@
+"""Sessões guardadas no servidor.
+
+Depois de um login com sucesso é criada uma linha em ``sessions`` e o cliente
+fica apenas com um identificador aleatório e opaco, guardado no
+``st.session_state`` (nunca no URL); na base de dados fica só o SHA-256 dele.
+Terminar sessão apaga a linha, o que vale para todos os processos e sobrevive
+a reinícios; desativar o utilizador também invalida as suas sessões.
+
+As sessões já verificadas ficam em memória durante ``CACHE_TTL`` segundos:
+validar de novo num rerun é só um lookup, e uma sessão terminada noutro
+processo deixa de valer aqui ao fim desse tempo.
+"""
+import hashlib
+import os
+import secrets
+import threading
+import time
+
+from av360 import db
+
+TTL = float(os.environ.get("AV360_SESSION_TTL", 8 * 3600))
+CACHE_TTL = 30.0
+MAX_CACHED = 4096
+
+_verified = {}  # token -> (user_id, expira, verificado_até)
+_lock = threading.Lock()
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode("ascii")).hexdigest()
+
+
+def issue(user_id: int, ttl: float = None) -> str:
+    """Cria uma sessão para o utilizador; devolve o identificador a guardar no cliente."""
+    token = secrets.token_urlsafe(32)
+    now = time.time()
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "INSERT INTO sessions(token_hash, user_id, expires_at) VALUES (?,?,?)",
+            (_hash(token), user_id, now + (TTL if ttl is None else ttl)),
+        )
+    return token
+
+
+def verify(token: str):
+    """Id do utilizador da sessão, ou None se não existir, tiver expirado ou sido terminada."""
+    if not token:
+        return None
+    now = time.time()
+    entry = _verified.get(token)
+    if entry is None or entry[2] <= time.monotonic():
+        try:
+            token_hash = _hash(token)
+        except (AttributeError, UnicodeEncodeError):
+            return None
+        with db.connection() as conn:
+            row = conn.execute(
+                """
+                SELECT s.user_id, s.expires_at
+                FROM sessions s
+                JOIN users u ON u.id = s.user_id
+                WHERE s.token_hash=? AND u.is_active=1
+                """,
+                (token_hash,),
+            ).fetchone()
+        if row is None:
+            with _lock:
+                _verified.pop(token, None)
+            return None
+        entry = (row["user_id"], row["expires_at"], time.monotonic() + CACHE_TTL)
+        with _lock:
+            if len(_verified) >= MAX_CACHED:
+                for t in [t for t, (_, exp, _) in _verified.items() if exp <= now] or list(_verified):
+                    del _verified[t]
+            _verified[token] = entry
+    if entry[1] <= now:
+        return None
+    return entry[0]
+
+
+def revoke(token: str):
+    """Termina a sessão (em todos os processos)."""
+    with _lock:
+        _verified.pop(token, None)
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM sessions WHERE token_hash=?", (_hash(token),))
@@ -0,0 +1,52 @@
+"""Utilizadores, equipas e autenticação."""
+from av360 import cache, db, passwords
+
+
+@cache.cached("teams")
+def list_teams():
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, name FROM teams ORDER BY name")
+        rows = cur.fetchall()
+    return rows
+
+
+@cache.cached("users")
+def get_user_by_email(email: str):
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM users WHERE email=? AND is_active=1", (email,))
+        row = cur.fetchone()
+    return row
+
+
+@cache.cached("users")
+def get_user_by_id(user_id: int):
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM users WHERE id=? AND is_active=1", (user_id,))
+        row = cur.fetchone()
+    return row
+
+
+def authenticate(email: str, password: str):
+    """Utilizador ativo com estas credenciais, ou None.
+
+    Um hash antigo ou com parâmetros desatualizados é refeito com os atuais
+    logo que a password é confirmada.
+    """
+    user = get_user_by_email(email)
+    if user is None:
+        passwords.dummy_verify(password)
+        return None
+    if not passwords.verify_password(password, user["password_hash"]):
+        return None
+    if passwords.needs_rehash(user["password_hash"]):
+        new_hash = passwords.hash_password(password)  # fora da transação: a KDF é lenta
+        with db.transaction() as conn:
+            conn.execute(
+                "UPDATE users SET password_hash=? WHERE id=? AND password_hash=?",
+                (new_hash, user["id"], user["password_hash"]),
+            )
+        cache.invalidate("users")
+    return user
@@ -0,0 +1,217 @@
+"""Paridade e tempos da camada de dados em SQLite e em PostgreSQL.
+
+Semeia a mesma organização sintética (como ``data_layer.py``, com a mesma
+seed) em cada backend e corre o mesmo cenário: as leituras das páginas,
+exportação, login, mudanças de equipa reconciliadas por delta e respostas
+novas. Compara os resultados de cada passo entre backends (têm de ser iguais)
+e reporta p50 por operação em cada um.
+
+O PostgreSQL é o de ``--postgres URL`` (cada execução usa um schema próprio,
+apagado no fim) ou, com ``--pgserver``, um servidor local descartável
+arrancado pelo pacote ``pgserver``. Requer o ``psycopg`` (versão 3).
+
+    python benchmarks/backends.py --pgserver --users 200
+    python benchmarks/backends.py --postgres postgresql://av360@localhost/av360 --out backends.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from av360 import (  # noqa: E402
+    answers, assignments, cache, competencies, db, export, periods, scoring, users,
+)
+from data_layer import _all_user_ids, seed_org  # noqa: E402
+
+
+def normalize(value):
+    """Resultado comparável entre backends: linhas -> tuplos, floats arredondados."""
+    if isinstance(value, float):
+        return round(value, 9)
+    if isinstance(value, (sqlite3.Row, tuple, list)):
+        return [normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items()}
+    return value
+
+
+def scenario(args):
+    """Passos (nome, função) pela ordem em que correm; cada função devolve o que se compara."""
+    rng = random.Random(args.seed + 1)
+    state = {}
+
+    def setup():
+        state["period_id"] = seed_org(args.users, args.teams, args.periods, args.answered,
+                                      random.Random(args.seed), args.policy)[0]
+        state["user_ids"] = sorted(_all_user_ids())
+        state["sample"] = rng.sample(state["user_ids"], min(10, len(state["user_ids"])))
+        return state["period_id"], len(state["user_ids"])
+
+    def pages():
+        return [assignments.get_assignments_page(u, state["period_id"], page=p)
+                for u in state["sample"] for p in range(2)]
+
+    def progress():
+        return [assignments.get_assignment_progress(u, state["period_id"]) for u in state["user_ids"]]
+
+    def my_scores():
+        return [scoring.get_my_scores(u, state["period_id"]) for u in state["sample"]]
+
+    def over_time():
+        return [scoring.get_my_scores_over_time(u) for u in state["sample"]]
+
+    def period_scores():
+        df = scoring.load_period_scores(state["period_id"]).answers
+        return len(df), float(df["weighted"].sum())
+
+    def export_rows():
+        return {kind: sum(len(rows) for rows in export.iter_chunks(kind, period_id=state["period_id"]))
+                for kind in export.KINDS}
+
+    def login():
+        user = users.authenticate("pessoa0@bench.local", "1234")
+        return user is not None and user["email"]
+
+    def move_users():
+        reports = []
+        for user_id in state["sample"][:5]:
+            with db.transaction() as conn:
+                team_ids = [r[0] for r in conn.execute("SELECT id FROM teams ORDER BY id")]
+                conn.execute("DELETE FROM user_teams WHERE user_id=?", (user_id,))
+                conn.execute("INSERT INTO user_teams(user_id,team_id,is_primary) VALUES (?,?,1)",
+                             (user_id, team_ids[user_id % len(team_ids)]))
+            cache.invalidate("users", "teams")
+            reports.append(vars(assignments.reconcile_assignments(state["period_id"], [user_id])))
+        # Depois dos deltas a matriz tem de estar completa
+        reports.append(vars(assignments.reconcile_assignments(state["period_id"])))
+        return reports
+
+    def save():
+        for user_id in state["sample"]:
+            for a in assignments.get_assignments_page(user_id, state["period_id"], page_size=3)[0]:
+                comps = competencies.get_competencies_for_assignment(a)
+                answers.save_answers(a["id"], {c["id"]: ((a["id"] + c["id"]) % 5 + 1, "paridade") for c in comps})
+        return scoring.get_global_scores(state["period_id"])
+
+    return [
+        ("seed_org", setup, False),
+        ("list_periods", periods.list_periods, True),
+        ("get_assignments_page", pages, True),
+        ("get_assignment_progress[all]", progress, True),
+        ("get_my_scores", my_scores, True),
+        ("get_my_scores_over_time", over_time, True),
+        ("get_global_scores", lambda: scoring.get_global_scores(state["period_id"]), True),
+        ("load_period_scores", period_scores, True),
+        ("export.iter_chunks", export_rows, True),
+        ("authenticate", login, False),
+        ("reconcile_assignments[moves]", move_users, False),
+        ("save_answers+get_global_scores", save, False),
+    ]
+
+
+def run_backend(target, args):
+    db.DB_PATH = target
+    cache.clear()
+    results, timings = {}, {}
+    try:
+        for name, fn, repeat in scenario(args):
+            samples = []
+            for _ in range(args.iterations if repeat else 1):
+                cache.clear()
+                t0 = time.perf_counter()
+                value = fn()
+                samples.append(time.perf_counter() - t0)
+                results.setdefault(name, normalize(value))
+            timings[name] = statistics.median(samples) * 1000
+            print(f"  {db.dialect():10s} {name:32s} p50={timings[name]:9.2f}ms", file=sys.stderr)
+    finally:
+        db.get_pool().close()
+    return results, timings
+
+
+def postgres_target(url):
+    """URL que aponta para um schema novo; devolve (url, função que o apaga)."""
+    import psycopg
+
+    schema = f"av360_bench_{os.getpid()}"
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.execute(f"CREATE SCHEMA {schema}")
+
+    def drop():
+        with psycopg.connect(url, autocommit=True) as conn:
+            conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+
+    separator = "&" if "?" in url else "?"
+    return f"{url}{separator}options=-csearch_path%3D{schema}", drop
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Paridade e tempos da Avaliação 360 em SQLite e PostgreSQL.")
+    parser.add_argument("--postgres", help="URL postgresql:// de um servidor de teste")
+    parser.add_argument("--pgserver", action="store_true", help="arranca um PostgreSQL local descartável")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--teams", type=int, default=8)
+    parser.add_argument("--periods", type=int, default=3)
+    parser.add_argument("--answered", type=float, default=0.5, help="fração de assignments respondidos")
+    parser.add_argument("--policy", default="full", help="política de atribuição dos períodos")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=360)
+    parser.add_argument("--out", help="ficheiro JSON de resultados (por omissão stdout)")
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.postgres
+    if url is None and args.pgserver:
+        import pgserver
+
+        server = pgserver.get_server(tempfile.mkdtemp(prefix="av360-pg-"), cleanup_mode="delete")
+        url = server.get_uri()
+    if url is None:
+        parser.error("indique --postgres URL ou --pgserver")
+
+    backends = {"sqlite": os.path.join(tempfile.mkdtemp(prefix="av360-backends-"), "bench.db")}
+    backends["postgresql"], drop = postgres_target(url)
+    results, timings = {}, {}
+    try:
+        for name, target in backends.items():
+            results[name], timings[name] = run_backend(target, args)
+    finally:
+        drop()
+        if server is not None:
+            server.cleanup()
+
+    mismatches = [name for name in results["sqlite"] if results["sqlite"][name] != results["postgresql"].get(name)]
+    for name in mismatches:
+        print(f"  DIFERENTE: {name}", file=sys.stderr)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k != "postgres"},
+        },
+        "parity": {name: name not in mismatches for name in results["sqlite"]},
+        "p50_ms": timings,
+    }
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
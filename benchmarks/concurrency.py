@@ -0,0 +1,200 @@
+"""Teste de carga concorrente: várias sessões a gravar e a ler a mesma base de dados.
+
+Semeia uma organização sintética (como ``data_layer.py``) e lança
+``--processes`` processos com ``--threads`` threads cada; cada thread simula
+uma sessão que, durante ``--seconds``, alterna entre gravar respostas
+(``save_answers``), abrir a página das avaliações, a dos resultados pessoais e
+o painel do CEO, com as mesmas leituras que essas páginas fazem (incluindo a
+``sync_assignments`` de cada rerun). Uma thread por processo corre também a reconciliação da matriz de
+assignments, o trabalho de escrita mais longo. Reporta, por operação, p50/p95
+e erros (em particular "database is locked"), o débito total e quantas
+escritas precisaram de nova tentativa.
+
+    python benchmarks/concurrency.py --processes 4 --threads 8 --seconds 20
+    python benchmarks/concurrency.py --legacy   # BEGIN simples, sem lock nem novas tentativas
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from av360 import answers, assignments, cache, competencies, db, scoring  # noqa: E402
+from data_layer import _all_user_ids, seed_org  # noqa: E402
+
+# operação -> peso no sorteio de cada passo de uma sessão
+MIX = {
+    "save_answers": 4,
+    "my_evaluations_page": 3,
+    "my_results_page": 1,
+    "ceo_dashboard": 1,
+}
+
+
+def configure(args):
+    db.DB_PATH = args.db
+    if args.legacy:
+        db.BEGIN_MODE = ""
+        db.WRITE_RETRIES = 0
+        db.SERIALIZE_WRITES = False
+
+
+def session(args, seed, period_id, user_ids, deadline, results, bulk):
+    rng = random.Random(seed)
+    ops, weights = zip(*MIX.items())
+
+    def save_answers():
+        user_id = rng.choice(user_ids)
+        rows, total = assignments.get_assignments_page(user_id, period_id, page=rng.randrange(4))
+        if rows:
+            a = rng.choice(rows)
+            comps = competencies.get_competencies_for_assignment(a)
+            answers.save_answers(a["id"], {c["id"]: (rng.randint(1, 5), "carga") for c in comps})
+
+    def my_evaluations_page():
+        user_id = rng.choice(user_ids)
+        assignments.sync_assignments(period_id)
+        assignments.get_assignment_progress(user_id, period_id)
+        assignments.get_assignments_page(user_id, period_id)
+
+    def my_results_page():
+        user_id = rng.choice(user_ids)
+        assignments.sync_assignments(period_id)
+        if scoring.get_category_scores(period_id, user_id):
+            scoring.get_overall_scores(period_id, user_id)
+            scoring.load_period_scores(period_id, user_id).evaluator_type_scores()
+        scoring.get_my_scores_over_time(user_id)
+
+    def ceo_dashboard():
+        assignments.sync_assignments(period_id)
+        scoring.get_category_scores(period_id)
+        scoring.get_overall_scores(period_id)
+
+    calls = {
+        "save_answers": save_answers,
+        "my_evaluations_page": my_evaluations_page,
+        "my_results_page": my_results_page,
+        "ceo_dashboard": ceo_dashboard,
+        "reconcile_assignments": lambda: assignments.reconcile_assignments(period_id),
+    }
+    while time.monotonic() < deadline:
+        name = "reconcile_assignments" if bulk else rng.choices(ops, weights)[0]
+        t0 = time.perf_counter()
+        try:
+            calls[name]()
+        except sqlite3.OperationalError as e:
+            results["errors"][f"{name}: {e}"] += 1
+        else:
+            results["timings"][name].append(time.perf_counter() - t0)
+        if bulk:
+            time.sleep(args.bulk_interval)
+
+
+def worker(args, index, period_id, user_ids):
+    configure(args)
+    results = {"timings": defaultdict(list), "errors": Counter()}
+    deadline = time.monotonic() + args.seconds
+    threads = [
+        threading.Thread(
+            target=session,
+            args=(args, args.seed * 1000 + index * 100 + i, period_id, user_ids, deadline, results,
+                  args.bulk and i == 0),
+        )
+        for i in range(args.threads)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    db.get_pool().close()
+    return {"timings": dict(results["timings"]), "errors": dict(results["errors"]), "retries": db.retries}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga concorrente da Avaliação 360.")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8, help="sessões por processo")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--teams", type=int, default=8)
+    parser.add_argument("--answered", type=float, default=0.3, help="fração de assignments já respondidos")
+    parser.add_argument("--no-bulk", dest="bulk", action="store_false",
+                        help="sem a reconciliação da matriz em paralelo")
+    parser.add_argument("--bulk-interval", type=float, default=1.0, help="pausa entre reconciliações (s)")
+    parser.add_argument("--legacy", action="store_true",
+                        help="BEGIN simples, sem lock de escrita nem novas tentativas (para comparar)")
+    parser.add_argument("--seed", type=int, default=360)
+    parser.add_argument("--db", help="ficheiro SQLite (por omissão um descartável)")
+    parser.add_argument("--out", help="ficheiro JSON de resultados (por omissão stdout)")
+    args = parser.parse_args(argv)
+    if args.db is None:
+        args.db = os.path.join(tempfile.mkdtemp(prefix="av360-stress-"), "stress.db")
+
+    configure(args)
+    cache.clear()
+    t0 = time.perf_counter()
+    period_id = seed_org(args.users, args.teams, 1, args.answered, random.Random(args.seed))[0]
+    user_ids = _all_user_ids()
+    seed_seconds = time.perf_counter() - t0
+    db.get_pool().close()
+    print(f"org com {len(user_ids)} utilizadores semeada em {seed_seconds:.1f}s", file=sys.stderr)
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(args.processes) as pool:
+        parts = pool.starmap(worker, [(args, i, period_id, user_ids) for i in range(args.processes)])
+
+    timings, errors = defaultdict(list), Counter()
+    for part in parts:
+        for name, values in part["timings"].items():
+            timings[name].extend(values)
+        errors.update(part["errors"])
+    operations = {}
+    for name, values in sorted(timings.items()):
+        quantiles = statistics.quantiles(values, n=20) if len(values) > 1 else values * 19
+        operations[name] = {
+            "calls": len(values),
+            "p50_ms": statistics.median(values) * 1000,
+            "p95_ms": quantiles[18] * 1000,
+        }
+        print(f"  {name:28s} {len(values):6d} chamadas p50={operations[name]['p50_ms']:8.2f}ms "
+              f"p95={operations[name]['p95_ms']:8.2f}ms", file=sys.stderr)
+    for message, n in errors.most_common():
+        print(f"  ERRO x{n}: {message}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "seed_seconds": seed_seconds,
+        "ops_per_s": sum(o["calls"] for o in operations.values()) / args.seconds,
+        "retries": sum(p["retries"] for p in parts),
+        "errors": dict(errors),
+        "operations": operations,
+    }
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,372 @@
+"""Benchmark da camada de dados com organizações sintéticas.
+
+Para cada dimensão pedida cria uma base de dados descartável, semeia
+utilizadores, equipas, períodos e respostas, e mede as funções de dados tal
+como as páginas as usam. Para cada operação reporta p50/p95, o número de
+statements SQL e de ligações/checkouts por chamada, e os full scans que o
+EXPLAIN QUERY PLAN mostrar nas tabelas grandes. Mede também quanto custa
+importar a camada de dados (que não deve arrastar pandas nem Streamlit). Corre
+sem servidor Streamlit.
+
+    python benchmarks/data_layer.py --sizes 50 500 --out bench.json
+    python benchmarks/data_layer.py --sizes 500 --periods 5 --archive   # histórico arquivado
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from av360 import (  # noqa: E402
+    answers, archive, assignments, cache, competencies, db, periods, policies, schema, scoring, users,
+)
+
+# Tabelas que crescem com a organização: um SCAN nelas é uma regressão.
+LARGE_TABLES = ("evaluation_assignments", "evaluation_answers", "user_teams", "score_aggregates")
+
+# Leituras inteiras esperadas, por operação: gerar ou reconciliar a matriz
+# aplica a política à organização toda, por isso lê as equipas de todos (uma
+# vez por chamada). Num rerun sem mudanças, sync_assignments só lê
+# roster_version e não chega aqui ("sync_assignments[unchanged]" não tem exceção).
+MEMBERSHIPS_SQL = "SELECT user_id, team_id, is_primary FROM user_teams"
+EXPECTED_SCANS = {
+    "generate_assignments_for_period[existing]": {MEMBERSHIPS_SQL},
+    "generate_assignments_for_period[new]": {MEMBERSHIPS_SQL},
+    "reconcile_assignments[1 user]": {MEMBERSHIPS_SQL},
+}
+
+# Módulos da camada de dados e dependências pesadas que não devem arrastar.
+DATA_MODULES = ("answers", "archive", "assignments", "cli", "competencies", "periods", "policies", "schema", "scoring", "users")
+HEAVY_MODULES = ("pandas", "numpy", "streamlit")
+
+
+class StatementCounter:
+    """Conta (e guarda) os statements executados nas ligações abertas pelo pool."""
+
+    def __init__(self):
+        self.count = 0
+        self.connections = 0
+        self.statements = set()
+
+    def on_connect(self, conn):
+        self.connections += 1
+        conn.set_trace_callback(self.on_statement)
+
+    def on_statement(self, sql):
+        if sql.startswith("--"):  # statements de triggers
+            return
+        self.count += 1
+        self.statements.add(sql)
+
+
+def seed_org(n_users: int, n_teams: int, n_periods: int, answered: float, rng: random.Random,
+             policy: str = policies.DEFAULT_POLICY):
+    """Semeia uma organização sintética por cima dos dados base de setup_db()."""
+    schema.setup_db()
+    with db.transaction() as conn:
+        cur = conn.cursor()
+        cur.executemany(
+            "INSERT OR IGNORE INTO teams(name) VALUES (?)",
+            [(f"Equipa {i}",) for i in range(n_teams)],
+        )
+        team_ids = [r["id"] for r in cur.execute("SELECT id FROM teams ORDER BY id").fetchall()]
+        cur.executemany(
+            "INSERT INTO competencies(name,description,category,team_id) VALUES (?,?,?,?)",
+            [
+                (f"Técnica {k} ({t})", None, "TECHNICAL", t)
+                for t in team_ids
+                for k in range(3)
+            ],
+        )
+        password_hash = hashlib.sha256(b"1234").hexdigest()
+        cur.executemany(
+            "INSERT INTO users(name,email,password_hash,role) VALUES (?,?,?,?)",
+            [
+                (f"Pessoa {i}", f"pessoa{i}@bench.local", password_hash,
+                 rng.choice(("MEMBRO", "MEMBRO", "MEMBRO", "RESPONSAVEL", "ESTAGIARIO")))
+                for i in range(n_users)
+            ],
+        )
+        user_ids = [r["id"] for r in cur.execute(
+            "SELECT id FROM users WHERE email LIKE '%@bench.local' ORDER BY id")]
+        links = set()
+        for uid in user_ids:
+            links.add((uid, rng.choice(team_ids)))
+            if rng.random() < 0.2:
+                links.add((uid, rng.choice(team_ids)))
+        cur.executemany(
+            "INSERT OR IGNORE INTO user_teams(user_id,team_id,is_primary) VALUES (?,?,0)",
+            sorted(links),
+        )
+    cache.invalidate("competencies", "users")
+
+    period_ids = [periods.get_current_period_id()]
+    periods.set_period_policy(period_ids[0], policy)
+    for i in range(1, n_periods):
+        period_ids.append(periods.create_period(f"Bench {i}", f"20{10 + i}-01-01", f"20{10 + i}-12-31", policy=policy))
+    user_ids = _all_user_ids()
+    for pid in period_ids:
+        assignments.generate_assignments_for_period(pid)
+        for uid in user_ids:
+            rows = []
+            # Uma página com todos: cada avaliador tem no máximo um assignment por pessoa
+            for a in assignments.get_assignments_page(uid, pid, page_size=len(user_ids))[0]:
+                if rng.random() >= answered:
+                    continue
+                for c in competencies.get_competencies_for_assignment(a):
+                    rows.append((a["id"], c["id"], rng.randint(1, 5), None))
+            answers.save_answers_bulk(rows)
+    return period_ids
+
+
+def _all_user_ids():
+    with db.connection() as conn:
+        return [r["id"] for r in conn.execute("SELECT id FROM users WHERE is_active=1 ORDER BY id")]
+
+
+def import_cost(repeat: int = 5):
+    """Tempo de importação da camada de dados num interpretador novo (melhor de ``repeat``)."""
+    code = (
+        "import sys, time\n"
+        "t0 = time.perf_counter()\n"
+        f"import {', '.join('av360.' + m for m in DATA_MODULES)}\n"
+        "print(time.perf_counter() - t0)\n"
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    timings, heavy = [], []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                             capture_output=True, text=True).stdout.split("\n")
+        timings.append(float(out[0]))
+        heavy = out[1].split()
+    return {"ms": min(timings) * 1000, "heavy_modules": heavy}
+
+
+def full_scans(sql: str):
+    """Tabelas grandes que o plano de uma query percorre inteiras."""
+    try:
+        with db.connection() as conn:
+            plan = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+    except sqlite3.Error:
+        return []  # BEGIN/COMMIT/PRAGMA, etc.
+    return sorted({
+        table
+        for row in plan
+        for table in LARGE_TABLES
+        if row["detail"].startswith(f"SCAN {table}")
+    })
+
+
+def measure(fn, iterations, counter, warm_cache=False):
+    pool = db.get_pool()
+    timings, queries, connections, checkouts = [], [], [], []
+    counter.statements.clear()
+    for _ in range(iterations):
+        if not warm_cache:
+            cache.clear()
+        q0, c0, k0 = counter.count, counter.connections, pool.checkouts
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+        queries.append(counter.count - q0)
+        connections.append(counter.connections - c0)
+        checkouts.append(pool.checkouts - k0)
+    scans = {}
+    for sql in counter.statements:
+        tables = full_scans(sql)
+        if tables:
+            scans[" ".join(sql.split())[:200]] = tables
+    quantiles = statistics.quantiles(timings, n=20) if len(timings) > 1 else timings * 19
+    return {
+        "iterations": iterations,
+        "p50_ms": statistics.median(timings) * 1000,
+        "p95_ms": quantiles[18] * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "queries_per_call": statistics.fmean(queries),
+        "connections_per_call": statistics.fmean(connections),
+        "checkouts_per_call": statistics.fmean(checkouts),
+        "full_scans": scans,
+    }
+
+
+def run_size(n_users, args, rng):
+    workdir = tempfile.mkdtemp(prefix="av360-bench-")
+    db.DB_PATH = os.path.join(workdir, "bench.db")
+    cache.clear()
+    counter = StatementCounter()
+    db.add_connect_hook(counter.on_connect)
+    try:
+        t0 = time.perf_counter()
+        period_ids = seed_org(n_users, args.teams, args.periods, args.answered, rng, args.policy)
+        seed_seconds = time.perf_counter() - t0
+
+        period_id = period_ids[0]
+        archive_seconds = None
+        if args.archive:
+            # O período medido fica o ativo e os restantes passam a histórico arquivado
+            periods.set_active_period(period_id)
+            t0 = time.perf_counter()
+            for pid in period_ids[1:]:
+                archive.archive_period(pid)
+            archive_seconds = time.perf_counter() - t0
+        user_ids = _all_user_ids()
+        with db.connection() as conn:
+            n_assignments = conn.execute(
+                "SELECT COUNT(*) FROM evaluation_assignments WHERE period_id=?", (period_id,)).fetchone()[0]
+            n_answers = conn.execute("SELECT COUNT(*) FROM evaluation_answers").fetchone()[0]
+            assignment_ids = [r[0] for r in conn.execute(
+                "SELECT id FROM evaluation_assignments WHERE period_id=?", (period_id,))]
+        print(f"  {n_assignments} assignments por período ({n_assignments / len(user_ids):.1f} por avaliador)",
+              file=sys.stderr)
+
+        def my_evaluations_page():
+            user_id = rng.choice(user_ids)
+            assignments.get_assignment_progress(user_id, period_id)
+            rows, _ = assignments.get_assignments_page(user_id, period_id)
+            if rows:
+                competencies.get_competencies_for_assignment(rows[0])
+                answers.get_existing_answers(rows[0]["id"])
+
+        def save_form():
+            aid = rng.choice(assignment_ids)
+            with db.connection() as conn:
+                a = conn.execute("SELECT * FROM evaluation_assignments WHERE id=?", (aid,)).fetchone()
+            comps = competencies.get_competencies_for_assignment(a)
+            answers.save_answers(aid, {c["id"]: (rng.randint(1, 5), "bench") for c in comps})
+
+        def move_one_user():
+            # Uma mudança de equipa: só a linha e a coluna dessa pessoa
+            user_id = rng.choice(user_ids)
+            with db.transaction() as conn:
+                team_id = conn.execute("SELECT id FROM teams ORDER BY random() LIMIT 1").fetchone()[0]
+                conn.execute("DELETE FROM user_teams WHERE user_id=?", (user_id,))
+                conn.execute("INSERT INTO user_teams(user_id,team_id,is_primary) VALUES (?,?,1)", (user_id, team_id))
+            assignments.reconcile_assignments(period_id, [user_id])
+
+        def regenerate_new_period():
+            pid = periods.create_period("Bench regen", "2099-01-01", "2099-12-31", make_active=False,
+                                        policy=args.policy)
+            assignments.generate_assignments_for_period(pid)
+
+        n = args.iterations
+        ops = {
+            "setup_db": (schema.setup_db, n),
+            "list_periods": (periods.list_periods, n),
+            "sync_assignments[unchanged]": (lambda: assignments.sync_assignments(period_id), n),
+            "get_user_by_email": (lambda: users.get_user_by_email(f"pessoa{rng.randrange(n_users)}@bench.local"), n),
+            "my_evaluations_page": (my_evaluations_page, n),
+            "get_assignment_progress": (
+                lambda: assignments.get_assignment_progress(rng.choice(user_ids), period_id), n),
+            "get_assignments_page[pending]": (lambda: assignments.get_assignments_page(
+                rng.choice(user_ids), period_id, pending_only=True), n),
+            "get_global_scores": (lambda: scoring.get_global_scores(period_id), n),
+            "get_my_scores_over_time": (lambda: scoring.get_my_scores_over_time(rng.choice(user_ids)), n),
+            "load_period_scores": (lambda: scoring.load_period_scores(period_id), n),
+            "load_period_scores[evaluatee]": (
+                lambda: scoring.load_period_scores(period_id, rng.choice(user_ids)), n),
+            "get_category_scores": (lambda: scoring.get_category_scores(period_id), n),
+            "get_overall_scores": (lambda: scoring.get_overall_scores(period_id), n),
+            "save_answers": (save_form, n),
+            "generate_assignments_for_period[existing]": (lambda: assignments.generate_assignments_for_period(period_id), n),
+            "generate_assignments_for_period[new]": (regenerate_new_period, max(1, n // 10)),
+            "reconcile_assignments[1 user]": (move_one_user, n),
+        }
+        assignments.sync_assignments(period_id)  # a primeira sincronização do processo é completa
+        results = {}
+        for name, (fn, iterations) in ops.items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = measure(fn, iterations, counter, warm_cache=args.warm_cache)
+            print(f"  {name:45s} p50={results[name]['p50_ms']:9.2f}ms p95={results[name]['p95_ms']:9.2f}ms "
+                  f"q/call={results[name]['queries_per_call']:.1f}", file=sys.stderr)
+        return {
+            "org": {
+                "users": len(user_ids), "teams": args.teams, "periods": args.periods, "policy": args.policy,
+                "assignments_per_period": n_assignments, "answers": n_answers, "seed_seconds": seed_seconds,
+                "archived_periods": len(period_ids) - 1 if args.archive else 0, "archive_seconds": archive_seconds,
+            },
+            "operations": results,
+        }
+    finally:
+        db.remove_connect_hook(counter.on_connect)
+        db.get_pool().close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da camada de dados da Avaliação 360.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500], help="nº de utilizadores sintéticos")
+    parser.add_argument("--teams", type=int, default=8)
+    parser.add_argument("--periods", type=int, default=2)
+    parser.add_argument("--answered", type=float, default=1.0, help="fração de assignments respondidos")
+    parser.add_argument("--policy", default=policies.DEFAULT_POLICY,
+                        help="política de atribuição dos períodos (ex.: team:k=3,cap=12)")
+    parser.add_argument("--archive", action="store_true",
+                        help="arquivar os outros períodos antes de medir (só o medido fica nas tabelas vivas)")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warm-cache", action="store_true", help="não limpar a cache de leituras entre chamadas")
+    parser.add_argument("--only", nargs="*", help="medir só estas operações")
+    parser.add_argument("--seed", type=int, default=360)
+    parser.add_argument("--out", help="ficheiro JSON de resultados (por omissão stdout)")
+    parser.add_argument("--fail-on-scan", action="store_true",
+                        help="sair com erro se alguma query fizer full scan a uma tabela grande")
+    parser.add_argument("--max-import-ms", type=float,
+                        help="sair com erro se importar a camada de dados demorar mais do que isto "
+                             "ou arrastar pandas/streamlit")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "import": import_cost(),
+        "sizes": {},
+    }
+    print(f"import da camada de dados: {report['import']['ms']:.1f}ms "
+          f"{report['import']['heavy_modules'] or ''}", file=sys.stderr)
+    for n_users in args.sizes:
+        print(f"org com {n_users} utilizadores", file=sys.stderr)
+        report["sizes"][str(n_users)] = run_size(n_users, args, rng)
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+    scans = [
+        (size, op, sql)
+        for size, r in report["sizes"].items()
+        for op, m in r["operations"].items()
+        for sql in m["full_scans"]
+        if sql not in EXPECTED_SCANS.get(op, ())
+    ]
+    status = 0
+    if args.fail_on_scan and scans:
+        for size, op, sql in scans:
+            print(f"full scan [{size}] {op}: {sql}", file=sys.stderr)
+        status = 1
+    if args.max_import_ms is not None and (
+        report["import"]["ms"] > args.max_import_ms or report["import"]["heavy_modules"]
+    ):
+        print(f"import da camada de dados acima do limite: {report['import']}", file=sys.stderr)
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Benchmark do débito de logins para os vários custos da KDF das passwords.
+
+Para cada configuração (esquema e parâmetros) cria uma base de dados
+descartável com utilizadores cujas passwords foram calculadas com ela e mede
+``users.authenticate`` com 1..N threads em simultâneo: latência p50/p95 e
+logins por segundo. Serve para escolher o fator de trabalho em função dos
+logins concorrentes esperados (ex.: toda a empresa a entrar no primeiro dia
+do período). Mede também a validação da sessão do servidor, que é o que
+acontece em cada rerun.
+
+    python benchmarks/login.py --configs scrypt:n=16384,r=8,p=1 pbkdf2_sha256:i=600000 --threads 1 4 8
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from av360 import cache, db, passwords, schema, sessions, users  # noqa: E402
+
+DEFAULT_CONFIGS = ["scrypt:n=16384,r=8,p=1", "scrypt:n=32768,r=8,p=1", "pbkdf2_sha256:i=600000"]
+PASSWORD = "1234"
+
+
+def parse_config(text: str):
+    scheme, _, params = text.partition(":")
+    if scheme not in passwords.SCHEMES:
+        raise argparse.ArgumentTypeError(f"esquema desconhecido: {scheme}")
+    return scheme, passwords.parse_params(params) if params else passwords.SCHEMES[scheme][1]
+
+
+def use_config(scheme: str, params: dict):
+    """Torna esta configuração a atual (sem ela o primeiro login refaria o hash)."""
+    derive, _ = passwords.SCHEMES[scheme]
+    passwords.SCHEMES[scheme] = (derive, params)
+    passwords.DEFAULT_SCHEME = scheme
+
+
+def seed_users(n_users: int):
+    schema.setup_db()
+    hashes = passwords.hash_passwords([PASSWORD] * n_users)
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO users(name,email,password_hash,role) VALUES (?,?,?,'MEMBRO')",
+            [(f"Pessoa {i}", f"pessoa{i}@bench.local", h) for i, h in enumerate(hashes)],
+        )
+    cache.invalidate("users")
+    return [f"pessoa{i}@bench.local" for i in range(n_users)]
+
+
+def login_throughput(emails, n_threads: int, n_logins: int, rng: random.Random):
+    picks = [rng.choice(emails) for _ in range(n_logins)]
+
+    def login(email):
+        t0 = time.perf_counter()
+        ok = users.authenticate(email, PASSWORD) is not None
+        return time.perf_counter() - t0, ok
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        results = list(pool.map(login, picks))
+    wall = time.perf_counter() - t0
+    timings = [t for t, _ in results]
+    quantiles = statistics.quantiles(timings, n=20) if len(timings) > 1 else timings * 19
+    return {
+        "logins": n_logins,
+        "failed": sum(1 for _, ok in results if not ok),
+        "p50_ms": statistics.median(timings) * 1000,
+        "p95_ms": quantiles[18] * 1000,
+        "logins_per_s": n_logins / wall,
+    }
+
+
+def session_verify_us(iterations: int = 10000):
+    """Custo médio de validar uma sessão (o valor típico: a sessão já está na cache local)."""
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="av360-session-"), "session.db")
+    cache.clear()
+    try:
+        seed_users(1)
+        token = sessions.issue(1)
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            sessions.verify(token)
+        return (time.perf_counter() - t0) / iterations * 1e6
+    finally:
+        db.get_pool().close()
+
+
+def run_config(scheme, params, args, rng):
+    use_config(scheme, params)
+    workdir = tempfile.mkdtemp(prefix="av360-login-")
+    db.DB_PATH = os.path.join(workdir, "login.db")
+    cache.clear()
+    try:
+        hash_ms = []
+        for _ in range(5):
+            t0 = time.perf_counter()
+            passwords.hash_password(PASSWORD)
+            hash_ms.append((time.perf_counter() - t0) * 1000)
+        emails = seed_users(args.users)
+        result = {
+            "scheme": scheme,
+            "params": params,
+            "hash_ms": statistics.median(hash_ms),
+            "threads": {},
+        }
+        for n_threads in args.threads:
+            cache.clear()  # cada login lê o utilizador da base de dados
+            r = result["threads"][str(n_threads)] = login_throughput(emails, n_threads, args.logins, rng)
+            print(f"  {n_threads:3d} threads: p50={r['p50_ms']:8.1f}ms p95={r['p95_ms']:8.1f}ms "
+                  f"{r['logins_per_s']:8.1f} logins/s", file=sys.stderr)
+        return result
+    finally:
+        db.get_pool().close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do débito de logins da Avaliação 360.")
+    parser.add_argument("--configs", type=parse_config, nargs="+", default=None,
+                        help=f"esquema[:k=v,...] (por omissão {' '.join(DEFAULT_CONFIGS)})")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8], help="logins em simultâneo")
+    parser.add_argument("--logins", type=int, default=64, help="logins por medição")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=360)
+    parser.add_argument("--out", help="ficheiro JSON de resultados (por omissão stdout)")
+    args = parser.parse_args(argv)
+    configs = args.configs or [parse_config(c) for c in DEFAULT_CONFIGS]
+
+    rng = random.Random(args.seed)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k != "configs"},
+        },
+        "session_verify_us": session_verify_us(),
+        "configs": [],
+    }
+    for scheme, params in configs:
+        print(f"{scheme} {passwords.format_params(params)}", file=sys.stderr)
+        report["configs"].append(run_config(scheme, params, args, rng))
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
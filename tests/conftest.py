@@ -0,0 +1,48 @@
+"""Bases de dados descartáveis para os testes, em SQLite e em PostgreSQL.
+
+O PostgreSQL é um servidor local arrancado pelo pacote ``pgserver`` (uma vez
+por sessão de testes), com um schema novo por teste; sem ``pgserver`` ou
+``psycopg`` os casos PostgreSQL são ignorados.
+"""
+import itertools
+import os
+
+import pytest
+
+from av360 import assignments, cache, db, schema
+
+_schemas = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def postgres_url(tmp_path_factory):
+    pgserver = pytest.importorskip("pgserver")
+    pytest.importorskip("psycopg")
+    server = pgserver.get_server(str(tmp_path_factory.mktemp("pgdata")), cleanup_mode="delete")
+    yield server.get_uri()
+    server.cleanup()
+
+
+def _postgres_target(request):
+    import psycopg
+
+    url = request.getfixturevalue("postgres_url")
+    name = f"av360_test_{os.getpid()}_{next(_schemas)}"
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute(f"CREATE SCHEMA {name}")
+    separator = "&" if "?" in url else "?"
+    return f"{url}{separator}options=-csearch_path%3D{name}"
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def backend(request, tmp_path, monkeypatch):
+    """Base de dados nova no backend do parâmetro, já com o esquema atual; devolve o dialeto."""
+    target = str(tmp_path / "test.db") if request.param == "sqlite" else _postgres_target(request)
+    monkeypatch.setattr(db, "DB_PATH", target)
+    cache.clear()
+    assignments._synced.clear()
+    schema.setup_db()
+    yield request.param
+    db.get_pool().close()
+    cache.clear()
+    assignments._synced.clear()
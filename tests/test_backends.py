@@ -0,0 +1,109 @@
+"""Camada de dados em SQLite e em PostgreSQL: migrações, matriz, respostas e arquivo."""
+import pytest
+
+from av360 import answers, archive, assignments, competencies, db, periods, schema
+
+
+def count(sql, params=()):
+    with db.connection() as conn:
+        return conn.execute(sql, params).fetchone()[0]
+
+
+def aggregates():
+    with db.connection() as conn:
+        rows = conn.execute(
+            "SELECT period_id, evaluatee_id, category, score_count, score_sum, weighted_sum, weight_sum "
+            "FROM score_aggregates WHERE score_count > 0"
+        ).fetchall()
+    return sorted((*r[:4], *(round(v, 6) for v in r[4:])) for r in rows)
+
+
+def answer_some(period_id, n_evaluators=4):
+    """Responde aos formulários dos primeiros avaliadores; devolve o nº de respostas."""
+    rows = []
+    with db.connection() as conn:
+        evaluator_ids = [r[0] for r in conn.execute(
+            "SELECT DISTINCT evaluator_id FROM evaluation_assignments WHERE period_id=? ORDER BY evaluator_id",
+            (period_id,),
+        ).fetchall()][:n_evaluators]
+    for evaluator_id in evaluator_ids:
+        for a in assignments.get_assignments_page(evaluator_id, period_id, page_size=100)[0]:
+            for c in competencies.get_competencies_for_assignment(a):
+                rows.append((a["id"], c["id"], (a["id"] + c["id"]) % 5 + 1, None))
+    inserted, updated = answers.save_answers_bulk(rows)
+    assert (inserted, updated) == (len(rows), 0)
+    return len(rows)
+
+
+@pytest.fixture
+def period_id(backend):
+    pid = periods.get_current_period_id()
+    assignments.generate_assignments_for_period(pid)
+    return pid
+
+
+def test_setup_is_current_and_idempotent(backend):
+    assert db.dialect() == backend
+    assert schema.schema_version() == schema.LATEST_VERSION
+    assert schema.setup_db() == schema.LATEST_VERSION
+    assert count("SELECT COUNT(*) FROM users") > 0
+    assert count("SELECT version FROM roster_version WHERE id=1") == 0
+
+
+def test_reconcile_full_and_delta(period_id):
+    n_users = count("SELECT COUNT(*) FROM users WHERE is_active=1")
+    assert count("SELECT COUNT(*) FROM evaluation_assignments WHERE period_id=?", (period_id,)) == n_users ** 2
+    assert not assignments.reconcile_assignments(period_id)
+
+    user_id = count("SELECT MAX(id) FROM users")
+    with db.transaction() as conn:
+        conn.execute("UPDATE users SET is_active=0 WHERE id=?", (user_id,))
+    report = assignments.reconcile_assignments(period_id, [user_id])
+    assert report.removed == 2 * n_users - 1
+    assert count("SELECT COUNT(*) FROM evaluation_assignments WHERE period_id=? AND removed_at IS NULL",
+                 (period_id,)) == (n_users - 1) ** 2
+
+    with db.transaction() as conn:
+        conn.execute("UPDATE users SET is_active=1 WHERE id=?", (user_id,))
+    assert assignments.sync_assignments(period_id).updated == 2 * n_users - 1
+    assert not assignments.reconcile_assignments(period_id)
+
+
+def test_save_answers_bulk_keeps_aggregates(period_id):
+    n = answer_some(period_id)
+    assert n > 0
+    assert count("SELECT SUM(score_count) FROM score_aggregates WHERE period_id=?", (period_id,)) == n
+    maintained = aggregates()
+    schema.recompute_score_aggregates()
+    assert aggregates() == maintained
+
+    # Regravar o mesmo formulário atualiza, não duplica
+    with db.connection() as conn:
+        row = conn.execute("SELECT assignment_id, competency_id, score FROM evaluation_answers "
+                           "ORDER BY id LIMIT 1").fetchone()
+    assert answers.save_answers_bulk([(row[0], row[1], row[2] % 5 + 1, "nova")]) == (0, 1)
+    assert count("SELECT SUM(score_count) FROM score_aggregates WHERE period_id=?", (period_id,)) == n
+    maintained = aggregates()
+    schema.recompute_score_aggregates()
+    assert aggregates() == maintained
+
+
+def test_archive_and_restore_round_trip(period_id):
+    n = answer_some(period_id)
+    before = aggregates()
+    n_assignments = count("SELECT COUNT(*) FROM evaluation_assignments WHERE period_id=?", (period_id,))
+    new_period = periods.create_period("Seguinte", "2099-01-01", "2099-12-31")
+
+    with pytest.raises(ValueError):
+        archive.archive_period(new_period)  # ativo
+    summary = archive.archive_period(period_id)
+    assert summary["n_answers"] == n and summary["n_assignments"] == n_assignments
+    assert count("SELECT COUNT(*) FROM evaluation_answers") == 0
+    assert aggregates() == before
+    with pytest.raises(ValueError):
+        assignments.reconcile_assignments(period_id)
+
+    restored = archive.restore_period(period_id)
+    assert restored == {"evaluation_assignments": n_assignments, "evaluation_answers": n}
+    assert archive.get_summary(period_id) is None
+    assert aggregates() == before
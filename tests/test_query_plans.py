@@ -0,0 +1,106 @@
+"""Os lookups quentes usam os índices certos: nenhum plano percorre inteiras as tabelas grandes."""
+import re
+
+import pytest
+
+from av360 import assignments, cache, db, schema, scoring
+
+LARGE_TABLES = ("evaluation_assignments", "user_teams")
+
+# UNIQUE(period_id, evaluator_id, evaluatee_id) e PRIMARY KEY(user_id, team_id)
+ASSIGNMENTS_UNIQUE = "sqlite_autoindex_evaluation_assignments_1"
+USER_TEAMS_PK = "sqlite_autoindex_user_teams_1"
+
+# nome -> (sql, parâmetros, índices que o plano tem de usar)
+QUERIES = {
+    "avaliador/período": (
+        assignments.ASSIGNMENTS_SELECT + " WHERE ea.evaluator_id=? AND ea.period_id=?",
+        (1, 1),
+        {ASSIGNMENTS_UNIQUE, USER_TEAMS_PK},
+    ),
+    "avaliado/período": (
+        scoring.PERIOD_ANSWERS_QUERY.format(evaluatee_filter="AND a.evaluatee_id = ?"),
+        (1, 1),
+        {"idx_assignments_evaluatee_period"},
+    ),
+    "período": (
+        scoring.PERIOD_ANSWERS_QUERY.format(evaluatee_filter=""),
+        (1,),
+        {ASSIGNMENTS_UNIQUE},
+    ),
+    "equipas partilhadas": (
+        """
+        SELECT ua.team_id
+        FROM user_teams ua
+        JOIN user_teams ub ON ub.team_id=ua.team_id
+        WHERE ua.user_id=? AND ub.user_id=?
+        """,
+        (1, 2),
+        {USER_TEAMS_PK},
+    ),
+    "membros da equipa": (
+        "SELECT ea.id FROM evaluation_assignments ea "
+        "WHERE ea.period_id=? AND ea.evaluatee_id IN (SELECT user_id FROM user_teams WHERE team_id=?)",
+        (1, 1),
+        {"idx_assignments_evaluatee_period", "idx_user_teams_team"},
+    ),
+}
+
+SQL_KEYWORDS = {"WHERE", "JOIN", "LEFT", "INNER", "CROSS", "ON", "GROUP", "ORDER", "LIMIT", "USING"}
+
+
+def table_aliases(sql: str) -> dict:
+    """{alias ou nome: tabela} das tabelas em FROM/JOIN (o plano mostra o alias)."""
+    aliases = {}
+    for table, alias in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", sql, re.IGNORECASE):
+        aliases[table] = table
+        if alias and alias.upper() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def plan(sql: str, params) -> list:
+    with db.connection() as conn:
+        return [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def large_table_scans(sql: str, details) -> list:
+    aliases = table_aliases(sql)
+    return [
+        d for d in details
+        if (m := re.match(r"SCAN (\w+)", d)) and aliases.get(m.group(1), m.group(1)) in LARGE_TABLES
+    ]
+
+
+def used_indexes(details) -> set:
+    return {m.group(1) for d in details if (m := re.search(r"USING (?:COVERING )?INDEX (\w+)", d))}
+
+
+@pytest.fixture
+def throwaway_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "plans.db"))
+    cache.clear()
+    schema.setup_db()
+    yield
+    db.get_pool().close()
+    cache.clear()
+
+
+@pytest.mark.parametrize("name", QUERIES)
+def test_hot_lookup_uses_indexes(throwaway_db, name):
+    sql, params, expected = QUERIES[name]
+    details = plan(sql, params)
+    assert not large_table_scans(sql, details), details
+    assert expected <= used_indexes(details), details
+
+
+def test_scan_through_alias_is_detected(throwaway_db):
+    sql = "SELECT ea.id FROM evaluation_assignments ea WHERE ea.include_technical=?"
+    assert large_table_scans(sql, plan(sql, (1,)))
+
+
+def test_missing_evaluatee_index_is_detected(throwaway_db):
+    with db.transaction() as conn:
+        conn.execute("DROP INDEX idx_assignments_evaluatee_period")
+    sql, params, expected = QUERIES["avaliado/período"]
+    assert not expected <= used_indexes(plan(sql, params))